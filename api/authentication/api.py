@@ -1,5 +1,6 @@
 import logging
 
+from asgiref.sync import sync_to_async
 from datetime import timedelta
 
 from django.conf import settings
@@ -24,33 +25,47 @@ from rest_framework.views import APIView
 from authentication.models import (
     EmailVerificationToken, PhoneVerificationToken,
     TwoFactorAuthToken,)
+from authentication.reauth import ReauthGrant
 from authentication.verification import (
     send_verification_email, send_verification_sms, check_verification_token,)
 from authentication.serializers import (
     LoginSerializer, RegistrationSerializer, TwoFactorAuthSerializer,
     VerificationSerializer,)
 from authentication.utils import AuthCommands
+from entries.key_cache import DataKeyCache
 from users.exceptions import DuplicateEmail, DuplicateSuperUser
 from utils import parse_request_metadata
+from utils.admission import crypto_slot
 from utils.exceptions import RequestError
-from utils.throttling import throttle_command
+from utils.throttling import athrottle_command, throttle_command
+from utils.views import AsyncAPIViewMixin
 
 
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
-class LoginAPI(LoginView):
+class LoginAPI(AsyncAPIViewMixin, LoginView):
     permission_classes = (AllowAny,)
 
-    def post(self, request, format=None):
+    async def post(self, request, format=None):
+        # A failed throttle check is raised, and logged, by `log_in`
         try:
-            if throttle_command(
-                AuthCommands.LOGIN, request.META['CLIENT_IP'], request,
-            ):
+            throttled = await athrottle_command(
+                AuthCommands.LOGIN, request.META['CLIENT_IP'], request,)
+        except Exception as e:
+            throttled = e
+        return await sync_to_async(self.log_in)(request, throttled)
+
+    def log_in(self, request, throttled=False):
+        try:
+            if isinstance(throttled, Exception):
+                raise throttled
+            if throttled:
                 raise Throttled()
 
-            serializer = LoginSerializer(data=request.data)
+            serializer = LoginSerializer(
+                data=request.data, context=dict(request=request),)
             serializer.is_valid(raise_exception=True)
             user = serializer.validated_data
 
@@ -81,7 +96,11 @@ class LoginAPI(LoginView):
                 return Response(data, status=status.HTTP_201_CREATED)
 
             login(request, user)
-            return super().post(request, format=None)
+            response = super().post(request, format=None)
+            # Logging in confirmed the password for the new session
+            ReauthGrant.grant_token(
+                response.data['token'], user, request.data['password'],)
+            return response
         except (AuthenticationFailed, PermissionDenied, Throttled) as e:
             raise e
         except ValidationError as e:
@@ -118,8 +137,10 @@ class RegistrationAPI(LoginAPI):
             registration = RegistrationSerializer(data=request.data)
             registration.is_valid(raise_exception=True)
             data = registration.validated_data
-            user = User.objects.create_user(**data)
-            return super().post(request, format=None)
+            with crypto_slot(request):
+                user = User.objects.create_user(**data)
+            return self.log_in(request, throttle_command(
+                AuthCommands.LOGIN, request.META['CLIENT_IP'], request,))
         except Throttled as e:
             raise e
         except ValidationError as e:
@@ -171,6 +192,8 @@ class RegistrationAPI(LoginAPI):
 class LogoutAPI(LogoutView):
     def post(self, request, format=None):
         try:
+            DataKeyCache.delete(request)
+            ReauthGrant.revoke(request)
             auth_header = request.headers.get('Authorization')
             token_key = auth_header.split()[1][:CONSTANTS.TOKEN_KEY_LENGTH]
             token = request.user.auth_token_set.get(token_key=token_key)
@@ -1,6 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
 
+from authentication.hashers import get_dummy_password_hash
+from users.models import verify_password
+from utils.admission import crypto_slot
+from utils.executor import crypto_executor
+
 
 UserModel = get_user_model()
 
@@ -15,9 +20,13 @@ class CustomModelBackend(ModelBackend):
         try:
             user = UserModel._default_manager.get_by_natural_key(email)
         except UserModel.DoesNotExist:
-            # Run the default password hasher once to reduce the timing
+            # Check the password against a dummy hash to reduce the timing
             # difference between an existing and a nonexistent user (#20760).
-            UserModel().set_password(password)
+            with crypto_slot(request):
+                crypto_executor.run(
+                    verify_password, password, get_dummy_password_hash(),)
         else:
-            if user.check_password(password) and self.user_can_authenticate(user):
+            with crypto_slot(request):
+                is_valid = user.check_password(password)
+            if is_valid and self.user_can_authenticate(user):
                 return user
\ No newline at end of file
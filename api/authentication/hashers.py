@@ -0,0 +1,51 @@
+from secrets import token_urlsafe
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, get_hasher, identify_hasher, make_password,)
+
+from utils.executor import crypto_executor
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    '''
+    Django's Argon2 hasher with the costs set in `ARGON2_PASSWORD_HASHER`,
+    see the `calibrate_argon2` command. Hashes made with other costs are
+    upgraded by `check_password` on the next successful login.
+    '''
+
+    @staticmethod
+    def _settings():
+        return settings.ARGON2_PASSWORD_HASHER
+
+    @property
+    def time_cost(self):
+        return self._settings()['time_cost']
+
+    @property
+    def memory_cost(self):
+        return self._settings()['memory_cost']
+
+    @property
+    def parallelism(self):
+        return self._settings()['parallelism']
+
+
+_dummy_password_hash = None
+
+def get_dummy_password_hash():
+    '''
+    A hash of a random password made with the default hasher, for checking
+    the passwords of unknown users in about the time a real check takes.
+    It is made once per process, and again when the hasher's costs change.
+    '''
+    global _dummy_password_hash
+    encoded = _dummy_password_hash
+    hasher = get_hasher()
+    if encoded is None or (
+        identify_hasher(encoded).algorithm != hasher.algorithm or
+        hasher.must_update(encoded)
+    ):
+        encoded = _dummy_password_hash = crypto_executor.run(
+            make_password, token_urlsafe(16))
+    return encoded
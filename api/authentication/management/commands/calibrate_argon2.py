@@ -0,0 +1,146 @@
+import os
+import re
+import statistics
+
+from time import perf_counter
+
+from argon2 import DEFAULT_HASH_LENGTH, DEFAULT_RANDOM_SALT_LENGTH
+from argon2.low_level import Type, hash_secret
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# OWASP's lowest recommended memory cost for Argon2id, in KiB
+MIN_MEMORY_COST = 19456
+MAX_MEMORY_COST = 262144
+MAX_TIME_COST = 10
+ENV_PREFIX = 'ARGON2_PASSWORD_HASHER_'
+
+
+def measure(time_cost, memory_cost, parallelism, samples):
+    '''
+    Median seconds taken to hash a password with the given costs.
+    '''
+    timings = []
+    for _ in range(samples):
+        secret, salt = os.urandom(16), os.urandom(DEFAULT_RANDOM_SALT_LENGTH)
+        start = perf_counter()
+        hash_secret(
+            secret, salt,
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism,
+            hash_len=DEFAULT_HASH_LENGTH,
+            type=Type.ID,)
+        timings.append(perf_counter() - start)
+    return statistics.median(timings)
+
+
+def update_env_file(path, values):
+    '''
+    Set `values` in the env file at `path`, replacing the lines which set
+    them already, and appending the others.
+    '''
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = f.read().splitlines()
+    missing = dict(values)
+    for i, line in enumerate(lines):
+        match = re.match(r'\s*(export\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*=', line)
+        if match and match.group(2) in missing:
+            lines[i] = f'{match.group(2)}={missing.pop(match.group(2))}'
+    lines.extend(f'{name}={value}' for name, value in missing.items())
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark Argon2 password hashing on this host, and recommend the '
+        'highest costs which hash a password within the target login '
+        'latency. Memory is preferred over time: the memory cost is halved '
+        'from --max-memory until one pass fits, then passes are added while '
+        'they fit.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms', type=float, default=250,
+            help='Target milliseconds per password hash (default: 250).',)
+        parser.add_argument(
+            '--parallelism', type=int,
+            default=settings.ARGON2_PASSWORD_HASHER['parallelism'],
+            help='Lanes per hash (default: the current setting).',)
+        parser.add_argument(
+            '--min-memory', type=int, default=MIN_MEMORY_COST,
+            help=f'Lowest memory cost in KiB (default: {MIN_MEMORY_COST}).',)
+        parser.add_argument(
+            '--max-memory', type=int, default=MAX_MEMORY_COST,
+            help=f'Highest memory cost in KiB (default: {MAX_MEMORY_COST}).',)
+        parser.add_argument(
+            '--max-time-cost', type=int, default=MAX_TIME_COST,
+            help=f'Highest time cost (default: {MAX_TIME_COST}).',)
+        parser.add_argument(
+            '--samples', type=int, default=3,
+            help='Hashes timed per candidate (default: 3).',)
+        parser.add_argument(
+            '--write', metavar='ENV_FILE',
+            help='Write the recommended costs to this env file, e.g. api.env.',)
+
+    def _measure(self, time_cost, memory_cost, options):
+        seconds = measure(
+            time_cost, memory_cost, options['parallelism'], options['samples'])
+        self.stdout.write(
+            f'time_cost={time_cost} memory_cost={memory_cost} '
+            f"parallelism={options['parallelism']}: {seconds * 1000:.1f} ms")
+        return seconds
+
+    def handle(self, *args, **options):
+        target = options['target_ms'] / 1000
+        parallelism = options['parallelism']
+        # Argon2 needs at least 8 KiB per lane
+        min_memory = max(options['min_memory'], 8 * parallelism)
+        if target <= 0 or parallelism < 1 or options['samples'] < 1 or (
+            options['max_memory'] < min_memory or options['max_time_cost'] < 1
+        ):
+            raise CommandError('Invalid calibration options')
+
+        time_cost = 1
+        memory_cost = options['max_memory']
+        seconds = self._measure(time_cost, memory_cost, options)
+        while seconds > target and memory_cost > min_memory:
+            memory_cost = max(memory_cost // 2, min_memory)
+            seconds = self._measure(time_cost, memory_cost, options)
+
+        if seconds > target:
+            self.stdout.write(self.style.WARNING(
+                'Even the lowest costs exceed the target latency'))
+        else:
+            # Each pass takes about as long as the first
+            time_cost = min(
+                max(int(target // max(seconds, 1e-6)), 1),
+                options['max_time_cost'],)
+            while time_cost > 1 and (
+                self._measure(time_cost, memory_cost, options) > target
+            ):
+                time_cost -= 1
+
+        values = {
+            f'{ENV_PREFIX}TIME_COST': time_cost,
+            f'{ENV_PREFIX}MEMORY_COST': memory_cost,
+            f'{ENV_PREFIX}PARALLELISM': parallelism,
+        }
+        self.stdout.write(self.style.SUCCESS('Recommended settings:'))
+        for name, value in values.items():
+            self.stdout.write(f'{name}={value}')
+
+        if options['write']:
+            try:
+                update_env_file(options['write'], values)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(
+                    f"Error writing {options['write']}"))
+                raise e
+            self.stdout.write(self.style.SUCCESS(
+                f"Successfully wrote {options['write']}. Existing password "
+                'hashes are upgraded on the next successful login.'))
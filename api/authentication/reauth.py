@@ -0,0 +1,111 @@
+import hashlib
+import hmac
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from knox.crypto import hash_token
+
+from utils.admission import crypto_slot
+from utils.tokens import request_token, token_secret
+
+
+logger = logging.getLogger(__name__)
+
+class ReauthGrant(object):
+    '''
+    Short-lived proof that a session recently confirmed the user's password,
+    bound to the session's knox token. It holds an HMAC of the password under
+    a secret derived from the raw token, which the server never stores, so a
+    follow-up request's password is checked by comparing HMACs instead of
+    hashing it again.
+
+    The HMAC also covers the user's password hash, so every grant is void
+    once the password changes.
+    '''
+
+    @staticmethod
+    def _settings():
+        return settings.REAUTH_GRANT
+
+    @staticmethod
+    def _token(request):
+        if not ReauthGrant._settings()['ENABLED']:
+            return None, None
+        return request_token(request)
+
+    @staticmethod
+    def _key(digest):
+        return f'reauth_grant_{digest}'
+
+    @staticmethod
+    def _mac(token, user, password):
+        secret = token_secret(token, b'reauth_grant')
+        message = '\0'.join([user.password, password]).encode('utf-8')
+        return hmac.new(secret, message, hashlib.sha256).digest()
+
+    @staticmethod
+    def _grant(digest, token, user, password):
+        try:
+            cache.set(
+                ReauthGrant._key(digest),
+                ReauthGrant._mac(token, user, password),
+                timeout=ReauthGrant._settings()['TTL'],)
+        except Exception as e:
+            logger.exception('Error setting reauth grant', exc_info=e)
+
+    @staticmethod
+    def grant(request, password):
+        '''
+        Record that the request's session just confirmed `password`.
+        '''
+        digest, token = ReauthGrant._token(request)
+        if digest:
+            ReauthGrant._grant(digest, token, request.user, password)
+
+    @staticmethod
+    def grant_token(token, user, password):
+        '''
+        Like `grant`, for the raw token of a session which was just created
+        by logging in with `password`.
+        '''
+        if ReauthGrant._settings()['ENABLED']:
+            ReauthGrant._grant(hash_token(token), token, user, password)
+
+    @staticmethod
+    def check(request, password):
+        digest, token = ReauthGrant._token(request)
+        if not digest or not isinstance(password, str):
+            return False
+        try:
+            mac = cache.get(ReauthGrant._key(digest))
+        except Exception as e:
+            logger.exception('Error getting reauth grant', exc_info=e)
+            return False
+        return mac is not None and hmac.compare_digest(
+            mac, ReauthGrant._mac(token, request.user, password))
+
+    @staticmethod
+    def revoke(request):
+        digest, token = ReauthGrant._token(request)
+        if not digest:
+            return
+        try:
+            cache.delete(ReauthGrant._key(digest))
+        except Exception as e:
+            logger.exception('Error revoking reauth grant', exc_info=e)
+
+
+def check_request_password(request, password):
+    '''
+    Like `request.user.check_password`, but skips hashing a password which the
+    session confirmed within the last `REAUTH_GRANT['TTL']` seconds. A full
+    successful check starts a new grant.
+    '''
+    if ReauthGrant.check(request, password):
+        return True
+    with crypto_slot(request):
+        is_valid = request.user.check_password(password)
+    if is_valid:
+        ReauthGrant.grant(request, password)
+    return is_valid
@@ -1,25 +1,43 @@
+import os
 import re
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import override_settings
 from django_redis import get_redis_connection
 
 from datetime import datetime, timedelta
 from freezegun import freeze_time
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
+from authentication.hashers import get_dummy_password_hash
 from authentication.invalid_login import InvalidLoginCache
 from authentication.models import (
     EmailVerificationToken, PhoneVerificationToken, TwoFactorAuthToken,)
 from authentication.utils import AuthCommands
 from custom_db_logger.models import StatusLog
 from custom_db_logger.utils import LogLevels
-from utils.testing import test_user_1, test_user_2, create_user, log_msg_regex
+from utils.admission import admission
+from utils.throttling import athrottle_command, throttle_command
+from utils.testing import (
+    test_user_1,
+    test_user_2,
+    test_superuser,
+    create_entries,
+    create_superuser,
+    create_user,
+    log_msg_regex,)
 
 
 @override_settings(DJANGO_ENV='test')
@@ -221,6 +239,138 @@ class AuthenticationTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(StatusLog.objects.using('logger').count(), 0)
 
+    def test_reauth_grant(self):
+        user = create_user()
+        slug = create_entries(user, test_user_1['password'])[0].slug
+        response = self.client.post(reverse('login'), data={
+            'email': user.email,
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        new_password = 'n3wPa$$w0rd!'
+
+        User = get_user_model()
+        with patch.object(
+            User, 'check_password', autospec=True,
+            side_effect=User.check_password,
+        ) as mock_check_password:
+            # Logging in confirmed the password, so it is not hashed again
+            for _ in range(2):
+                response = self.client.post(
+                    reverse('entry-retrieve', args=[slug]),
+                    data={ 'password': test_user_1['password'] },)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(mock_check_password.call_count, 0)
+
+            # Any other password is fully checked
+            response = self.client.post(
+                reverse('entry-retrieve', args=[slug]),
+                data={ 'password': 'wr0ngPa$$w0rd' },)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(mock_check_password.call_count, 1)
+
+            # Changing the password revokes the grant
+            response = self.client.patch(
+                f'/api/users/{user.user_slug}/', data={
+                    'current_password': test_user_1['password'],
+                    'password': new_password,
+                    'password_2': new_password,
+                },)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(mock_check_password.call_count, 1)
+            self.assertEqual(len(cache.keys('reauth_grant_*')), 0)
+
+            response = self.client.post(
+                reverse('entry-retrieve', args=[slug]),
+                data={ 'password': test_user_1['password'] },)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(mock_check_password.call_count, 2)
+
+            for _ in range(2):
+                response = self.client.post(
+                    reverse('entry-retrieve', args=[slug]),
+                    data={ 'password': new_password },)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(mock_check_password.call_count, 3)
+
+        # Logging out revokes the grant
+        self.assertEqual(len(cache.keys('reauth_grant_*')), 1)
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(cache.keys('reauth_grant_*')), 0)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    @override_settings(CRYPTO_ADMISSION={
+        'ENABLED': True,
+        'CONCURRENCY': 2,
+        'COMMAND_CONCURRENCY': { 'login': 1 },
+        'QUEUE_DEPTH': 0,
+        'WAIT_TIMEOUT': 0.1,
+        'RETRY_AFTER': 7,
+    })
+    def test_crypto_admission(self):
+        user = create_user()
+        slug = create_entries(user, test_user_1['password'])[0].slug
+        response = self.client.post(reverse('login'), data={
+            'email': user.email,
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        before = admission.stats()
+
+        def count(command, metric):
+            return admission.stats().get(command, {}).get(metric, 0) - (
+                before.get(command, {}).get(metric, 0))
+
+        with admission.slot('login'):
+            # Logins are shed once they use up their share
+            response = self.client.post(reverse('login'), data={
+                'email': user.email,
+                'password': test_user_1['password'],
+            })
+            self.assertEqual(
+                response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '7')
+            self.assertEqual(count('login', 'rejected'), 1)
+
+            # Without holding back other commands
+            response = self.client.post(
+                reverse('entry-retrieve', args=[slug]),
+                data={ 'password': test_user_1['password'] },)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(count('entry-retrieve', 'admitted'), 1)
+
+            with admission.slot('entry-list'):
+                # Until every slot is taken
+                response = self.client.post(
+                    reverse('entry-retrieve', args=[slug]),
+                    data={ 'password': test_user_1['password'] },)
+                self.assertEqual(
+                    response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+                self.assertEqual(count('entry-retrieve', 'rejected'), 1)
+                self.assertEqual(admission.stats()['entry-list']['running'], 1)
+
+        self.assertEqual(admission.stats()['login']['running'], 0)
+        response = self.client.post(
+            reverse('entry-retrieve', args=[slug]),
+            data={ 'password': test_user_1['password'] },)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Only admins can read the metrics
+        response = self.client.get(reverse('crypto-admission-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        create_superuser()
+        response = self.client.post(reverse('login'), data={
+            'email': test_superuser['email'],
+            'password': test_superuser['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        response = self.client.get(reverse('crypto-admission-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response.data, admission.stats())
+        # Django logs each 503 response
+        self.assertEqual(StatusLog.objects.using('logger').count(), 2)
+
     def test_login_fail_user_not_found(self):
         res_fail = self.client.post(reverse('login'), data={
             'email': test_user_2['email'],
@@ -233,6 +383,101 @@ class AuthenticationTest(APITestCase):
         self.assertIsNotNone(InvalidLoginCache.get(test_user_2['email']))
         self.assertEqual(StatusLog.objects.using('logger').count(), 0)
 
+    @override_settings(
+        CRYPTO_EXECUTOR=dict(settings.CRYPTO_EXECUTOR, ENABLED=False))
+    def test_login_user_not_found_dummy_hash(self):
+        # Unknown users are checked against one cached hash, which is only
+        # made again when the hasher's costs change
+        with patch(
+            'authentication.hashers.make_password', wraps=make_password,
+        ) as make:
+            for email in ['unknown1@email.com', 'unknown2@email.com']:
+                res_fail = self.client.post(reverse('login'), data={
+                    'email': email,
+                    'password': test_user_2['password'],
+                })
+                self.assertEqual(
+                    res_fail.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertLessEqual(make.call_count, 1)
+            dummy_hash = get_dummy_password_hash()
+            with override_settings(ARGON2_PASSWORD_HASHER=dict(
+                settings.ARGON2_PASSWORD_HASHER, time_cost=1,
+            )):
+                self.assertNotEqual(get_dummy_password_hash(), dummy_hash)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    @override_settings(
+        CRYPTO_EXECUTOR=dict(settings.CRYPTO_EXECUTOR, ENABLED=False))
+    def test_calibrate_argon2(self):
+        out = StringIO()
+        with TemporaryDirectory() as directory:
+            env_file = os.path.join(directory, 'api.env')
+            with open(env_file, 'w') as f:
+                f.write('DEBUG=False\nARGON2_PASSWORD_HASHER_TIME_COST=2\n')
+            call_command(
+                'calibrate_argon2', target_ms=1000, parallelism=1,
+                min_memory=8, max_memory=64, samples=1, write=env_file,
+                stdout=out,)
+            with open(env_file) as f:
+                self.assertEqual(f.read(), (
+                    'DEBUG=False\n'
+                    'ARGON2_PASSWORD_HASHER_TIME_COST=10\n'
+                    'ARGON2_PASSWORD_HASHER_MEMORY_COST=64\n'
+                    'ARGON2_PASSWORD_HASHER_PARALLELISM=1\n'))
+        self.assertIn('Recommended settings:', out.getvalue())
+
+        # Hashes made with other costs are upgraded on the next login
+        user = create_user(test_user_1)
+        with override_settings(ARGON2_PASSWORD_HASHER=dict(
+            time_cost=10, memory_cost=64, parallelism=1,
+        )):
+            response = self.client.post(reverse('login'), data={
+                'email': test_user_1['email'],
+                'password': test_user_1['password'],
+            })
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            user.refresh_from_db()
+            self.assertIn('$m=64,t=10,p=1$', user.password)
+            self.assertTrue(user.check_password(test_user_1['password']))
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_async_throttle(self):
+        # Sync and async views count requests in the same history
+        client_ip = '127.0.0.1'
+        athrottle = async_to_sync(athrottle_command)
+        for _ in range(7):
+            self.assertFalse(throttle_command(AuthCommands.LOGIN, client_ip))
+            self.assertFalse(athrottle(AuthCommands.LOGIN, client_ip))
+        self.assertFalse(throttle_command(AuthCommands.LOGIN, client_ip))
+        self.assertTrue(athrottle(AuthCommands.LOGIN, client_ip))
+        self.assertTrue(throttle_command(AuthCommands.LOGIN, client_ip))
+        self.assertEqual(len(cache.get(
+            f'throttle_login_{client_ip}_15_m')), 15)
+        self.assertEqual(len(cache.get(
+            f'throttle_login_{client_ip}_60_d')), 17)
+
+        # Only the first throttled request is logged
+        self.assertEqual(StatusLog.objects.using('logger').count(), 1)
+        log = StatusLog.objects.using('logger').first()
+        self.assertRegex(
+            log.msg, log_msg_regex('Client was throttled.', LogLevels.ERROR))
+
+    def test_login_throttle_error(self):
+        # Failing to read the throttle history is logged like other errors
+        with patch(
+            'authentication.api.athrottle_command',
+            side_effect=ConnectionError('redis'),
+        ):
+            res_fail = self.client.post(reverse('login'), data={
+                'email': test_user_1['email'],
+                'password': test_user_1['password'],
+            })
+        self.assertEqual(res_fail.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 1)
+        log = StatusLog.objects.using('logger').first()
+        self.assertRegex(
+            log.msg, log_msg_regex('User login error.', LogLevels.ERROR))
+
     def test_login_fail_lockout(self):
         user = create_user()
 
@@ -515,6 +760,7 @@ class AuthenticationTest(APITestCase):
         now = datetime.now()
         freezer = freeze_time(timedelta(minutes=5))
         freezer.start()
+        self.addCleanup(freezer.stop)
         self.assertAlmostEqual(
             datetime.now().timestamp(), now.timestamp() + 300, 3,)
         login_3 = self.client.post(reverse('login'), data={
@@ -0,0 +1,283 @@
+'''
+Benchmarks of concurrent request throughput of the hot views under ASGI.
+
+    python -m benchmarks.asgi [--concurrency 1 8 32] [--output results.json]
+        [--baseline previous.json] [--threshold 0.2] [--crypto-executor]
+
+Requests are sent straight to `simplepasswords_api.asgi.application` from a
+single event loop, the way daphne does, so the results leave out the server
+and the network. Each benchmark keeps `concurrency` requests in flight for
+`--min-time` seconds. Runs against SQLite databases in a temporary directory
+and a local memory cache (see `benchmarks.settings`). Results are written in
+the format of `benchmarks.crypto`, with the requests per second of each
+benchmark, and compared against a baseline the same way.
+
+Password hashing and key derivation run in the request threads, unless
+`--crypto-executor` sends them to the crypto process pool (see
+`utils.executor`). Comparing the two runs shows what the pool is worth on
+the host's cores.
+'''
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+
+from datetime import datetime, timezone
+from itertools import count
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+_db_dir = TemporaryDirectory(prefix='benchmark-asgi-')
+os.environ['BENCHMARK_DB_DIR'] = _db_dir.name
+
+from benchmarks.crypto import (
+    create_tables, find_regressions, percentile, random_value,)
+
+import django
+
+from django.conf import settings
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+from knox.models import AuthToken
+
+from entries.crypto import get_data_key
+from entries.imports import import_entries
+from entries.vaults import ServerVault
+from simplepasswords_api.asgi import application
+from utils.executor import crypto_executor
+from utils.testing import create_user, test_user_1
+
+
+CONCURRENCY = [1, 8, 32]
+
+# Every request comes from a new address, so that no throttle history grows
+# over the run
+_addresses = count(1)
+
+
+def next_address():
+    n = next(_addresses)
+    return f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'
+
+
+async def request(method, path, data=None, token=None):
+    '''
+    Send one request to the ASGI application, and return its status code.
+    '''
+    body = b'' if data is None else json.dumps(data).encode('utf-8')
+    headers = [
+        (b'host', b'localhost'),
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('ascii')),
+    ]
+    if token:
+        headers.append((b'authorization', f'Token {token}'.encode('ascii')))
+    scope = dict(
+        type='http',
+        asgi=dict(version='3.0'),
+        http_version='1.1',
+        method=method,
+        scheme='http',
+        path=path,
+        raw_path=path.encode('utf-8'),
+        query_string=b'',
+        root_path='',
+        headers=headers,
+        client=(next_address(), 50000),
+        server=('localhost', 80),)
+
+    messages = [dict(type='http.request', body=body, more_body=False)]
+    response = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client stays connected until the response is sent
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    await application(scope, receive, send)
+    return response.get('status')
+
+
+def benchmark_views(options):
+    user = create_user(test_user_1)
+    password = test_user_1['password']
+    import_entries(user, ServerVault(get_data_key(user, password)), (
+        dict(title=f'Entry {i}', value=random_value(64)) \
+        for i in range(options.vault_size)
+    ))
+    slug = user.entries.values_list('slug', flat=True)[0]
+    token = AuthToken.objects.create(user)[1]
+
+    async def login():
+        return await request('POST', reverse('login'), dict(
+            email=test_user_1['email'], password=password,))
+
+    async def retrieve():
+        return await request(
+            'POST', reverse('entry-retrieve', kwargs={ 'slug': slug }),
+            dict(password=password), token,)
+
+    async def retrieve_user():
+        return await request('GET', reverse('users'), token=token)
+
+    async def list_entries():
+        return await request('GET', reverse('entry-list'), token=token)
+
+    async def create():
+        return await request('POST', reverse('entry-list'), dict(
+            title='Benchmark', value=random_value(64), password=password,
+        ), token,)
+
+    yield 'LoginAPI', login, 200
+    yield 'RetrieveEntryAPI', retrieve, 200
+    yield 'UserAPI.retrieve', retrieve_user, 200
+    yield 'ListCreateEntriesAPI.list', list_entries, 200
+    yield 'ListCreateEntriesAPI.create', create, 201
+
+
+async def measure(operation, expected_status, concurrency, min_time):
+    samples = []
+    shed = []
+    started = perf_counter()
+    deadline = started + min_time
+
+    async def client():
+        while perf_counter() < deadline:
+            start = perf_counter()
+            status = await operation()
+            # Load shed by admission control is counted, not measured
+            if status == 503:
+                shed.append(perf_counter() - start)
+                continue
+            assert status == expected_status, status
+            samples.append(perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+
+    samples.sort()
+    return dict(
+        concurrency=concurrency,
+        requests=len(samples),
+        shed=len(shed),
+        p50_ms=percentile(samples, 50) * 1000,
+        p99_ms=percentile(samples, 99) * 1000,
+        requests_per_sec=len(samples) / elapsed,)
+
+
+async def run(benchmarks, options):
+    results = {}
+    for name, operation, expected_status in benchmarks:
+        if options.filter not in name:
+            continue
+        # Warm up the view's code paths and caches
+        await operation()
+        for concurrency in options.concurrency:
+            key = f'{name}/{concurrency}'
+            results[key] = await measure(
+                operation, expected_status, concurrency, options.min_time)
+            print(
+                f"{key}: p50 {results[key]['p50_ms']:.3f} ms, "
+                f"p99 {results[key]['p99_ms']:.3f} ms, "
+                f"{results[key]['requests_per_sec']:.1f} req/s, "
+                f"{results[key]['shed']} shed",
+                file=sys.stderr,)
+    return results
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.asgi',
+        description='Benchmark concurrent request throughput under ASGI.',)
+    parser.add_argument(
+        '--output', help='Write results to this file instead of stdout.')
+    parser.add_argument(
+        '--baseline', help='Results of a previous run to compare against.')
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='Maximum allowed p50 regression against the baseline, as a '
+        'fraction (default: 0.2).',)
+    parser.add_argument(
+        '--min-time', type=float, default=3.0,
+        help='Seconds spent on each concurrency level (default: 3.0).',)
+    parser.add_argument(
+        '--concurrency', type=int, nargs='+', default=CONCURRENCY,
+        help='Numbers of requests kept in flight.',)
+    parser.add_argument(
+        '--vault-size', type=int, default=100,
+        help='Number of entries of the benchmark user (default: 100).',)
+    parser.add_argument(
+        '--filter', default='',
+        help='Only run benchmarks whose name contains this string.',)
+    parser.add_argument(
+        '--crypto-executor', action='store_true',
+        help='Run password hashing and key derivation in the crypto process '
+        'pool, instead of the request threads.',)
+    parser.add_argument(
+        '--crypto-workers', type=int,
+        default=settings.CRYPTO_EXECUTOR['MAX_WORKERS'],
+        help='Processes in the crypto pool (default: '
+        f"{settings.CRYPTO_EXECUTOR['MAX_WORKERS']}).",)
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    options = parse_args(args)
+    executor_settings = dict(
+        ENABLED=options.crypto_executor, MAX_WORKERS=options.crypto_workers,)
+    create_tables()
+    with override_settings(CRYPTO_EXECUTOR=executor_settings):
+        benchmarks = list(benchmark_views(options))
+        # Requests open their own connections in the threads which serve them
+        connections.close_all()
+        try:
+            results = asyncio.run(run(benchmarks, options))
+        finally:
+            crypto_executor.shutdown()
+
+    report = dict(
+        meta=dict(
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            python=platform.python_version(),
+            django=django.get_version(),
+            machine=platform.machine(),
+            processor=platform.processor(),
+            cpu_count=os.cpu_count(),
+            crypto_executor=executor_settings,),
+        results=results,)
+
+    regressions = []
+    if options.baseline:
+        with open(options.baseline) as baseline:
+            regressions = find_regressions(
+                results, json.load(baseline), options.threshold)
+        report['threshold'] = options.threshold
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2) + '\n'
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+    for regression in regressions:
+        print(
+            f"Regression: {regression['name']} p50 "
+            f"{regression['baseline_p50_ms']:.3f} ms -> "
+            f"{regression['p50_ms']:.3f} ms "
+            f"(+{regression['change']:.0%})",
+            file=sys.stderr,)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
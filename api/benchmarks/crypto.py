@@ -0,0 +1,303 @@
+'''
+Benchmarks for the cryptographic hot path of the entries API.
+
+    python -m benchmarks.crypto [--output results.json]
+        [--baseline previous.json] [--threshold 0.2]
+
+Runs against in-memory SQLite databases and a local memory cache (see
+`benchmarks.settings`), so neither Postgres nor Redis is needed. Every
+benchmark runs in a single thread, so its ops/sec is per core. Results are
+written as JSON keyed by benchmark name, so runs can be diffed between
+releases, along with the stored size in bytes of an entry value of each
+size. Given a baseline, the run fails if any benchmark's p50 latency
+regressed by more than the threshold.
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+
+from datetime import datetime, timezone
+from math import ceil
+from secrets import token_urlsafe
+from time import perf_counter
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+
+import django
+
+django.setup()
+
+from cryptocode import decrypt, encrypt
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from knox.models import AuthToken
+from rest_framework.test import APIClient
+
+from entries.ciphers import CryptocodeCipher
+from entries.crypto import (
+    decrypt_value, encrypt_value, generate_data_key, get_data_key,
+    unwrap_data_key, wrap_data_key,)
+from entries.imports import import_entries
+from entries.vaults import ServerVault
+from utils.testing import create_user, test_user_1
+
+
+VALUE_SIZES = [16, 256, 1024, 4096, 16384, 65536]
+VAULT_SIZES = [10, 100, 1000, 10000]
+PASSWORD_CIPHERS = ['scrypt', 'argon2id']
+NEW_PASSWORD = 'pAssw0rd!2'
+
+
+def create_tables():
+    # Postgres-only indexes cannot be built on SQLite, and only matter for
+    # queries over many rows, not for the benchmarked operations
+    for model in apps.get_models():
+        model._meta.indexes = [
+            index for index in model._meta.indexes \
+            if not isinstance(index, PostgresIndex)
+        ]
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    call_command('migrate', database='logger', run_syncdb=True, verbosity=0)
+
+
+def percentile(samples, percent):
+    '''
+    Nearest-rank percentile of already sorted samples.
+    '''
+    rank = max(ceil(percent / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+def measure(operation, min_time, min_iterations=5, max_iterations=10000):
+    samples = []
+    started = perf_counter()
+    while len(samples) < max_iterations and (
+        len(samples) < min_iterations or perf_counter() - started < min_time
+    ):
+        start = perf_counter()
+        operation()
+        samples.append(perf_counter() - start)
+
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return dict(
+        iterations=len(samples),
+        p50_ms=percentile(samples, 50) * 1000,
+        p99_ms=percentile(samples, 99) * 1000,
+        mean_ms=mean * 1000,
+        ops_per_sec=1 / mean,)
+
+
+def random_value(size):
+    return token_urlsafe(size)[:size]
+
+
+def benchmark_primitives(options):
+    password = test_user_1['password']
+    data_key = generate_data_key()
+
+    for size in options.value_sizes:
+        value = random_value(size)
+        legacy_ciphertext = encrypt(value, password)
+        ciphertext = encrypt_value(value, data_key)
+
+        yield f'cryptocode.encrypt/{size}', lambda: encrypt(value, password)
+        yield (
+            f'cryptocode.decrypt/{size}',
+            lambda: decrypt(legacy_ciphertext, password),)
+        yield (
+            f'encrypt_value/{size}',
+            lambda: encrypt_value(value, data_key),)
+        yield (
+            f'decrypt_value/{size}',
+            lambda: decrypt_value(ciphertext, data_key),)
+
+    for cipher in PASSWORD_CIPHERS:
+        with override_settings(DATA_KEY_WRAPPING=dict(
+            settings.DATA_KEY_WRAPPING, CIPHER=cipher,
+        )):
+            vault_key = wrap_data_key(data_key, password)
+            yield (
+                f'wrap_data_key/{cipher}',
+                lambda: wrap_data_key(data_key, password),)
+            yield (
+                f'unwrap_data_key/{cipher}',
+                lambda: unwrap_data_key(vault_key, password),)
+
+    encoded = make_password(password)
+    yield 'check_password', lambda: check_password(password, encoded)
+
+
+def ciphertext_sizes(options):
+    data_key = generate_data_key()
+    password = test_user_1['password']
+    return {
+        f'{name}/{size}': len(encrypt(random_value(size)))
+        for size in options.value_sizes
+        for name, encrypt in (
+            ('encrypt_value', lambda value: encrypt_value(value, data_key)),
+            ('cryptocode.encrypt', lambda value: CryptocodeCipher().pack(
+                CryptocodeCipher().encrypt(value, password))),
+        )
+    }
+
+
+def benchmark_endpoints(options):
+    for vault_size in options.vault_sizes:
+        names = [
+            f'RetrieveEntryAPI/{vault_size}',
+            f'ListCreateEntriesAPI.create/{vault_size}',
+            f'UserSerializer.save.password/{vault_size}',
+        ]
+        # Building a vault is slower than most benchmarks, so skip the ones
+        # which `--filter` would leave unused
+        if not any(options.filter in name for name in names):
+            continue
+
+        user = create_user(dict(
+            test_user_1, email=f'vault{vault_size}@email.com'))
+        password = test_user_1['password']
+        data_key = get_data_key(user, password)
+        import_entries(user, ServerVault(data_key), (
+            dict(title=f'Entry {i}', value=random_value(64)) \
+            for i in range(vault_size)
+        ))
+        slug = user.entries.values_list('slug', flat=True)[0]
+
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {AuthToken.objects.create(user)[1]}')
+
+        def retrieve():
+            response = client.post(
+                reverse('entry-retrieve', kwargs={ 'slug': slug }),
+                { 'password': password },)
+            assert response.status_code == 200, response.data
+
+        def create():
+            response = client.post(reverse('entry-list'), {
+                'title': 'Benchmark',
+                'value': random_value(64),
+                'password': password,
+            })
+            assert response.status_code == 201, response.data
+
+        passwords = [password, NEW_PASSWORD]
+
+        def change_password():
+            current_password, new_password = passwords
+            response = client.patch(
+                f'/api/users/{user.user_slug}/', {
+                    'current_password': current_password,
+                    'password': new_password,
+                    'password_2': new_password,
+                },)
+            assert response.status_code == 200, response.data
+            passwords.reverse()
+
+        yield from zip(names, (retrieve, create, change_password))
+
+
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline['results'].get(name)
+        if not previous:
+            continue
+        change = result['p50_ms'] / previous['p50_ms'] - 1
+        if change > threshold:
+            regressions.append(dict(
+                name=name,
+                baseline_p50_ms=previous['p50_ms'],
+                p50_ms=result['p50_ms'],
+                change=change,))
+    return regressions
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.crypto',
+        description='Benchmark the cryptographic hot path of the entries API.',)
+    parser.add_argument(
+        '--output', help='Write results to this file instead of stdout.')
+    parser.add_argument(
+        '--baseline', help='Results of a previous run to compare against.')
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='Maximum allowed p50 regression against the baseline, as a '
+        'fraction (default: 0.2).',)
+    parser.add_argument(
+        '--min-time', type=float, default=1.0,
+        help='Minimum seconds spent on each benchmark (default: 1.0).',)
+    parser.add_argument(
+        '--value-sizes', type=int, nargs='+', default=VALUE_SIZES)
+    parser.add_argument(
+        '--vault-sizes', type=int, nargs='+', default=VAULT_SIZES)
+    parser.add_argument(
+        '--filter', default='',
+        help='Only run benchmarks whose name contains this string.',)
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    options = parse_args(args)
+    create_tables()
+
+    results = {}
+    for benchmarks in (benchmark_primitives, benchmark_endpoints):
+        for name, operation in benchmarks(options):
+            if options.filter not in name:
+                continue
+            results[name] = measure(operation, options.min_time)
+            print(
+                f"{name}: p50 {results[name]['p50_ms']:.3f} ms, "
+                f"p99 {results[name]['p99_ms']:.3f} ms, "
+                f"{results[name]['ops_per_sec']:.1f} ops/s",
+                file=sys.stderr,)
+
+    report = dict(
+        meta=dict(
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            python=platform.python_version(),
+            django=django.get_version(),
+            machine=platform.machine(),
+            processor=platform.processor(),
+            cpu_count=os.cpu_count(),),
+        results=results,
+        sizes=ciphertext_sizes(options),)
+
+    regressions = []
+    if options.baseline:
+        with open(options.baseline) as baseline:
+            regressions = find_regressions(
+                results, json.load(baseline), options.threshold)
+        report['threshold'] = options.threshold
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2) + '\n'
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+    for regression in regressions:
+        print(
+            f"Regression: {regression['name']} p50 "
+            f"{regression['baseline_p50_ms']:.3f} ms -> "
+            f"{regression['p50_ms']:.3f} ms "
+            f"(+{regression['change']:.0%})",
+            file=sys.stderr,)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+'''
+Settings for running benchmarks locally, without Postgres or Redis. Reads
+the same environment as simplepasswords_api.settings, and only replaces the
+databases, cache, email and logging with local ones and disables
+throttling.
+'''
+from simplepasswords_api.settings import *
+
+
+DEBUG = False
+DJANGO_ENV = 'benchmark'
+
+# In-memory SQLite databases belong to a single connection, so benchmarks
+# which serve requests from several threads use files in this directory
+BENCHMARK_DB_DIR = os.environ.get('BENCHMARK_DB_DIR')
+
+DATABASES = {
+    alias: {
+        'ENGINE': 'benchmarks.sqlite3',
+        'NAME': os.path.join(BENCHMARK_DB_DIR, f'{alias}.sqlite3'),
+        'OPTIONS': {
+            'timeout': 30,
+        },
+    } if BENCHMARK_DB_DIR else {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    } for alias in ('default', 'logger')
+}
+
+
+class DisableMigrations(object):
+    '''
+    Build tables straight from the models, since some migrations only run on
+    Postgres.
+    '''
+
+    def __contains__(self, app_label):
+        return True
+
+    def __getitem__(self, app_label):
+        return None
+
+
+MIGRATION_MODULES = DisableMigrations()
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'level': 'ERROR',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'ERROR',
+    },
+}
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_THROTTLE_RATES={
+        'default': ['1000000/s'],
+    },
+    NUM_PROXIES=0,)
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+EMAIL_SUBJECT_PREFIX = '[SimplePasswords Benchmark] '
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
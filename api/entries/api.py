@@ -1,50 +1,91 @@
+import asyncio
 import logging
 
-from cryptocode import decrypt
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.http.response import Http404
 
 from rest_framework.exceptions import Throttled, ValidationError
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.generics import (
     GenericAPIView,
     ListCreateAPIView,
     UpdateAPIView,)
 from rest_framework.mixins import DestroyModelMixin
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import HTTP_201_CREATED
+from rest_framework.views import APIView
 
-from entries.serializers import EntrySerializer, ListEntrySerializer
+from authentication.reauth import check_request_password
+from entries.exports import (
+    EXPORT_CONTENT_TYPES, EntryExport, EntryExportResponse,)
+from entries.filters import TrigramSearchFilter
+from entries.imports import (
+    import_entries, normalize_import_row, read_csv_rows, read_json_rows,)
+from entries.list_cache import EntryListCache
+from entries.models import EntryTombstone
+from entries.pagination import EntryCursorPagination
+from entries.serializers import (
+    EntrySerializer, ExportEntriesSerializer, ImportEntriesSerializer,
+    ListEntrySerializer, RetrieveEntriesSerializer, SyncEntrySerializer,
+    VaultModeSerializer,)
+from entries.sync import sync_entries
 from entries.utils import EntryCommands
+from entries.vaults import (
+    get_request_vault, has_client_vault, switch_vault_mode,)
 from utils import parse_request_metadata
-from utils.exceptions import RequestError
-from utils.throttling import throttle_command
+from utils.admission import crypto_slot
+from utils.conditional import conditional_etag
+from utils.exceptions import RequestError, SyncCursorExpired, VaultChanged
+from utils.idempotency import idempotent
+from utils.throttling import athrottle_command, throttle_command
+from utils.views import AsyncAPIViewMixin
 
 
 logger = logging.getLogger(__name__)
 
-class ListCreateEntriesAPI(ListCreateAPIView):
+class ListCreateEntriesAPI(AsyncAPIViewMixin, ListCreateAPIView):
     permission_classes = [IsAuthenticated]
-    filter_backends = [OrderingFilter, SearchFilter]
+    filter_backends = [OrderingFilter, TrigramSearchFilter]
+    pagination_class = EntryCursorPagination
     search_fields = ['title']
     ordering_fields = ['created_at']
     ordering = '-created_at'
 
     def get_queryset(self):
-        return self.request.user.entries.all()
+        # Only the columns covered by `entry_user_created_cover_idx`. The
+        # related manager reads `user_id` from every row it returns.
+        return self.request.user.entries.only(
+            'user', 'slug', 'title', 'created_at',)
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return EntrySerializer
         return ListEntrySerializer
 
-    def create(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
+        return await self.list(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        # A failed throttle check is raised, and logged, by `create`
         try:
-            if throttle_command(
+            throttled = await athrottle_command(
                 EntryCommands.CREATE_ENTRY,
                 request.META['CLIENT_IP'],
-                request,
-            ):
+                request,)
+        except Exception as e:
+            throttled = e
+        return await sync_to_async(self.create)(
+            request, *args, throttled=throttled, **kwargs)
+
+    @idempotent
+    def create(self, request, *args, throttled=False, **kwargs):
+        try:
+            if isinstance(throttled, Exception):
+                raise throttled
+            if throttled:
                 raise Throttled()
 
             serializer = self.get_serializer(data=request.data)
@@ -55,7 +96,7 @@ class ListCreateEntriesAPI(ListCreateAPIView):
                 serializer.data, status=HTTP_201_CREATED,
                 headers=self.get_success_headers(serializer.data),)
             return response
-        except (Throttled, ValidationError) as e:
+        except (Throttled, ValidationError, VaultChanged) as e:
             raise e
         except Exception as e:
             logger.exception('Error creating entry.', exc_info=e, extra={
@@ -66,15 +107,78 @@ class ListCreateEntriesAPI(ListCreateAPIView):
             })
             raise RequestError('Error creating entry.')
 
+    @conditional_etag(EntryListCache.aetag)
+    async def list(self, request, *args, **kwargs):
+        data = await sync_to_async(EntryListCache.get_or_set)(
+            request, lambda: super(ListCreateEntriesAPI, self).list(
+                request, *args, **kwargs).data,)
+        return Response(data)
+
     def perform_create(self, serializer):
         instance = serializer.save()
+        EntryListCache.invalidate(self.request.user)
         return ListEntrySerializer(instance)
 
 
-class RetrieveEntryAPI(GenericAPIView):
+class EntryListCacheStatsAPI(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(EntryListCache.stats())
+
+
+class ImportEntriesAPI(GenericAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = EntrySerializer
-    lookup_field = 'slug'
+    parser_classes = [JSONParser, MultiPartParser]
+    serializer_class = ImportEntriesSerializer
+
+    def post(self, request, *args, **kwargs):
+        try:
+            if throttle_command(
+                EntryCommands.IMPORT_ENTRIES,
+                request.META['CLIENT_IP'],
+                request,
+            ):
+                raise Throttled()
+
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            password = serializer.validated_data.get('password')
+
+            if 'file' in serializer.validated_data:
+                file = serializer.validated_data['file']
+                if file.name.lower().endswith('.json'):
+                    rows = read_json_rows(file)
+                else:
+                    rows = read_csv_rows(file)
+            else:
+                rows = map(
+                    normalize_import_row, serializer.validated_data['entries'])
+
+            vault = get_request_vault(request, password)
+            try:
+                created, errors = import_entries(request.user, vault, rows)
+            finally:
+                # Batches are kept even if a later one fails
+                EntryListCache.invalidate(request.user)
+
+            return Response(
+                dict(created=created, errors=errors), status=HTTP_201_CREATED,)
+        except (Throttled, ValidationError, VaultChanged) as e:
+            raise e
+        except Exception as e:
+            logger.exception('Error importing entries.', exc_info=e, extra={
+                'user': request.user.user_slug,
+                'command': EntryCommands.IMPORT_ENTRIES,
+                'client_ip': request.META['CLIENT_IP'],
+                'metadata': parse_request_metadata(request),
+            })
+            raise RequestError('Error importing entries.')
+
+
+class ExportEntriesAPI(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ExportEntriesSerializer
 
     def get_queryset(self):
         return self.request.user.entries.all()
@@ -82,20 +186,84 @@ class RetrieveEntryAPI(GenericAPIView):
     def post(self, request, *args, **kwargs):
         try:
             if throttle_command(
-                EntryCommands.RETRIEVE_ENTRY,
+                EntryCommands.EXPORT_ENTRIES,
                 request.META['CLIENT_IP'],
                 request,
             ):
                 raise Throttled()
 
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            format = serializer.validated_data['format']
+            passphrase = serializer.validated_data.get('passphrase')
+            password = serializer.validated_data.get('password')
+
+            vault = get_request_vault(request, password)
+            export = EntryExport(
+                self.get_queryset(), vault, format, passphrase,)
+
+            filename = f'simplepasswords-export.{format}'
+            content_type = EXPORT_CONTENT_TYPES[format]
+            if passphrase:
+                filename += '.enc'
+                content_type = 'application/octet-stream'
+
+            return EntryExportResponse(
+                export, content_type=content_type, headers={
+                    'Content-Disposition': f'attachment; filename="{filename}"',
+                },)
+        except (Throttled, ValidationError) as e:
+            raise e
+        except Exception as e:
+            logger.exception('Error exporting entries.', exc_info=e, extra={
+                'user': request.user.user_slug,
+                'command': EntryCommands.EXPORT_ENTRIES,
+                'client_ip': request.META['CLIENT_IP'],
+                'metadata': parse_request_metadata(request),
+            })
+            raise RequestError('Error exporting entries.')
+
+
+class RetrieveEntryAPI(AsyncAPIViewMixin, GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = EntrySerializer
+    lookup_field = 'slug'
+
+    def get_queryset(self):
+        return self.request.user.entries.select_related('secret')
+
+    async def post(self, request, *args, **kwargs):
+        # The throttle history and the entry are independent, so they are
+        # read concurrently. Whichever fails is raised in the original order.
+        throttled, instance = await asyncio.gather(
+            athrottle_command(
+                EntryCommands.RETRIEVE_ENTRY,
+                request.META['CLIENT_IP'],
+                request,),
+            self.aget_object(),
+            return_exceptions=True,)
+        return await sync_to_async(self.retrieve)(request, throttled, instance)
+
+    def retrieve(self, request, throttled, instance):
+        try:
+            if isinstance(throttled, Exception):
+                raise throttled
+            if throttled:
+                raise Throttled()
+
             user = request.user
-            password = request.data.pop('password')
+            password = None
 
-            if not user.check_password(password):
-                raise ValidationError({ 'password': ['Invalid password.'] })
+            # Client-side encrypted values are returned as they are stored
+            if not has_client_vault(user):
+                password = request.data.pop('password')
+                if not check_request_password(request, password):
+                    raise ValidationError({ 'password': ['Invalid password.'] })
 
-            instance = self.get_object()
-            instance.value = decrypt(instance.value, password)
+            if isinstance(instance, Exception):
+                raise instance
+            vault = get_request_vault(request, password)
+            instance.value = vault.from_secret(instance.secret.value)
 
             serializer = self.get_serializer(instance)
             return Response(serializer.data)
@@ -111,6 +279,80 @@ class RetrieveEntryAPI(GenericAPIView):
             raise RequestError('Error retrieving entry.')
 
 
+class RetrieveEntriesAPI(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = RetrieveEntriesSerializer
+
+    def get_queryset(self):
+        return self.request.user.entries.select_related('secret')
+
+    def post(self, request, *args, **kwargs):
+        try:
+            if throttle_command(
+                EntryCommands.RETRIEVE_ENTRIES,
+                request.META['CLIENT_IP'],
+                request,
+            ):
+                raise Throttled()
+
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            slugs = serializer.validated_data['slugs']
+            password = serializer.validated_data.get('password')
+
+            # One password check and one key derivation for every entry
+            vault = get_request_vault(request, password)
+            instances = list(self.get_queryset().filter(slug__in=slugs))
+            for instance in instances:
+                instance.value = vault.from_secret(instance.secret.value)
+
+            return Response(EntrySerializer(instances, many=True).data)
+        except (Throttled, ValidationError) as e:
+            raise e
+        except Exception as e:
+            logger.exception('Error retrieving entries.', exc_info=e, extra={
+                'user': request.user.user_slug,
+                'command': EntryCommands.RETRIEVE_ENTRIES,
+                'client_ip': request.META['CLIENT_IP'],
+                'metadata': parse_request_metadata(request),
+            })
+            raise RequestError('Error retrieving entries.')
+
+
+class SyncEntriesAPI(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = SyncEntrySerializer
+
+    def get(self, request, *args, **kwargs):
+        try:
+            if throttle_command(
+                EntryCommands.SYNC_ENTRIES,
+                request.META['CLIENT_IP'],
+                request,
+            ):
+                raise Throttled()
+
+            try:
+                changes = sync_entries(
+                    request.user, request.query_params.get('cursor'))
+            except ValueError:
+                raise ValidationError({ 'cursor': ['Invalid cursor.'] })
+
+            changes['entries'] = self.get_serializer(
+                changes['entries'], many=True).data
+            return Response(changes)
+        except (SyncCursorExpired, Throttled, ValidationError) as e:
+            raise e
+        except Exception as e:
+            logger.exception('Error syncing entries.', exc_info=e, extra={
+                'user': request.user.user_slug,
+                'command': EntryCommands.SYNC_ENTRIES,
+                'client_ip': request.META['CLIENT_IP'],
+                'metadata': parse_request_metadata(request),
+            })
+            raise RequestError('Error syncing entries.')
+
+
 class UpdateEntryAPI(UpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = EntrySerializer
@@ -119,6 +361,7 @@ class UpdateEntryAPI(UpdateAPIView):
     def get_queryset(self):
         return self.request.user.entries.all()
 
+    @idempotent
     def update(self, request, *args, **kwargs):
         try:
             if throttle_command(
@@ -128,7 +371,7 @@ class UpdateEntryAPI(UpdateAPIView):
             ):
                 raise Throttled()
             return super().update(request, *args, **kwargs)
-        except (Http404, Throttled, ValidationError) as e:
+        except (Http404, Throttled, ValidationError, VaultChanged) as e:
             raise e
         except Exception as e:
             logger.exception('Error updating entry.', exc_info=e, extra={
@@ -139,6 +382,10 @@ class UpdateEntryAPI(UpdateAPIView):
             })
             raise RequestError('Error updating entry.')
 
+    def perform_update(self, serializer):
+        serializer.save()
+        EntryListCache.invalidate(self.request.user)
+
 
 class DestroyEntryAPI(DestroyModelMixin, GenericAPIView):
     permission_classes = [IsAuthenticated]
@@ -148,6 +395,7 @@ class DestroyEntryAPI(DestroyModelMixin, GenericAPIView):
     def get_queryset(self):
         return self.request.user.entries.all()
 
+    @idempotent
     def post(self, request, *args, **kwargs):
         try:
             if throttle_command(
@@ -157,10 +405,9 @@ class DestroyEntryAPI(DestroyModelMixin, GenericAPIView):
             ):
                 raise Throttled()
 
-            user = request.user
             password = request.data.pop('password')
 
-            if not user.check_password(password):
+            if not check_request_password(request, password):
                 raise ValidationError('Invalid password.')
 
             return super().destroy(request, *args, **kwargs)
@@ -173,4 +420,48 @@ class DestroyEntryAPI(DestroyModelMixin, GenericAPIView):
                 'client_ip': request.META['CLIENT_IP'],
                 'metadata': parse_request_metadata(request),
             })
-            raise RequestError('Error destroying entry.')
\ No newline at end of file
+            raise RequestError('Error destroying entry.')
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            EntryTombstone.objects.create(
+                user=self.request.user, slug=instance.slug)
+            instance.delete()
+        EntryListCache.invalidate(self.request.user)
+
+
+class VaultModeAPI(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = VaultModeSerializer
+
+    def post(self, request, *args, **kwargs):
+        try:
+            if throttle_command(
+                EntryCommands.SWITCH_VAULT_MODE,
+                request.META['CLIENT_IP'],
+                request,
+            ):
+                raise Throttled()
+
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            with crypto_slot(request):
+                switch_vault_mode(
+                    request.user,
+                    serializer.validated_data['mode'],
+                    serializer.validated_data['password'],
+                    serializer.validated_data['entries'],)
+
+            return Response(dict(
+                mode=request.user.vault_mode,
+                updated=len(serializer.validated_data['entries']),))
+        except (Throttled, ValidationError, VaultChanged) as e:
+            raise e
+        except Exception as e:
+            logger.exception('Error switching vault mode.', exc_info=e, extra={
+                'user': request.user.user_slug,
+                'command': EntryCommands.SWITCH_VAULT_MODE,
+                'client_ip': request.META['CLIENT_IP'],
+                'metadata': parse_request_metadata(request),
+            })
+            raise RequestError('Error switching vault mode.')
@@ -0,0 +1,242 @@
+import hashlib
+
+from abc import ABC, abstractmethod
+from base64 import b64decode, b64encode
+from os import urandom
+
+from argon2.low_level import Type, hash_secret_raw
+from cryptocode import decrypt, encrypt
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+
+from utils.executor import crypto_executor
+
+
+# Every ciphertext starts with the version of the cipher that produced it,
+# e.g. 'scrypt$n=16384,r=8,p=1$<salt>$<payload>' or 'dek1$<payload>'.
+# Legacy cryptocode ciphertexts predate versioning and contain no separator.
+CIPHER_SEPARATOR = '$'
+NONCE_LENGTH = 12
+SALT_LENGTH = 16
+
+# Entry values are stored as bytes instead: a one byte layout version
+# followed by the raw fields of the ciphertext, without base64 or separators.
+CIPHERS = {}
+BINARY_CIPHERS = {}
+
+
+class CipherError(Exception):
+    pass
+
+
+def register_cipher(cipher_class):
+    CIPHERS[cipher_class.version] = cipher_class()
+    return cipher_class
+
+
+def register_binary_cipher(cipher_class):
+    BINARY_CIPHERS[cipher_class.binary_version] = cipher_class()
+    return cipher_class
+
+
+def get_cipher(ciphertext):
+    if CIPHER_SEPARATOR not in ciphertext:
+        return CIPHERS[CryptocodeCipher.version]
+    version = ciphertext.split(CIPHER_SEPARATOR, 1)[0]
+    try:
+        return CIPHERS[version]
+    except KeyError:
+        raise CipherError(f"Unknown cipher version '{version}'")
+
+
+def get_binary_cipher(ciphertext):
+    # Databases may return a memoryview, whose items are not always ints
+    try:
+        return BINARY_CIPHERS[bytes(ciphertext[:1])[0]]
+    except (IndexError, KeyError):
+        raise CipherError('Unknown binary cipher version.')
+
+
+def get_password_cipher():
+    return CIPHERS[settings.DATA_KEY_WRAPPING['CIPHER']]
+
+
+class Cipher(object):
+    '''
+    Ciphers in `CIPHERS` implement `encrypt` and `decrypt` of text
+    ciphertexts, and those in `BINARY_CIPHERS` `encrypt_binary` and
+    `decrypt_binary` of binary ones.
+    '''
+    version = None
+    binary_version = None
+
+    def needs_upgrade(self, ciphertext):
+        return False
+
+
+class AEADCipher(Cipher):
+    '''
+    AES-256-GCM under a raw 32 byte key.
+    '''
+
+    def seal_raw(self, plaintext, key):
+        nonce = urandom(NONCE_LENGTH)
+        return nonce + AESGCM(key).encrypt(nonce, plaintext.encode('utf-8'), None)
+
+    def open_raw(self, payload, key):
+        nonce, ciphertext = payload[:NONCE_LENGTH], payload[NONCE_LENGTH:]
+        try:
+            return AESGCM(key).decrypt(nonce, ciphertext, None).decode('utf-8')
+        except InvalidTag:
+            raise CipherError('Unable to decrypt ciphertext.')
+
+    def seal(self, plaintext, key):
+        return b64encode(self.seal_raw(plaintext, key)).decode('utf-8')
+
+    def open(self, payload, key):
+        return self.open_raw(b64decode(payload), key)
+
+
+@register_binary_cipher
+class DataKeyCipher(AEADCipher):
+    '''
+    Entry values, encrypted under the user's data key and stored as
+    `<version><nonce><ciphertext and tag>`.
+    '''
+    version = 'dek1'
+    binary_version = 1
+
+    def encrypt_binary(self, plaintext, key):
+        return bytes([self.binary_version]) + self.seal_raw(plaintext, key)
+
+    def decrypt_binary(self, ciphertext, key):
+        return self.open_raw(bytes(ciphertext[1:]), key)
+
+
+class PasswordCipher(AEADCipher, ABC):
+    '''
+    AES-256-GCM under a key derived from a password. The KDF parameters are
+    stored with each ciphertext, so they can be tuned per deployment without
+    breaking existing ciphertexts, which are upgraded the next time they are
+    decrypted.
+    '''
+    settings_key = None
+
+    def params(self):
+        return settings.DATA_KEY_WRAPPING[self.settings_key]
+
+    @abstractmethod
+    def derive_key(self, password, salt, params):
+        pass
+
+    def run_kdf(self, password, salt, params):
+        return crypto_executor.run(self.derive_key, password, salt, params)
+
+    def encrypt(self, plaintext, key):
+        params = self.params()
+        salt = urandom(SALT_LENGTH)
+        return CIPHER_SEPARATOR.join([
+            self.version,
+            ','.join(f'{name}={value}' for name, value in params.items()),
+            b64encode(salt).decode('utf-8'),
+            self.seal(plaintext, self.run_kdf(key, salt, params)),
+        ])
+
+    def parse(self, ciphertext):
+        version, params, salt, payload = ciphertext.split(CIPHER_SEPARATOR)
+        params = dict(param.split('=') for param in params.split(','))
+        params = { name: int(value) for name, value in params.items() }
+        return params, b64decode(salt), payload
+
+    def decrypt(self, ciphertext, key):
+        params, salt, payload = self.parse(ciphertext)
+        return self.open(payload, self.run_kdf(key, salt, params))
+
+    def needs_upgrade(self, ciphertext):
+        return (
+            get_password_cipher() is not self or
+            self.parse(ciphertext)[0] != self.params())
+
+
+@register_cipher
+class ScryptCipher(PasswordCipher):
+    version = 'scrypt'
+    settings_key = 'SCRYPT'
+
+    def derive_key(self, password, salt, params):
+        n, r, p = params['n'], params['r'], params['p']
+        return hashlib.scrypt(
+            password.encode('utf-8'), salt=salt, n=n, r=r, p=p, dklen=32,
+            maxmem=2 * 128 * r * (n + p),)
+
+
+@register_cipher
+class Argon2idCipher(PasswordCipher):
+    version = 'argon2id'
+    settings_key = 'ARGON2ID'
+
+    def derive_key(self, password, salt, params):
+        return hash_secret_raw(
+            password.encode('utf-8'), salt,
+            time_cost=params['time_cost'],
+            memory_cost=params['memory_cost'],
+            parallelism=params['parallelism'],
+            hash_len=32,
+            type=Type.ID,)
+
+
+@register_cipher
+@register_binary_cipher
+class CryptocodeCipher(Cipher):
+    '''
+    Unversioned cryptocode ciphertexts (scrypt with fixed parameters), which
+    can still be read but are always upgraded.
+
+    cryptocode produces `<ciphertext>*<salt>*<nonce>*<tag>` in base64, which
+    is stored in binary as `<version><salt><nonce><tag><ciphertext>`.
+    '''
+    version = 'cryptocode'
+    binary_version = 0
+    # Lengths of the salt, nonce and tag, fixed by cryptocode
+    field_lengths = (16, 16, 16)
+
+    # cryptocode derives a key with scrypt for every value, so it runs in
+    # the crypto executor as well
+
+    def encrypt(self, plaintext, key):
+        return crypto_executor.run(encrypt, plaintext, key)
+
+    def decrypt(self, ciphertext, key):
+        plaintext = crypto_executor.run(decrypt, ciphertext, key)
+        if plaintext is False:
+            raise CipherError('Unable to decrypt ciphertext.')
+        return plaintext
+
+    def pack(self, ciphertext):
+        ciphertext, *fields = [
+            b64decode(field) for field in ciphertext.split('*')
+        ]
+        if [len(field) for field in fields] != list(self.field_lengths):
+            raise CipherError('Invalid cryptocode ciphertext.')
+        return bytes([self.binary_version]) + b''.join(fields) + ciphertext
+
+    def unpack(self, ciphertext):
+        fields = []
+        offset = 1
+        for length in self.field_lengths:
+            fields.append(ciphertext[offset:offset + length])
+            offset += length
+        return '*'.join(
+            b64encode(field).decode('utf-8') \
+            for field in [ciphertext[offset:], *fields]
+        )
+
+    def encrypt_binary(self, plaintext, key):
+        return self.pack(self.encrypt(plaintext, key))
+
+    def decrypt_binary(self, ciphertext, key):
+        return self.decrypt(self.unpack(bytes(ciphertext)), key)
+
+    def needs_upgrade(self, ciphertext):
+        return True
@@ -0,0 +1,146 @@
+from base64 import b64decode, b64encode
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.db import transaction
+from django.db.models import BinaryField
+from django.db.models.functions import Substr
+
+from entries.ciphers import (
+    BINARY_CIPHERS, CipherError, CryptocodeCipher, DataKeyCipher,
+    get_binary_cipher, get_cipher, get_password_cipher,)
+from entries.models import EntrySecret, ReencryptionJob
+from entries.reencryption import (
+    REENCRYPTION_REQUEST_BUDGET, reencrypt_entries,)
+
+
+# Entry values are encrypted under a random per-user data key, which is in
+# turn wrapped by a key derived from the user's password. Changing the
+# password only re-wraps the data key instead of re-encrypting every entry.
+DATA_KEY_PREFIX = bytes([DataKeyCipher.binary_version])
+
+
+class VaultKeyError(Exception):
+    pass
+
+
+def generate_data_key() -> bytes:
+    return AESGCM.generate_key(bit_length=256)
+
+
+def wrap_data_key(data_key: bytes, password: str) -> str:
+    return get_password_cipher().encrypt(
+        b64encode(data_key).decode('utf-8'), password)
+
+
+def unwrap_data_key(vault_key: str, password: str) -> bytes:
+    try:
+        return b64decode(get_cipher(vault_key).decrypt(vault_key, password))
+    except CipherError:
+        raise VaultKeyError('Unable to unwrap vault key.')
+
+
+def is_legacy_ciphertext(ciphertext: bytes) -> bool:
+    return isinstance(get_binary_cipher(ciphertext), CryptocodeCipher)
+
+
+def encrypt_value(value: str, data_key: bytes) -> bytes:
+    return BINARY_CIPHERS[DataKeyCipher.binary_version].encrypt_binary(
+        value, data_key)
+
+
+def decrypt_value(ciphertext: bytes, data_key: bytes) -> str:
+    return get_binary_cipher(ciphertext).decrypt_binary(ciphertext, data_key)
+
+
+def decrypt_legacy_value(ciphertext: bytes, password: str) -> str:
+    return get_binary_cipher(ciphertext).decrypt_binary(ciphertext, password)
+
+
+def reencrypt_legacy_value(
+    value: bytes, password: str, data_key: bytes,
+) -> bytes | None:
+    '''
+    Re-encrypt a legacy value under the data key, or return None if it
+    cannot be decrypted with the password.
+    '''
+    try:
+        plaintext = decrypt_legacy_value(value, password)
+    except CipherError:
+        return None
+    return encrypt_value(plaintext, data_key)
+
+
+def create_data_key(user, password: str) -> bytes:
+    '''
+    Generate and wrap a data key for a user who does not have one yet. If the
+    user has legacy cryptocode entries, a re-encryption job is recorded in
+    the same transaction so that their conversion can be resumed.
+    '''
+    with transaction.atomic():
+        locked_user = type(user).objects.select_for_update().get(pk=user.pk)
+        if locked_user.vault_key:
+            user.vault_key = locked_user.vault_key
+            return unwrap_data_key(user.vault_key, password)
+
+        data_key = generate_data_key()
+        user.vault_key = wrap_data_key(data_key, password)
+        user.save(update_fields=['vault_key', 'updated_at'])
+
+        legacy_entries = legacy_secrets(user).count()
+        if legacy_entries:
+            ReencryptionJob.objects.create(user=user, total=legacy_entries)
+    return data_key
+
+
+def legacy_secrets(user):
+    return EntrySecret.objects.filter(entry__user=user).annotate(
+        binary_version=Substr('value', 1, 1, output_field=BinaryField()),
+    ).filter(binary_version=bytes([CryptocodeCipher.binary_version]))
+
+
+def get_data_key(user, password: str) -> bytes:
+    '''
+    Unwrap the user's data key with their (already verified) password.
+
+    Users created before envelope encryption have no vault key yet, in which
+    case one is generated. Any legacy cryptocode entries are then converted
+    by a resumable re-encryption job, for at most
+    `REENCRYPTION_REQUEST_BUDGET` seconds per call, so a large vault is
+    converted over several requests. A vault key wrapped with an outdated
+    cipher or KDF parameters is re-wrapped.
+    '''
+    if user.vault_key:
+        data_key = unwrap_data_key(user.vault_key, password)
+        if get_cipher(user.vault_key).needs_upgrade(user.vault_key):
+            user.vault_key = wrap_data_key(data_key, password)
+            user.save(update_fields=['vault_key', 'updated_at'])
+    else:
+        data_key = create_data_key(user, password)
+
+    try:
+        job = user.reencryption_job
+    except ReencryptionJob.DoesNotExist:
+        return data_key
+
+    reencrypt_entries(
+        job, legacy_secrets(user), reencrypt_legacy_value, password, data_key,
+        budget=REENCRYPTION_REQUEST_BUDGET,)
+    return data_key
+
+
+def rewrap_data_key(user, current_password: str, new_password: str) -> None:
+    '''
+    Re-wrap the user's data key under a new password. The caller is
+    responsible for saving the user along with the new password hash.
+
+    Legacy entries can only be decrypted with the current password, so a
+    pending conversion is finished first, without a time budget. Entries
+    which it cannot decrypt stay in the job's `failed_entries`.
+    '''
+    data_key = get_data_key(user, current_password)
+    job = ReencryptionJob.objects.filter(user=user).first()
+    if job is not None:
+        reencrypt_entries(
+            job, legacy_secrets(user), reencrypt_legacy_value,
+            current_password, data_key,)
+    user.vault_key = wrap_data_key(data_key, new_password)
@@ -2,17 +2,43 @@ from django.urls import re_path
 
 from entries.api import (
     ListCreateEntriesAPI,
+    EntryListCacheStatsAPI,
+    ExportEntriesAPI,
+    ImportEntriesAPI,
     RetrieveEntryAPI,
+    RetrieveEntriesAPI,
+    SyncEntriesAPI,
     UpdateEntryAPI,
-    DestroyEntryAPI,)
+    DestroyEntryAPI,
+    VaultModeAPI,)
 
 
 urlpatterns = [
     re_path(r'^entries/$', ListCreateEntriesAPI.as_view(), name='entry-list'),
+    re_path(
+        r'^entries_cache_stats/$',
+        EntryListCacheStatsAPI.as_view(),
+        name='entries-cache-stats',),
+    re_path(
+        r'^entries_export/$',
+        ExportEntriesAPI.as_view(),
+        name='entries-export',),
+    re_path(
+        r'^entries_import/$',
+        ImportEntriesAPI.as_view(),
+        name='entries-import',),
     re_path(
         r'^entry_retrieve/(?P<slug>[\w-]{10})/$', 
         RetrieveEntryAPI.as_view(),
         name='entry-retrieve',),
+    re_path(
+        r'^entries_retrieve/$',
+        RetrieveEntriesAPI.as_view(),
+        name='entries-retrieve',),
+    re_path(
+        r'^entries_sync/$',
+        SyncEntriesAPI.as_view(),
+        name='entries-sync',),
     re_path(
         r'^entry_update/(?P<slug>[\w-]{10})/$', 
         UpdateEntryAPI.as_view(),
@@ -21,4 +47,8 @@ urlpatterns = [
         r'^entry_destroy/(?P<slug>[\w-]{10})/$', 
         DestroyEntryAPI.as_view(),
         name='entry-destroy',),
+    re_path(
+        r'^vault_mode/$',
+        VaultModeAPI.as_view(),
+        name='vault-mode',),
 ]
\ No newline at end of file
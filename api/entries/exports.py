@@ -0,0 +1,158 @@
+import csv
+import hashlib
+import json
+
+from base64 import b64decode, b64encode
+from io import StringIO
+from itertools import islice
+from os import urandom
+
+from asgiref.sync import sync_to_async
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.http import StreamingHttpResponse
+
+
+EXPORT_BATCH_SIZE = 500
+EXPORT_FIELDS = ['title', 'value', 'slug', 'created_at']
+EXPORT_FORMAT = 'simplepasswords-export'
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_KDF_PARAMS = dict(n=2 ** 14, r=8, p=1)
+EXPORT_NONCE_PREFIX_LENGTH = 7
+
+
+class ExportCipher(object):
+    '''
+    Encrypts an export as a sequence of base64 lines, one per chunk, under a
+    key derived once from the export passphrase. Each chunk's nonce carries
+    its position and whether it is the last chunk, so chunks cannot be
+    reordered, dropped or truncated without failing authentication.
+    '''
+
+    def __init__(self, passphrase, salt=None, nonce_prefix=None, **kdf_params):
+        self.salt = salt or urandom(16)
+        self.nonce_prefix = nonce_prefix or urandom(EXPORT_NONCE_PREFIX_LENGTH)
+        self.kdf_params = kdf_params or EXPORT_KDF_PARAMS
+        self.counter = 0
+        self.aesgcm = AESGCM(hashlib.scrypt(
+            passphrase.encode('utf-8'), salt=self.salt, dklen=32,
+            **self.kdf_params,))
+
+    def _nonce(self, last):
+        nonce = (
+            self.nonce_prefix + self.counter.to_bytes(4, 'big') +
+            (b'\x01' if last else b'\x00'))
+        self.counter += 1
+        return nonce
+
+    def header(self, content):
+        return json.dumps(dict(
+            format=EXPORT_FORMAT,
+            content=content,
+            kdf='scrypt',
+            salt=b64encode(self.salt).decode('utf-8'),
+            nonce_prefix=b64encode(self.nonce_prefix).decode('utf-8'),
+            **self.kdf_params,
+        )) + '\n'
+
+    def encrypt(self, chunk, last=False):
+        ciphertext = self.aesgcm.encrypt(
+            self._nonce(last), chunk.encode('utf-8'), None)
+        return b64encode(ciphertext).decode('utf-8') + '\n'
+
+    def decrypt(self, line, last=False):
+        return self.aesgcm.decrypt(
+            self._nonce(last), b64decode(line), None).decode('utf-8')
+
+
+def decrypt_export(lines, passphrase):
+    '''
+    Yield the plaintext chunks of an encrypted export.
+    '''
+    lines = iter(lines)
+    header = json.loads(next(lines))
+    cipher = ExportCipher(
+        passphrase,
+        salt=b64decode(header['salt']),
+        nonce_prefix=b64decode(header['nonce_prefix']),
+        n=header['n'], r=header['r'], p=header['p'],)
+
+    previous = next(lines)
+    for line in lines:
+        yield cipher.decrypt(previous)
+        previous = line
+    # The final line must be the (empty) chunk flagged as last
+    cipher.decrypt(previous, last=True)
+
+
+def render_rows(rows, format, header=False):
+    if format == 'csv':
+        output = StringIO()
+        writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS)
+        if header:
+            writer.writeheader()
+        writer.writerows(rows)
+        return output.getvalue()
+    return ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+class EntryExport(object):
+    '''
+    Iterates over a queryset with a server-side cursor, unsealing (see
+    `entries.vaults`) and rendering one bounded batch of entries at a time.
+    '''
+
+    def __init__(self, queryset, vault, format='ndjson', passphrase=None):
+        self.queryset = queryset.select_related('secret').only(
+            'user', 'slug', 'title', 'created_at', 'secret__value',)
+        self.vault = vault
+        self.format = format
+        self.passphrase = passphrase
+
+    def _rows(self, batch):
+        return [
+            dict(
+                title=entry.title,
+                value=self.vault.from_secret(entry.secret.value),
+                slug=entry.slug,
+                created_at=entry.created_at.isoformat(),)
+            for entry in batch
+        ]
+
+    def __iter__(self):
+        cipher = None
+        if self.passphrase:
+            cipher = ExportCipher(self.passphrase)
+            yield cipher.header(self.format)
+
+        entries = self.queryset.iterator(chunk_size=EXPORT_BATCH_SIZE)
+        header = self.format == 'csv'
+        while True:
+            batch = list(islice(entries, EXPORT_BATCH_SIZE))
+            if not batch and not header:
+                break
+            chunk = render_rows(self._rows(batch), self.format, header)
+            header = False
+            yield cipher.encrypt(chunk) if cipher else chunk
+
+        if cipher:
+            yield cipher.encrypt('', last=True)
+
+
+class EntryExportResponse(StreamingHttpResponse):
+    '''
+    Streams an `EntryExport`. Under ASGI each chunk is produced in the
+    request's sync thread, so database access stays out of the event loop
+    and the export is never buffered in full.
+    '''
+
+    async def __aiter__(self):
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        while True:
+            chunk = await next_chunk(self._iterator, None)
+            if chunk is None:
+                break
+            yield self.make_bytes(chunk)
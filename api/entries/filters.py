@@ -0,0 +1,26 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+
+class TrigramSearchFilter(SearchFilter):
+    '''
+    `SearchFilter` whose matches are ranked by trigram word similarity to the
+    search terms, best match first, unless an explicit ordering is requested.
+    Matching itself is still a case-insensitive substring search, which the
+    trigram index on `UPPER(title)` serves without scanning the user's rows.
+    '''
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms or request.query_params.get(OrderingFilter.ordering_param):
+            return queryset
+
+        # Ranked as double precision so cursors round-trip exactly
+        similarity = Cast(
+            TrigramWordSimilarity(' '.join(terms), 'title'), FloatField())
+        return queryset.annotate(similarity=similarity) \
+            .order_by('-similarity', '-created_at', '-slug')
@@ -0,0 +1,150 @@
+import csv
+import json
+
+from io import TextIOWrapper
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from entries.models import Entry, EntrySecret
+from entries.serializers import ImportEntrySerializer
+from entries.vaults import lock_vault
+from utils.models import generate_slug
+
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_SLUG_ATTEMPTS = 3
+
+# Column names used for titles and values by common password manager exports
+TITLE_COLUMNS = ('title', 'name')
+VALUE_COLUMNS = ('value', 'password', 'login_password')
+
+
+def normalize_import_row(row):
+    if not isinstance(row, dict):
+        return row
+    row = {
+        str(key).strip().lower(): value for key, value in row.items() \
+        if key is not None
+    }
+    normalized = {}
+    for field, columns in (('title', TITLE_COLUMNS), ('value', VALUE_COLUMNS)):
+        for column in columns:
+            if row.get(column) not in (None, ''):
+                normalized[field] = row[column]
+                break
+    return normalized
+
+
+def invalid_import_file():
+    return ValidationError({ 'file': ['Invalid import file.'] })
+
+
+def read_csv_rows(file):
+    reader = csv.DictReader(
+        TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        for row in reader:
+            yield normalize_import_row(row)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise invalid_import_file() from e
+
+
+def read_json_rows(file):
+    '''
+    Rows of a JSON file holding either a list of entries, or an object with
+    the list under `entries`.
+    '''
+    try:
+        data = json.load(TextIOWrapper(file, encoding='utf-8-sig'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise invalid_import_file() from e
+    if isinstance(data, dict):
+        data = data.get('entries')
+    if not isinstance(data, list):
+        raise invalid_import_file()
+    for row in data:
+        yield normalize_import_row(row)
+
+
+def allocate_slugs(count):
+    '''
+    Generate `count` distinct slugs which are not already in use.
+    '''
+    slugs = set()
+    while len(slugs) < count:
+        candidates = set(generate_slug() for i in range(count - len(slugs)))
+        candidates -= slugs
+        candidates -= set(Entry.objects.filter(
+            slug__in=candidates,
+        ).values_list('slug', flat=True))
+        slugs |= candidates
+    return list(slugs)
+
+
+def bulk_create_entries(entries, values):
+    '''
+    Insert `entries` along with a secret holding each of the (already
+    encrypted) `values`.
+    '''
+    for attempt in range(IMPORT_SLUG_ATTEMPTS):
+        for entry, slug in zip(entries, allocate_slugs(len(entries))):
+            entry.slug = slug
+        try:
+            with transaction.atomic():
+                entries = Entry.objects.bulk_create(entries)
+                EntrySecret.objects.bulk_create([
+                    EntrySecret(entry=entry, value=value) \
+                    for entry, value in zip(entries, values)
+                ])
+                return entries
+        except IntegrityError as e:
+            # A concurrent insert claimed one of the slugs; try again
+            if attempt == IMPORT_SLUG_ATTEMPTS - 1:
+                raise e
+
+
+def import_entries(user, vault, rows):
+    '''
+    Validate, seal (see `entries.vaults`) and insert `rows` in batches.
+    Returns the number of entries created and a list of errors for the rows
+    which were skipped, numbered from 1.
+
+    Each batch is committed on its own, so that the entries' timestamps are
+    never much older than their commit and syncing clients do not skip them
+    (see `entries.sync`). If an import fails part way, the batches committed
+    before the failure are kept.
+    '''
+    created = 0
+    errors = []
+    rows = enumerate(rows, start=1)
+
+    while True:
+        batch = list(islice(rows, IMPORT_BATCH_SIZE))
+        if not batch:
+            break
+
+        entries = []
+        values = []
+        for row_number, row in batch:
+            serializer = ImportEntrySerializer(data=row)
+            if not serializer.is_valid():
+                errors.append(dict(row=row_number, errors=serializer.errors))
+                continue
+            try:
+                values.append(vault.to_secret(
+                    serializer.validated_data['value']))
+            except ValueError as e:
+                errors.append(dict(row=row_number, errors=dict(
+                    value=[str(e)],)))
+                continue
+            entries.append(Entry(
+                user=user, title=serializer.validated_data['title'],))
+
+        if entries:
+            with transaction.atomic():
+                lock_vault(user, vault)
+                bulk_create_entries(entries, values)
+            created += len(entries)
+    return created, errors
@@ -0,0 +1,116 @@
+import logging
+
+from datetime import datetime
+from os import urandom
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from entries.ciphers import NONCE_LENGTH
+from entries.crypto import get_data_key
+from utils.admission import crypto_slot
+from utils.tokens import request_token, token_secret
+
+
+logger = logging.getLogger(__name__)
+
+class DataKeyCache(object):
+    '''
+    Opt-in cache of unwrapped data keys, bound to the knox token of the
+    session that unwrapped them. Cached keys are encrypted under a secret
+    derived from the raw token, which the server never stores, so the cache
+    contents are useless without the client's token.
+    '''
+    index_key = 'data_key_cache_index'
+
+    @staticmethod
+    def _settings():
+        return settings.DATA_KEY_CACHE
+
+    @staticmethod
+    def _token(request):
+        if not DataKeyCache._settings()['ENABLED']:
+            return None, None
+        return request_token(request)
+
+    @staticmethod
+    def _key(digest):
+        return f'data_key_{digest}'
+
+    @staticmethod
+    def _cipher(token):
+        return AESGCM(token_secret(token, b'data_key_cache'))
+
+    @staticmethod
+    def get(request):
+        digest, token = DataKeyCache._token(request)
+        if not digest:
+            return None
+        try:
+            payload = get_redis_connection('default').get(
+                DataKeyCache._key(digest))
+            if not payload:
+                return None
+            nonce, ciphertext = payload[:NONCE_LENGTH], payload[NONCE_LENGTH:]
+            return DataKeyCache._cipher(token).decrypt(nonce, ciphertext, None)
+        except Exception as e:
+            logger.exception('Error getting data key cache', exc_info=e)
+
+    @staticmethod
+    def set(request, data_key):
+        digest, token = DataKeyCache._token(request)
+        if not digest:
+            return
+        try:
+            ttl = DataKeyCache._settings()['TTL']
+            max_entries = DataKeyCache._settings()['MAX_ENTRIES']
+            key = DataKeyCache._key(digest)
+            nonce = urandom(NONCE_LENGTH)
+            payload = nonce + DataKeyCache._cipher(token).encrypt(
+                nonce, data_key, None)
+            now = datetime.now().timestamp()
+
+            redis = get_redis_connection('default')
+            pipeline = redis.pipeline()
+            pipeline.zremrangebyscore(DataKeyCache.index_key, 0, now)
+            pipeline.set(key, payload, ex=ttl)
+            pipeline.zadd(DataKeyCache.index_key, { key: now + ttl })
+            pipeline.zcard(DataKeyCache.index_key)
+            size = pipeline.execute()[-1]
+
+            # Enforce the hard cap by evicting the keys closest to expiry
+            if size > max_entries:
+                evicted = redis.zpopmin(
+                    DataKeyCache.index_key, size - max_entries)
+                if evicted:
+                    redis.delete(*[key for key, expiry in evicted])
+        except Exception as e:
+            logger.exception('Error setting data key cache', exc_info=e)
+
+    @staticmethod
+    def delete(request):
+        digest, token = DataKeyCache._token(request)
+        if not digest:
+            return
+        try:
+            key = DataKeyCache._key(digest)
+            pipeline = get_redis_connection('default').pipeline()
+            pipeline.delete(key)
+            pipeline.zrem(DataKeyCache.index_key, key)
+            pipeline.execute()
+        except Exception as e:
+            logger.exception('Error deleting data key cache', exc_info=e)
+
+
+def get_request_data_key(request, password):
+    '''
+    Like `get_data_key`, but reuses a data key already unwrapped during the
+    request's session when the data key cache is enabled.
+    '''
+    data_key = DataKeyCache.get(request)
+    if data_key is None:
+        with crypto_slot(request):
+            data_key = get_data_key(request.user, password)
+        DataKeyCache.set(request, data_key)
+    return data_key
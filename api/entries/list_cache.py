@@ -0,0 +1,187 @@
+import hashlib
+import logging
+
+from time import monotonic, sleep, time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from utils import async_cache
+from utils.conditional import make_etag
+
+
+logger = logging.getLogger(__name__)
+
+class EntryListCache(object):
+    '''
+    Cache of each user's serialized entries list pages, keyed by the request's
+    query (search term, ordering, cursor and page size). Every write to the
+    vault bumps a per-user version which is part of each key, so stale pages
+    are never read again and simply expire.
+
+    Concurrent requests for the same page are coalesced: the first computes
+    it while the others wait for its result instead of querying the database.
+    '''
+    metrics = ('hits', 'misses', 'coalesced')
+
+    @staticmethod
+    def _settings():
+        return settings.ENTRIES_LIST_CACHE
+
+    @staticmethod
+    def _version_key(user):
+        return f'entries_list_version_{user.user_slug}'
+
+    @staticmethod
+    def _metric_key(metric):
+        return f'entries_list_{metric}'
+
+    @staticmethod
+    def _key(request, version):
+        query = sorted(request.query_params.lists())
+        digest = hashlib.sha256(
+            repr((request.get_host(), query)).encode('utf-8')).hexdigest()
+        return f'entries_list_{request.user.user_slug}_{version}_{digest}'
+
+    @staticmethod
+    def get_version(user):
+        key = EntryListCache._version_key(user)
+        version = cache.get(key)
+        if version is None:
+            # Start from the clock rather than 1, so a lost counter cannot
+            # reuse the keys of pages cached before it was lost
+            cache.add(key, int(time() * 1000), timeout=None)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    def invalidate(user):
+        try:
+            key = EntryListCache._version_key(user)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, int(time() * 1000), timeout=None)
+        except Exception as e:
+            logger.exception(
+                'Error invalidating entries list cache', exc_info=e)
+
+    @staticmethod
+    def etag(request, *args, **kwargs):
+        '''
+        ETag of the list page for the request, which changes with every write
+        to the user's vault, computed without querying or serializing it.
+        '''
+        try:
+            return make_etag(EntryListCache._key(
+                request, EntryListCache.get_version(request.user)))
+        except Exception as e:
+            logger.exception('Error getting entries list ETag', exc_info=e)
+
+    @staticmethod
+    async def aetag(request, *args, **kwargs):
+        '''
+        Like `etag`, with a native async Redis client, so that revalidating
+        an unchanged list never leaves the event loop.
+        '''
+        try:
+            key = EntryListCache._version_key(request.user)
+            version = await async_cache.aget(key)
+            if version is None:
+                version = await sync_to_async(EntryListCache.get_version)(
+                    request.user)
+            return make_etag(EntryListCache._key(request, version))
+        except Exception as e:
+            await sync_to_async(logger.exception)(
+                'Error getting entries list ETag', exc_info=e)
+
+    @staticmethod
+    def _record(metric):
+        key = EntryListCache._metric_key(metric)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key)
+        except Exception as e:
+            logger.exception(
+                'Error recording entries list cache metric', exc_info=e)
+
+    @staticmethod
+    def stats():
+        values = cache.get_many([
+            EntryListCache._metric_key(metric) \
+            for metric in EntryListCache.metrics
+        ])
+        stats = {
+            metric: values.get(EntryListCache._metric_key(metric), 0) \
+            for metric in EntryListCache.metrics
+        }
+        lookups = sum(stats.values())
+        stats['hit_rate'] = (
+            (stats['hits'] + stats['coalesced']) / lookups if lookups else None)
+        return stats
+
+    @staticmethod
+    def _wait(key):
+        deadline = monotonic() + EntryListCache._settings()['WAIT_TIMEOUT']
+        while monotonic() < deadline:
+            sleep(EntryListCache._settings()['POLL_INTERVAL'])
+            data = cache.get(key)
+            if data is not None:
+                return data
+
+    @staticmethod
+    def _set(key, data):
+        try:
+            cache.set(key, data, timeout=EntryListCache._settings()['TTL'])
+        except Exception as e:
+            logger.exception('Error setting entries list cache', exc_info=e)
+
+    @staticmethod
+    def _release(lock_key):
+        try:
+            cache.delete(lock_key)
+        except Exception as e:
+            logger.exception(
+                'Error releasing entries list cache lock', exc_info=e)
+
+    @staticmethod
+    def get_or_set(request, compute):
+        '''
+        Return the cached list page for the request, or `compute()` it. A
+        broken cache never fails the request, it only costs a database query.
+        '''
+        if not EntryListCache._settings()['ENABLED']:
+            return compute()
+
+        try:
+            key = EntryListCache._key(
+                request, EntryListCache.get_version(request.user))
+            data = cache.get(key)
+            if data is not None:
+                EntryListCache._record('hits')
+                return data
+
+            lock_key = f'{key}_lock'
+            is_leader = cache.add(
+                lock_key, 1, timeout=EntryListCache._settings()['LOCK_TIMEOUT'])
+            if not is_leader:
+                data = EntryListCache._wait(key)
+                if data is not None:
+                    EntryListCache._record('coalesced')
+                    return data
+        except Exception as e:
+            logger.exception('Error getting entries list cache', exc_info=e)
+            return compute()
+
+        EntryListCache._record('misses')
+        try:
+            data = compute()
+            EntryListCache._set(key, data)
+            return data
+        finally:
+            if is_leader:
+                EntryListCache._release(lock_key)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from entries.models import EntryTombstone
+
+
+PURGE_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete entry tombstones older than '
+        "ENTRY_SYNC['TOMBSTONE_RETENTION_DAYS'], in batches.")
+
+    def handle(self, *args, **options):
+        retention = timedelta(
+            days=settings.ENTRY_SYNC['TOMBSTONE_RETENTION_DAYS'])
+        expired = EntryTombstone.objects.filter(
+            created_at__lt=timezone.now() - retention)
+        purged = 0
+        try:
+            while True:
+                pks = list(
+                    expired.values_list('pk', flat=True)[:PURGE_BATCH_SIZE])
+                if not pks:
+                    break
+                purged += EntryTombstone.objects.filter(pk__in=pks).delete()[0]
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR('Error purging entry tombstones'))
+            raise e
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully purged {purged} entry tombstones'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0003_reencryptionjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['user', 'created_at', 'slug'], name='entry_user_created_slug_idx'),
+        ),
+    ]
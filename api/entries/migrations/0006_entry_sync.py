@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('entries', '0005_entry_title_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('slug', models.SlugField(db_index=False, editable=False)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['user', 'updated_at', 'slug'], name='entry_user_updated_slug_idx'),
+        ),
+        migrations.AddField(
+            model_name='entrytombstone',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='entry_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='entrytombstone',
+            index=models.Index(fields=['user', 'created_at', 'slug'], name='tombstone_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrytombstone',
+            index=models.Index(fields=['created_at'], name='tombstone_created_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def copy_values(apps, schema_editor):
+    Entry = apps.get_model('entries', 'Entry')
+    EntrySecret = apps.get_model('entries', 'EntrySecret')
+    last_slug = ''
+    while True:
+        batch = list(
+            Entry.objects.filter(slug__gt=last_slug).order_by('slug')
+            .values_list('slug', 'value')[:BATCH_SIZE])
+        if not batch:
+            break
+        EntrySecret.objects.bulk_create([
+            EntrySecret(entry_id=slug, value=value) for slug, value in batch
+        ])
+        last_slug = batch[-1][0]
+
+
+def restore_values(apps, schema_editor):
+    Entry = apps.get_model('entries', 'Entry')
+    EntrySecret = apps.get_model('entries', 'EntrySecret')
+    last_slug = ''
+    while True:
+        batch = list(
+            EntrySecret.objects.filter(entry_id__gt=last_slug)
+            .order_by('entry_id')[:BATCH_SIZE])
+        if not batch:
+            break
+        Entry.objects.bulk_update([
+            Entry(slug=secret.entry_id, value=secret.value) for secret in batch
+        ], ['value'])
+        last_slug = batch[-1].entry_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0006_entry_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntrySecret',
+            fields=[
+                ('entry', models.OneToOneField(editable=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='secret', serialize=False, to='entries.entry')),
+                ('value', models.TextField()),
+            ],
+        ),
+        # Restoring `value` re-adds it with a default, so that existing rows
+        # are valid until the secrets are copied back
+        migrations.AlterField(
+            model_name='entry',
+            name='value',
+            field=models.TextField(default=''),
+        ),
+        migrations.RunPython(copy_values, restore_values),
+        migrations.RemoveField(
+            model_name='entry',
+            name='value',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+# First of three migrations which store the secrets' values as bytes. This
+# one adds the binary column, `0009_entrysecret_convert_value` fills it in
+# committed batches, and `0010_entrysecret_value` replaces the text column
+# with it. Each step is recorded once it is done, so an interrupted
+# conversion is resumed by running `migrate` again.
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0007_entry_secret'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entrysecret',
+            name='binary_value',
+            field=models.BinaryField(null=True),
+        ),
+        # Restoring `value` re-adds it as nullable, so that the rows can be
+        # converted back before it is made required again
+        migrations.AlterField(
+            model_name='entrysecret',
+            name='value',
+            field=models.TextField(null=True),
+        ),
+    ]
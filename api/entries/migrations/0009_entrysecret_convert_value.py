@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:12
+
+from base64 import b64decode, b64encode
+
+from django.db import migrations, transaction
+
+
+BATCH_SIZE = 1000
+
+# Binary layouts, as in `entries.ciphers`. Copied here so that the migration
+# keeps working if the ciphers change.
+CRYPTOCODE_VERSION = 0
+CRYPTOCODE_FIELD_LENGTHS = (16, 16, 16)
+DATA_KEY_VERSION = 1
+DATA_KEY_PREFIX = 'dek1$'
+
+
+def to_binary(value):
+    if value.startswith(DATA_KEY_PREFIX):
+        return bytes([DATA_KEY_VERSION]) + b64decode(
+            value[len(DATA_KEY_PREFIX):])
+    ciphertext, *fields = [b64decode(field) for field in value.split('*')]
+    if [len(field) for field in fields] != list(CRYPTOCODE_FIELD_LENGTHS):
+        raise ValueError('Invalid cryptocode ciphertext.')
+    return bytes([CRYPTOCODE_VERSION]) + b''.join(fields) + ciphertext
+
+
+def to_text(value):
+    value = bytes(value)
+    if value[0] == DATA_KEY_VERSION:
+        return DATA_KEY_PREFIX + b64encode(value[1:]).decode('utf-8')
+    fields = []
+    offset = 1
+    for length in CRYPTOCODE_FIELD_LENGTHS:
+        fields.append(value[offset:offset + length])
+        offset += length
+    return '*'.join(
+        b64encode(field).decode('utf-8') \
+        for field in [value[offset:], *fields]
+    )
+
+
+def convert(apps, source, target, function):
+    '''
+    Convert `source` into `target` one committed batch at a time, so that no
+    transaction holds the whole table and an interrupted run is resumed.
+    '''
+    EntrySecret = apps.get_model('entries', 'EntrySecret')
+    while True:
+        with transaction.atomic():
+            batch = list(
+                EntrySecret.objects.select_for_update()
+                .filter(**{ f'{target}__isnull': True })
+                .order_by('entry_id').only('entry_id', source)[:BATCH_SIZE])
+            if not batch:
+                break
+            for secret in batch:
+                setattr(secret, target, function(getattr(secret, source)))
+            EntrySecret.objects.bulk_update(batch, [target])
+
+
+def forwards(apps, schema_editor):
+    convert(apps, 'value', 'binary_value', to_binary)
+
+
+def backwards(apps, schema_editor):
+    convert(apps, 'binary_value', 'value', to_text)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('entries', '0008_entrysecret_binary_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards, atomic=False),
+    ]
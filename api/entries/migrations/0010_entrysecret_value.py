@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0009_entrysecret_convert_value'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='entrysecret',
+            name='value',
+        ),
+        migrations.RenameField(
+            model_name='entrysecret',
+            old_name='binary_value',
+            new_name='value',
+        ),
+        migrations.AlterField(
+            model_name='entrysecret',
+            name='value',
+            field=models.BinaryField(),
+        ),
+    ]
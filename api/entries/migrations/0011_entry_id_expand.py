@@ -0,0 +1,144 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:20
+
+from django.db import migrations, transaction
+
+
+# First of two migrations which replace the entries' slug primary key with a
+# bigint `id`, keeping the slug as a unique public identifier. This one only
+# adds and backfills the new columns and builds their indexes concurrently,
+# so it can run while the previous release is serving. `0012_entry_id` then
+# swaps the keys in one short transaction, and must be deployed together
+# with the code which uses them.
+
+BATCH_SIZE = 1000
+
+EXPAND_SQL = [
+    (
+        'ALTER TABLE entries_entry ADD COLUMN id bigint',
+        'ALTER TABLE entries_entry DROP COLUMN IF EXISTS id',
+    ),
+    (
+        'CREATE SEQUENCE entries_entry_id_seq OWNED BY entries_entry.id',
+        migrations.RunSQL.noop,
+    ),
+    (
+        "ALTER TABLE entries_entry ALTER COLUMN id "
+        "SET DEFAULT nextval('entries_entry_id_seq')",
+        migrations.RunSQL.noop,
+    ),
+    # Validated once backfilled, so that `SET NOT NULL` does not have to
+    # scan the table while holding its lock
+    (
+        'ALTER TABLE entries_entry ADD CONSTRAINT entry_id_not_null '
+        'CHECK (id IS NOT NULL) NOT VALID',
+        migrations.RunSQL.noop,
+    ),
+    (
+        'ALTER TABLE entries_entrysecret ADD COLUMN entry_ref bigint',
+        'ALTER TABLE entries_entrysecret DROP COLUMN IF EXISTS entry_ref',
+    ),
+    # Secrets written by the previous release only set the slug
+    (
+        '''
+        CREATE FUNCTION entries_entrysecret_set_entry_ref() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.entry_ref IS NULL THEN
+                SELECT id INTO NEW.entry_ref
+                FROM entries_entry WHERE slug = NEW.entry_id;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        'DROP FUNCTION IF EXISTS entries_entrysecret_set_entry_ref()',
+    ),
+    (
+        'CREATE TRIGGER entries_entrysecret_set_entry_ref '
+        'BEFORE INSERT OR UPDATE ON entries_entrysecret '
+        'FOR EACH ROW EXECUTE FUNCTION entries_entrysecret_set_entry_ref()',
+        'DROP TRIGGER IF EXISTS entries_entrysecret_set_entry_ref '
+        'ON entries_entrysecret',
+    ),
+    (
+        'ALTER TABLE entries_entrysecret '
+        'ADD CONSTRAINT entrysecret_entry_ref_not_null '
+        'CHECK (entry_ref IS NOT NULL) NOT VALID',
+        migrations.RunSQL.noop,
+    ),
+]
+
+BACKFILL_SQL = [
+    '''
+    UPDATE entries_entry SET id = nextval('entries_entry_id_seq')
+    WHERE slug IN (
+        SELECT slug FROM entries_entry WHERE id IS NULL
+        ORDER BY created_at, slug LIMIT %s
+    )
+    ''',
+    '''
+    UPDATE entries_entrysecret AS secret SET entry_ref = entry.id
+    FROM entries_entry AS entry
+    WHERE entry.slug = secret.entry_id AND secret.entry_id IN (
+        SELECT entry_id FROM entries_entrysecret WHERE entry_ref IS NULL
+        LIMIT %s
+    )
+    ''',
+]
+
+INDEX_SQL = [
+    (
+        'ALTER TABLE entries_entry VALIDATE CONSTRAINT entry_id_not_null',
+        migrations.RunSQL.noop,
+    ),
+    (
+        'ALTER TABLE entries_entrysecret '
+        'VALIDATE CONSTRAINT entrysecret_entry_ref_not_null',
+        migrations.RunSQL.noop,
+    ),
+    (
+        'CREATE UNIQUE INDEX CONCURRENTLY entries_entry_id_key '
+        'ON entries_entry (id)',
+        'DROP INDEX CONCURRENTLY IF EXISTS entries_entry_id_key',
+    ),
+    (
+        'CREATE UNIQUE INDEX CONCURRENTLY entry_slug_unique '
+        'ON entries_entry (slug)',
+        'DROP INDEX CONCURRENTLY IF EXISTS entry_slug_unique',
+    ),
+    (
+        'CREATE UNIQUE INDEX CONCURRENTLY entries_entrysecret_entry_ref_key '
+        'ON entries_entrysecret (entry_ref)',
+        'DROP INDEX CONCURRENTLY IF EXISTS entries_entrysecret_entry_ref_key',
+    ),
+]
+
+
+def backfill(apps, schema_editor):
+    '''
+    Number existing entries and point their secrets at the numbers, one
+    committed batch at a time.
+    '''
+    connection = schema_editor.connection
+    for sql in BACKFILL_SQL:
+        while True:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [BATCH_SIZE])
+                    if not cursor.rowcount:
+                        break
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('entries', '0010_entrysecret_value'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql, reverse_sql) for sql, reverse_sql in EXPAND_SQL
+    ] + [
+        migrations.RunPython(backfill, migrations.RunPython.noop, atomic=False),
+    ] + [
+        migrations.RunSQL(sql, reverse_sql) for sql, reverse_sql in INDEX_SQL
+    ]
@@ -0,0 +1,136 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:20
+
+from django.db import migrations, models, transaction
+import utils.models
+
+
+# Swaps the keys prepared by `0011_entry_id_expand`. Every index and check
+# it relies on already exists, so the tables are only locked for as long as
+# the catalog changes take, without scanning or rewriting them.
+
+SWITCH_SQL = '''
+LOCK TABLE entries_entry, entries_entrysecret IN SHARE ROW EXCLUSIVE MODE;
+
+ALTER TABLE entries_entry ALTER COLUMN id SET NOT NULL;
+ALTER TABLE entries_entry DROP CONSTRAINT entry_id_not_null;
+ALTER TABLE entries_entrysecret ALTER COLUMN entry_ref SET NOT NULL;
+ALTER TABLE entries_entrysecret DROP CONSTRAINT entrysecret_entry_ref_not_null;
+DROP TRIGGER entries_entrysecret_set_entry_ref ON entries_entrysecret;
+DROP FUNCTION entries_entrysecret_set_entry_ref();
+
+-- Also drops the secrets' primary key and foreign key to the slug
+ALTER TABLE entries_entrysecret DROP COLUMN entry_id;
+ALTER TABLE entries_entry DROP CONSTRAINT entries_entry_pkey;
+DO $$
+DECLARE
+    index_name text;
+BEGIN
+    FOR index_name IN
+        SELECT indexname FROM pg_indexes
+        WHERE tablename = 'entries_entry'
+        AND indexname LIKE 'entries_entry_slug%like'
+    LOOP
+        EXECUTE format('DROP INDEX %I', index_name);
+    END LOOP;
+END
+$$;
+
+ALTER TABLE entries_entry
+    ADD CONSTRAINT entries_entry_pkey PRIMARY KEY USING INDEX entries_entry_id_key;
+ALTER TABLE entries_entry
+    ADD CONSTRAINT entry_slug_unique UNIQUE USING INDEX entry_slug_unique;
+ALTER TABLE entries_entrysecret RENAME COLUMN entry_ref TO entry_id;
+ALTER TABLE entries_entrysecret
+    ADD CONSTRAINT entries_entrysecret_pkey
+    PRIMARY KEY USING INDEX entries_entrysecret_entry_ref_key;
+ALTER TABLE entries_entrysecret
+    ADD CONSTRAINT entries_entrysecret_entry_id_fk_entries_entry_id
+    FOREIGN KEY (entry_id) REFERENCES entries_entry (id)
+    DEFERRABLE INITIALLY DEFERRED NOT VALID;
+
+-- Hand the sequence over to an identity column, as Django creates them
+ALTER TABLE entries_entry ALTER COLUMN id DROP DEFAULT;
+DROP SEQUENCE entries_entry_id_seq;
+ALTER TABLE entries_entry ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY;
+SELECT setval(
+    pg_get_serial_sequence('entries_entry', 'id'),
+    COALESCE(MAX(id), 0) + 1, false)
+FROM entries_entry;
+'''
+
+# Restores the slug primary key directly, without the intermediate columns
+# of `0011_entry_id_expand`
+REVERSE_SWITCH_SQL = '''
+LOCK TABLE entries_entry, entries_entrysecret IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE entries_entrysecret ADD COLUMN entry_slug varchar(50);
+UPDATE entries_entrysecret AS secret SET entry_slug = entry.slug
+FROM entries_entry AS entry WHERE entry.id = secret.entry_id;
+ALTER TABLE entries_entrysecret DROP COLUMN entry_id;
+ALTER TABLE entries_entrysecret RENAME COLUMN entry_slug TO entry_id;
+ALTER TABLE entries_entrysecret ALTER COLUMN entry_id SET NOT NULL;
+ALTER TABLE entries_entrysecret ADD PRIMARY KEY (entry_id);
+
+ALTER TABLE entries_entry DROP CONSTRAINT entries_entry_pkey;
+ALTER TABLE entries_entry DROP CONSTRAINT entry_slug_unique;
+ALTER TABLE entries_entry ADD PRIMARY KEY (slug);
+ALTER TABLE entries_entry DROP COLUMN id;
+CREATE INDEX entries_entry_slug_like
+    ON entries_entry (slug varchar_pattern_ops);
+
+ALTER TABLE entries_entrysecret
+    ADD CONSTRAINT entries_entrysecret_entry_id_fk_entries_entry_slug
+    FOREIGN KEY (entry_id) REFERENCES entries_entry (slug)
+    DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX entries_entrysecret_entry_id_like
+    ON entries_entrysecret (entry_id varchar_pattern_ops);
+'''
+
+
+def run_in_transaction(sql):
+    def run(apps, schema_editor):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('entries', '0011_entry_id_expand'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    run_in_transaction(SWITCH_SQL),
+                    run_in_transaction(REVERSE_SWITCH_SQL),
+                    atomic=False,),
+                # Checks existing rows without blocking writes, once the
+                # switch has committed
+                migrations.RunSQL(
+                    'ALTER TABLE entries_entrysecret VALIDATE CONSTRAINT '
+                    'entries_entrysecret_entry_id_fk_entries_entry_id',
+                    migrations.RunSQL.noop,),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='entry',
+                    name='id',
+                    field=models.BigAutoField(auto_created=True, default=None, primary_key=True, serialize=False, verbose_name='ID'),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='entry',
+                    name='slug',
+                    field=models.SlugField(db_index=False, default=utils.models.generate_slug, editable=False),
+                ),
+                migrations.AddConstraint(
+                    model_name='entry',
+                    constraint=models.UniqueConstraint(fields=('slug',), name='entry_slug_unique'),
+                ),
+            ],
+        ),
+    ]
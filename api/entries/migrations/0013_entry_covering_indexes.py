@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:21
+
+from django.conf import settings
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently, RemoveIndexConcurrently,)
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # The new indexes are built before the ones they replace are dropped,
+    # without blocking writes
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('entries', '0012_entry_id'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='entry',
+            index=models.Index(fields=['user', 'created_at', 'slug'], include=('id', 'title'), name='entry_user_created_cover_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='entry',
+            index=models.Index(fields=['user', 'updated_at', 'slug'], include=('id', 'title', 'created_at'), name='entry_user_updated_cover_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='entry',
+            name='entry_user_created_slug_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='entry',
+            name='entry_user_updated_slug_idx',
+        ),
+        migrations.AlterField(
+            model_name='entry',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='entries', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
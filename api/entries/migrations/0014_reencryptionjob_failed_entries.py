@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0013_entry_covering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reencryptionjob',
+            name='failed_entries',
+            field=models.JSONField(default=list, editable=False),
+        ),
+    ]
@@ -1,26 +1,118 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db.models import (
+    BinaryField,
     CharField,
     ForeignKey,
+    Index,
+    JSONField,
+    Model,
+    OneToOneField,
+    PositiveIntegerField,
     SlugField,
-    TextField,
+    UniqueConstraint,
+    CASCADE,
     PROTECT,)
+from django.db.models.functions import Upper
 
 from utils.models import CustomBaseMixin, generate_slug
 
 
 class Entry(CustomBaseMixin):
     slug = SlugField(
-        primary_key=True,
         editable=False,
-        default=generate_slug,)
+        default=generate_slug,
+        db_index=False,)
     title = CharField(max_length=255)
-    value = TextField()
     user = ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=PROTECT,
         related_name='entries',
+        editable=False,
+        db_index=False,)
+
+    slug_field = 'slug'
+    slug_constraint = 'entry_slug_unique'
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            UniqueConstraint(fields=['slug'], name='entry_slug_unique'),
+        ]
+        # Every query is scoped to one user, so the composite indexes below
+        # replace the foreign key's own index. They cover the columns listed
+        # and synced, which lets those pages be read with index-only scans.
+        indexes = [
+            Index(
+                fields=['user', 'created_at', 'slug'],
+                include=['id', 'title'],
+                name='entry_user_created_cover_idx',),
+            # Serves SearchFilter's `UPPER(title::text) LIKE UPPER(%term%)`
+            GinIndex(
+                OpClass(Upper('title'), name='gin_trgm_ops'),
+                name='entry_title_trgm_idx',),
+            Index(
+                fields=['user', 'updated_at', 'slug'],
+                include=['id', 'title', 'created_at'],
+                name='entry_user_updated_cover_idx',),
+        ]
+
+
+class EntrySecret(Model):
+    '''
+    Ciphertext of an entry. It is kept out of the entries table so that
+    listing and searching entries scans narrow rows, and is only read by the
+    paths which decrypt it.
+    '''
+    entry = OneToOneField(
+        Entry,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name='secret',
         editable=False,)
+    value = BinaryField()
+
+
+class EntryTombstone(CustomBaseMixin):
+    '''
+    Record of a deleted entry, so that clients syncing changes since an
+    earlier cursor learn about the deletion. Tombstones are purged after
+    `ENTRY_SYNC['TOMBSTONE_RETENTION_DAYS']`.
+    '''
+    slug = SlugField(editable=False, db_index=False)
+    user = ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=PROTECT,
+        related_name='entry_tombstones',
+        editable=False,
+        db_index=False,)
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        indexes = [
+            Index(
+                fields=['user', 'created_at', 'slug'],
+                name='tombstone_user_created_idx',),
+            Index(fields=['created_at'], name='tombstone_created_idx'),
+        ]
+
+
+class ReencryptionJob(CustomBaseMixin):
+    '''
+    Progress of an in-flight re-encryption of a user's entries. The row exists
+    until every entry has been converted, so an interrupted job is resumed
+    the next time the user's password is available.
+
+    Entries whose values cannot be decrypted with the password, e.g. those
+    left under an older password by an interrupted password change, are
+    skipped and listed in `failed_entries` by id. The row is kept while any
+    of them still holds its legacy value.
+    '''
+    user = OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=PROTECT,
+        primary_key=True,
+        related_name='reencryption_job',
+        editable=False,)
+    total = PositiveIntegerField(default=0)
+    completed = PositiveIntegerField(default=0)
+    failed_entries = JSONField(default=list, editable=False)
@@ -0,0 +1,134 @@
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class EntryCursorPagination(BasePagination):
+    '''
+    Keyset pagination over `(created_at, slug)`. The cursor holds the key of
+    the last entry on the previous page, so every page is a single index
+    range scan no matter how deep into the vault it is, and entries created
+    or deleted between requests never shift the following pages.
+
+    The direction follows the queryset's `created_at` ordering, as chosen by
+    `OrderingFilter`, with `slug` breaking ties between equal timestamps.
+    Search results ranked by `TrigramSearchFilter` are keyed on
+    `(similarity, created_at, slug)` instead.
+    '''
+    cursor_query_param = 'cursor'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_keys(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        descending = not ordering or str(ordering[0]).startswith('-')
+        keys = ['created_at', 'slug']
+        if ordering and ordering[0] == '-similarity':
+            keys.insert(0, 'similarity')
+        return keys, descending
+
+    def encode_cursor(self, entry):
+        position = [
+            entry.created_at.isoformat() if key == 'created_at' \
+            else getattr(entry, key)
+            for key in self.keys
+        ]
+        cursor = urlsafe_b64encode(json.dumps(position).encode('utf-8'))
+        return cursor.decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            cursor += '=' * (-len(cursor) % 4)
+            position = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+            position = dict(zip(self.keys, position, strict=True))
+            position['created_at'] = parse_datetime(position['created_at'])
+            if 'similarity' in position:
+                position['similarity'] = float(position['similarity'])
+        except (BinasciiError, TypeError, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position['created_at'] is None or not isinstance(
+            position['slug'], str
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys, descending = self.get_keys(queryset)
+        direction = '-' if descending else ''
+        queryset = queryset.order_by(
+            *[f'{direction}{key}' for key in self.keys])
+
+        position = self.decode_cursor(request)
+        if position:
+            # Rows after the cursor: the first differing key is past it
+            lookup = 'lt' if descending else 'gt'
+            after = Q()
+            for i, key in enumerate(self.keys):
+                equal = { k: position[k] for k in self.keys[:i] }
+                after |= Q(**equal, **{ f'{key}__{lookup}': position[key] })
+            queryset = queryset.filter(after)
+
+        # One extra row tells whether there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_cursor = self.encode_cursor(results[-1]) \
+            if self.has_next else None
+        return results
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'next_cursor': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'results': schema,
+            },
+        }
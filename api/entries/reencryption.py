@@ -0,0 +1,104 @@
+import logging
+
+from itertools import repeat
+from time import monotonic
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from entries.models import Entry, EntrySecret, ReencryptionJob
+from utils.executor import crypto_executor
+
+
+logger = logging.getLogger(__name__)
+
+
+# Entries are converted and committed in chunks, so an interrupted job loses
+# at most one chunk of work and never leaves a chunk half-written.
+REENCRYPTION_CHUNK_SIZE = 32
+
+# Seconds of conversion after which a request starts no new chunk. The rest
+# is left to the next requests which supply the password, or is finished by
+# a password change.
+REENCRYPTION_REQUEST_BUDGET = 2
+
+# Below this many entries, sending them to worker processes costs more than
+# it saves and entries are re-encrypted inline.
+REENCRYPTION_POOL_THRESHOLD = 32
+
+
+def reencrypt_entries(job, queryset, reencrypt, *args, budget=None):
+    '''
+    Re-encrypt every `EntrySecret` in `queryset` by calling
+    `reencrypt(value, *args)` in the crypto executor, then writing each chunk
+    with `bulk_update` in its own transaction and recording progress on `job`.
+
+    `queryset` must exclude secrets which have already been converted, so
+    that a resumed job picks up where the previous one stopped. `reencrypt`
+    must be a module-level function so it can be sent to worker processes,
+    and returns None for a value it cannot convert. Those entries are
+    skipped and recorded in `job.failed_entries`, and the job is kept until
+    they no longer match `queryset`. Returns the ids of the failed entries.
+
+    Given a `budget` in seconds, no chunk is started once it has run out, and
+    the job is left to be resumed. At least one chunk is always converted.
+    '''
+    workers = settings.CRYPTO_EXECUTOR['MAX_WORKERS']
+    use_pool = job.total - job.completed >= REENCRYPTION_POOL_THRESHOLD
+    # Failed entries which were since deleted or given a new value are done
+    failed = list(queryset.filter(
+        entry_id__in=job.failed_entries,
+    ).order_by('pk').values_list('entry_id', flat=True))
+    newly_failed = []
+    deadline = None if budget is None else monotonic() + budget
+    is_done = False
+
+    while not is_done:
+        with transaction.atomic():
+            secrets = list(
+                queryset.exclude(entry_id__in=failed).select_for_update()
+                .order_by('pk')[:REENCRYPTION_CHUNK_SIZE])
+            if not secrets:
+                is_done = True
+                break
+
+            values = [bytes(secret.value) for secret in secrets]
+            if use_pool:
+                chunksize = max(len(values) // (workers * 4), 1)
+                values = crypto_executor.map(
+                    reencrypt, values, *[repeat(arg) for arg in args],
+                    chunksize=chunksize,)
+            else:
+                values = map(
+                    reencrypt, values, *[repeat(arg) for arg in args],)
+
+            converted = []
+            for secret, value in zip(secrets, values):
+                if value is None:
+                    failed.append(secret.entry_id)
+                    newly_failed.append(secret.entry_id)
+                else:
+                    secret.value = value
+                    converted.append(secret)
+            EntrySecret.objects.bulk_update(converted, ['value'])
+
+            ReencryptionJob.objects.filter(pk=job.pk).update(
+                completed=F('completed') + len(converted),
+                failed_entries=failed,)
+
+        if deadline is not None and monotonic() >= deadline:
+            break
+
+    if newly_failed:
+        logger.error('Unable to re-encrypt legacy entries.', extra={
+            'user': job.user.user_slug,
+            'metadata': dict(failed_entries=list(Entry.objects.filter(
+                id__in=newly_failed,
+            ).values_list('slug', flat=True))),
+        })
+    job.failed_entries = failed
+    if is_done and not failed:
+        ReencryptionJob.objects.filter(pk=job.pk).delete()
+        job.completed = job.total
+    return failed
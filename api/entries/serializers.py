@@ -1,9 +1,15 @@
-from cryptocode import encrypt
+from django.db import transaction
 
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import ModelSerializer, CharField, RegexField
+from rest_framework.serializers import (
+    Serializer, ModelSerializer, CharField, ChoiceField, DictField, FileField,
+    ListField, RegexField,)
 
-from entries.models import Entry
+from authentication.reauth import check_request_password
+from entries.models import Entry, EntrySecret
+from entries.vaults import (
+    ClientVault, get_request_vault, has_client_vault, lock_vault,)
+from users.utils import VaultModes
 
 
 class ListEntrySerializer(ModelSerializer):
@@ -13,34 +19,170 @@ class ListEntrySerializer(ModelSerializer):
         read_only_fields = ['slug', 'title', 'created_at']
 
 
-class EntrySerializer(ModelSerializer):
+class SyncEntrySerializer(ModelSerializer):
+    class Meta:
+        model = Entry
+        fields = ['slug', 'title', 'created_at', 'updated_at']
+        read_only_fields = ['slug', 'title', 'created_at', 'updated_at']
+
+
+class VaultPasswordMixin(object):
+    '''
+    Client-side encrypted vaults are never unlocked by the server, so only
+    server-side vaults require the password.
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request and has_client_vault(request.user):
+            self.fields['password'].required = False
+
+
+class EntrySerializer(VaultPasswordMixin, ModelSerializer):
     slug = RegexField(r'^[\w-]{10}$', read_only=True)
+    value = CharField()
     password = CharField(trim_whitespace=False, write_only=True, required=True)
 
     class Meta:
         model = Entry
         fields = ['slug', 'title', 'value', 'password', 'created_at']
         read_only_fields = ['slug', 'created_at']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.partial:
+            # A rename is not decrypted, so it is answered without a value
+            self.fields['value'].required = False
     
     def validate_password(self, password):
         request = self.context['request']
-        user = request.user
-        if user.check_password(password):
+        if check_request_password(request, password):
             return password
         raise ValidationError('Invalid password.')
 
+    def validate(self, data):
+        client_vault = has_client_vault(self.context['request'].user)
+        if 'value' in data and client_vault and (
+            not ClientVault.is_valid(data['value'])
+        ):
+            raise ValidationError({ 'value': ['Invalid client ciphertext.'] })
+
+        # A partial update may only rename the entry, which needs neither the
+        # password nor any encryption. A new value needs the password, unless
+        # it was encrypted by the client.
+        if 'value' in data and 'password' not in data and not client_vault:
+            raise ValidationError({
+                'password': [self.fields['password'].error_messages['required']],
+            })
+        return data
+
     def create(self, validated_data):
         request = self.context['request']
         user = request.user
-        password = validated_data.pop('password')
-        validated_data['value'] = encrypt(validated_data['value'], password)
-        return Entry.objects.create(user=user, **validated_data)
+        password = validated_data.pop('password', None)
+        value = validated_data.pop('value')
+        vault = get_request_vault(request, password)
+        secret = vault.to_secret(value)
+        with transaction.atomic():
+            lock_vault(user, vault)
+            instance = Entry.objects.create(user=user, **validated_data)
+            EntrySecret.objects.create(entry=instance, value=secret)
+        return instance
 
     def update(self, instance, validated_data):
-        value = validated_data.pop('value')
-        password = validated_data.pop('password')
-        instance.value = encrypt(value, password)
         instance.title = validated_data.get('title', instance.title)
-        instance.save()
+        if 'value' not in validated_data:
+            instance.save(update_fields=['title', 'updated_at'])
+            return instance
+
+        request = self.context['request']
+        value = validated_data.pop('value')
+        password = validated_data.pop('password', None)
+        vault = get_request_vault(request, password)
+        secret = vault.to_secret(value)
+        with transaction.atomic():
+            lock_vault(request.user, vault)
+            instance.save()
+            # Overwrites the secret without reading the old ciphertext
+            EntrySecret(entry=instance, value=secret).save()
         instance.value = value
-        return instance
\ No newline at end of file
+        return instance
+
+
+class RetrieveEntriesSerializer(VaultPasswordMixin, Serializer):
+    slugs = ListField(
+        child=RegexField(r'^[\w-]{10}$'), allow_empty=False, max_length=1000,
+        write_only=True,)
+    password = CharField(trim_whitespace=False, write_only=True)
+
+    def validate_password(self, password):
+        request = self.context['request']
+        if check_request_password(request, password):
+            return password
+        raise ValidationError('Invalid password.')
+
+
+class ImportEntrySerializer(ModelSerializer):
+    value = CharField(trim_whitespace=False)
+
+    class Meta:
+        model = Entry
+        fields = ['title', 'value']
+
+
+class ImportEntriesSerializer(VaultPasswordMixin, Serializer):
+    entries = ListField(child=DictField(), required=False, write_only=True)
+    file = FileField(required=False, write_only=True)
+    password = CharField(trim_whitespace=False, write_only=True)
+
+    def validate_password(self, password):
+        request = self.context['request']
+        if check_request_password(request, password):
+            return password
+        raise ValidationError('Invalid password.')
+
+    def validate(self, data):
+        if 'entries' not in data and 'file' not in data:
+            raise ValidationError('Nothing to import.')
+        return data
+
+
+class ExportEntriesSerializer(VaultPasswordMixin, Serializer):
+    format = ChoiceField(
+        choices=['ndjson', 'csv'], default='ndjson', write_only=True,)
+    passphrase = CharField(
+        trim_whitespace=False, min_length=8, required=False, write_only=True,)
+    password = CharField(trim_whitespace=False, write_only=True)
+
+    def validate_password(self, password):
+        request = self.context['request']
+        if check_request_password(request, password):
+            return password
+        raise ValidationError('Invalid password.')
+
+
+class VaultModeSerializer(Serializer):
+    mode = ChoiceField(choices=VaultModes.choices, write_only=True)
+    entries = DictField(
+        child=CharField(trim_whitespace=False), allow_empty=True,
+        write_only=True,)
+    password = CharField(trim_whitespace=False, write_only=True)
+
+    def validate_mode(self, mode):
+        request = self.context['request']
+        if mode == request.user.vault_mode:
+            raise ValidationError('The vault is already in this mode.')
+        return mode
+
+    def validate_password(self, password):
+        request = self.context['request']
+        if check_request_password(request, password):
+            return password
+        raise ValidationError('Invalid password.')
+
+    def validate(self, data):
+        if data['mode'] == VaultModes.CLIENT and not all(
+            ClientVault.is_valid(value) for value in data['entries'].values()
+        ):
+            raise ValidationError({ 'entries': ['Invalid client ciphertext.'] })
+        return data
@@ -0,0 +1,105 @@
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from utils.exceptions import SyncCursorExpired
+
+
+# A sync cursor holds a `(timestamp, slug)` position in each of two streams:
+# entries ordered by `updated_at` and tombstones ordered by `created_at`.
+#
+# Timestamps are taken before the writes commit, so a caught up cursor
+# resumes `OVERLAP_SECONDS` in the past. Writes must commit within that much
+# of their timestamps: imports commit each batch on its own, and a vault
+# mode switch stamps its entries last.
+
+
+def encode_sync_cursor(entries_position, tombstones_position):
+    cursor = json.dumps([
+        [timestamp.isoformat(), slug] \
+        for timestamp, slug in (entries_position, tombstones_position)
+    ])
+    cursor = urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+    return cursor.rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    '''
+    Raises `ValueError` for a cursor which was not issued by `sync_entries`.
+    '''
+    try:
+        cursor += '=' * (-len(cursor) % 4)
+        positions = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+        entries_position, tombstones_position = [
+            (parse_datetime(timestamp), slug) for timestamp, slug in positions
+        ]
+    except (BinasciiError, TypeError, UnicodeError) as e:
+        raise ValueError('Invalid sync cursor.') from e
+    for timestamp, slug in (entries_position, tombstones_position):
+        if timestamp is None or not isinstance(slug, str):
+            raise ValueError('Invalid sync cursor.')
+    return entries_position, tombstones_position
+
+
+def read_stream(queryset, field, position, page_size, horizon):
+    '''
+    Read up to `page_size` rows after `position`, and return them with the
+    position to resume from and whether more rows are waiting.
+    '''
+    if position:
+        timestamp, slug = position
+        queryset = queryset.filter(
+            Q(**{ f'{field}__gt': timestamp }) |
+            Q(**{ field: timestamp, 'slug__gt': slug }))
+    rows = list(queryset.order_by(field, 'slug')[:page_size + 1])
+
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, (getattr(rows[-1], field), rows[-1].slug), True
+
+    # Caught up. Resume from slightly in the past, so that writes which were
+    # still being committed with an earlier timestamp are not skipped.
+    return rows, (horizon, ''), False
+
+
+def sync_entries(user, cursor=None):
+    '''
+    Return the user's entries created or updated since the cursor, the slugs
+    of entries deleted since the cursor, and the cursor to sync from next.
+    Without a cursor, every entry is returned. Clients must treat entries as
+    upserts, since recent changes may be sent more than once.
+    '''
+    sync_settings = settings.ENTRY_SYNC
+    page_size = sync_settings['PAGE_SIZE']
+    now = timezone.now()
+    horizon = now - timedelta(seconds=sync_settings['OVERLAP_SECONDS'])
+
+    if cursor:
+        entries_position, tombstones_position = decode_sync_cursor(cursor)
+        retention = timedelta(days=sync_settings['TOMBSTONE_RETENTION_DAYS'])
+        if tombstones_position[0] < now - retention:
+            raise SyncCursorExpired()
+    else:
+        # A full sync already leaves out entries deleted before it started
+        entries_position, tombstones_position = None, (horizon, '')
+
+    entries, entries_position, more_entries = read_stream(
+        user.entries.only(
+            'user', 'slug', 'title', 'created_at', 'updated_at',),
+        'updated_at', entries_position, page_size, horizon,)
+    tombstones, tombstones_position, more_tombstones = read_stream(
+        user.entry_tombstones.only('user', 'slug', 'created_at'),
+        'created_at', tombstones_position, page_size, horizon,)
+
+    return dict(
+        entries=entries,
+        deleted=[tombstone.slug for tombstone in tombstones],
+        cursor=encode_sync_cursor(entries_position, tombstones_position),
+        has_more=more_entries or more_tombstones,)
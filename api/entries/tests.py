@@ -1,12 +1,44 @@
+import csv
+import json
+
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from threading import Timer
+from unittest.mock import Mock, patch
+
+from base64 import b64encode
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django_redis import get_redis_connection
 
 from rest_framework import status
 from rest_framework.reverse import reverse
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import (
+    APIRequestFactory, APITestCase, APITransactionTestCase,)
 
 from custom_db_logger.models import StatusLog
-from entries.models import Entry
-from utils.testing import create_user, test_user_1
+from entries.ciphers import (
+    CipherError, CryptocodeCipher, DataKeyCipher, get_cipher,)
+from entries.crypto import (
+    DATA_KEY_PREFIX, decrypt_value, encrypt_value, generate_data_key,
+    get_data_key, is_legacy_ciphertext, reencrypt_legacy_value,)
+from entries.exports import decrypt_export
+from entries.key_cache import DataKeyCache
+from entries.list_cache import EntryListCache
+from entries.models import Entry, EntrySecret, EntryTombstone, ReencryptionJob
+from entries.sync import encode_sync_cursor
+from utils.testing import (
+    create_user, create_entry, create_entries, create_superuser, test_user_1,
+    test_entry_1, test_entry_2, test_superuser,)
 
 
 class EntryTest(APITestCase):
@@ -78,62 +110,401 @@ class EntryTest(APITestCase):
 
         response_list_1 = self.client.get(reverse('entry-list'), format='json')
         self.assertEqual(response_list_1.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response_list_1.data), 2)
-        self.assertEqual(response_list_1.data[0]['slug'], response_create_2.data['slug'])
-        self.assertEqual(response_list_1.data[1]['slug'], response_create_1.data['slug'])
-        self.assertEqual(response_list_1.data[0]['title'], response_create_2.data['title'])
-        self.assertEqual(response_list_1.data[1]['title'], response_create_1.data['title'])
-        self.assertEqual(response_list_1.data[0]['created_at'], response_create_2.data['created_at'])
-        self.assertEqual(response_list_1.data[1]['created_at'], response_create_1.data['created_at'])
-        self.assertNotIn('value', response_list_1.data[0])
-        self.assertNotIn('password', response_list_1.data[0])
-        self.assertNotIn('value', response_list_1.data[1])
-        self.assertNotIn('password', response_list_1.data[1])
+        self.assertEqual(len(response_list_1.data['results']), 2)
+        self.assertEqual(response_list_1.data['results'][0]['slug'], response_create_2.data['slug'])
+        self.assertEqual(response_list_1.data['results'][1]['slug'], response_create_1.data['slug'])
+        self.assertEqual(response_list_1.data['results'][0]['title'], response_create_2.data['title'])
+        self.assertEqual(response_list_1.data['results'][1]['title'], response_create_1.data['title'])
+        self.assertEqual(response_list_1.data['results'][0]['created_at'], response_create_2.data['created_at'])
+        self.assertEqual(response_list_1.data['results'][1]['created_at'], response_create_1.data['created_at'])
+        self.assertNotIn('value', response_list_1.data['results'][0])
+        self.assertNotIn('password', response_list_1.data['results'][0])
+        self.assertNotIn('value', response_list_1.data['results'][1])
+        self.assertNotIn('password', response_list_1.data['results'][1])
 
         # Filter by ?search=s
         response_list_2 = self.client.get('/api/entries/?search=s', format='json')
-        self.assertEqual(len(response_list_2.data), 2)
+        self.assertEqual(len(response_list_2.data['results']), 2)
         self.assertEqual(response_list_2.status_code, status.HTTP_200_OK)
-        self.assertEqual(response_list_2.data[0]['slug'], response_create_2.data['slug'])
-        self.assertEqual(response_list_2.data[1]['slug'], response_create_1.data['slug'])
-        self.assertEqual(response_list_2.data[0]['title'], response_create_2.data['title'])
-        self.assertEqual(response_list_2.data[1]['title'], response_create_1.data['title'])
-        self.assertEqual(response_list_2.data[0]['created_at'], response_create_2.data['created_at'])
-        self.assertEqual(response_list_2.data[1]['created_at'], response_create_1.data['created_at'])
+        self.assertEqual(response_list_2.data['results'][0]['slug'], response_create_2.data['slug'])
+        self.assertEqual(response_list_2.data['results'][1]['slug'], response_create_1.data['slug'])
+        self.assertEqual(response_list_2.data['results'][0]['title'], response_create_2.data['title'])
+        self.assertEqual(response_list_2.data['results'][1]['title'], response_create_1.data['title'])
+        self.assertEqual(response_list_2.data['results'][0]['created_at'], response_create_2.data['created_at'])
+        self.assertEqual(response_list_2.data['results'][1]['created_at'], response_create_1.data['created_at'])
 
         # Filter by ?search=se
         response_list_3 = self.client.get('/api/entries/?search=se', format='json')
-        self.assertEqual(len(response_list_3.data), 1)
+        self.assertEqual(len(response_list_3.data['results']), 1)
         self.assertEqual(response_list_3.status_code, status.HTTP_200_OK)
-        self.assertEqual(response_list_3.data[0]['slug'], response_create_2.data['slug'])
-        self.assertEqual(response_list_3.data[0]['title'], response_create_2.data['title'])
-        self.assertEqual(response_list_3.data[0]['created_at'], response_create_2.data['created_at'])
+        self.assertEqual(response_list_3.data['results'][0]['slug'], response_create_2.data['slug'])
+        self.assertEqual(response_list_3.data['results'][0]['title'], response_create_2.data['title'])
+        self.assertEqual(response_list_3.data['results'][0]['created_at'], response_create_2.data['created_at'])
 
         # Filter by ?search=f
         response_list_4 = self.client.get('/api/entries/?search=f', format='json')
-        self.assertEqual(len(response_list_4.data), 1)
+        self.assertEqual(len(response_list_4.data['results']), 1)
         self.assertEqual(response_list_4.status_code, status.HTTP_200_OK)
-        self.assertEqual(response_list_4.data[0]['slug'], response_create_1.data['slug'])
-        self.assertEqual(response_list_4.data[0]['title'], response_create_1.data['title'])
-        self.assertEqual(response_list_4.data[0]['created_at'], response_create_1.data['created_at'])
+        self.assertEqual(response_list_4.data['results'][0]['slug'], response_create_1.data['slug'])
+        self.assertEqual(response_list_4.data['results'][0]['title'], response_create_1.data['title'])
+        self.assertEqual(response_list_4.data['results'][0]['created_at'], response_create_1.data['created_at'])
 
         # Filter by ?search=
         response_list_5 = self.client.get('/api/entries/?search=', format='json')
-        self.assertEqual(len(response_list_5.data), 2)
+        self.assertEqual(len(response_list_5.data['results']), 2)
         self.assertEqual(response_list_5.status_code, status.HTTP_200_OK)
-        self.assertEqual(response_list_5.data[0]['slug'], response_create_2.data['slug'])
-        self.assertEqual(response_list_5.data[1]['slug'], response_create_1.data['slug'])
-        self.assertEqual(response_list_5.data[0]['title'], response_create_2.data['title'])
-        self.assertEqual(response_list_5.data[1]['title'], response_create_1.data['title'])
-        self.assertEqual(response_list_5.data[0]['created_at'], response_create_2.data['created_at'])
-        self.assertEqual(response_list_5.data[1]['created_at'], response_create_1.data['created_at'])
+        self.assertEqual(response_list_5.data['results'][0]['slug'], response_create_2.data['slug'])
+        self.assertEqual(response_list_5.data['results'][1]['slug'], response_create_1.data['slug'])
+        self.assertEqual(response_list_5.data['results'][0]['title'], response_create_2.data['title'])
+        self.assertEqual(response_list_5.data['results'][1]['title'], response_create_1.data['title'])
+        self.assertEqual(response_list_5.data['results'][0]['created_at'], response_create_2.data['created_at'])
+        self.assertEqual(response_list_5.data['results'][1]['created_at'], response_create_1.data['created_at'])
 
         # Filter by ?search=third
         response_list_6 = self.client.get('/api/entries/?search=third', format='json')
-        self.assertListEqual(response_list_6.data, [])
+        self.assertListEqual(response_list_6.data['results'], [])
         self.assertEqual(response_list_6.status_code, status.HTTP_200_OK)
         self.assertEqual(StatusLog.objects.using('logger').count(), 0)
 
+    def test_create_entry_throttle_error(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        # Failing to read the throttle history is logged like other errors
+        with patch(
+            'entries.api.athrottle_command',
+            side_effect=ConnectionError('redis'),
+        ):
+            response_error = self.client.post(reverse('entry-list'), data={
+                'title': test_entry_1['title'],
+                'value': test_entry_1['value'],
+                'password': test_user_1['password'],
+            }, format='json',)
+        self.assertEqual(response_error.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.user_1.entries.exists())
+        log = StatusLog.objects.using('logger').latest('created_at')
+        self.assertIn('Error creating entry.', log.msg)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 1)
+
+    def test_paginate_entries(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        create_entries(self.user_1, test_user_1['password'])
+        create_entries(
+            self.user_1, test_user_1['password'],
+            entry_1=dict(title='Third Entry', value='value_3'),
+            entry_2=dict(title='Fourth Entry', value='value_4'),)
+        create_entry(self.user_1, 'Fifth Entry')
+
+        # Entries sharing a timestamp are ordered by slug
+        tied = list(Entry.objects.filter(user=self.user_1)[:2])
+        Entry.objects.filter(slug__in=[e.slug for e in tied]).update(
+            created_at=tied[0].created_at)
+        expected = list(Entry.objects.filter(user=self.user_1) \
+            .order_by('-created_at', '-slug').values_list('slug', flat=True))
+
+        slugs = []
+        url = '/api/entries/?page_size=2'
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            slugs += [entry['slug'] for entry in response.data['results']]
+            url = response.data['next']
+            if url:
+                self.assertIn(f"cursor={response.data['next_cursor']}", url)
+        self.assertListEqual(slugs, expected)
+
+        # A new entry does not shift the following pages
+        response_1 = self.client.get('/api/entries/?page_size=2', format='json')
+        create_entry(self.user_1, 'Sixth Entry')
+        response_2 = self.client.get(response_1.data['next'], format='json')
+        self.assertListEqual(
+            [entry['slug'] for entry in response_2.data['results']],
+            expected[2:4],)
+
+        # Ascending order, combined with search
+        response_asc = self.client.get(
+            '/api/entries/?ordering=created_at&search=entry&page_size=3',
+            format='json',)
+        self.assertListEqual(
+            [entry['slug'] for entry in response_asc.data['results']],
+            list(reversed(expected))[:3],)
+        response_asc = self.client.get(response_asc.data['next'], format='json')
+        self.assertListEqual(
+            [entry['slug'] for entry in response_asc.data['results']],
+            list(reversed(expected))[3:] + [
+                Entry.objects.get(title='Sixth Entry').slug,
+            ],)
+        self.assertIsNone(response_asc.data['next'])
+        self.assertIsNone(response_asc.data['next_cursor'])
+
+        # Fail, invalid cursor
+        response_fail = self.client.get('/api/entries/?cursor=bad', format='json')
+        self.assertEqual(response_fail.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response_fail.data['detail'], 'Invalid cursor.')
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_search_entries(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        titles = [
+            'Bank account', 'Online banking', 'Email', 'Bank of Mars', 'Backpack',
+        ]
+        slugs = {
+            title: create_entry(self.user_1, title).slug
+            for title in titles
+        }
+
+        # Best matches first, newest first among equal matches
+        response_1 = self.client.get(
+            '/api/entries/?search=BANK&page_size=2', format='json')
+        self.assertEqual(response_1.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [entry['slug'] for entry in response_1.data['results']],
+            [slugs['Bank of Mars'], slugs['Bank account']],)
+        response_2 = self.client.get(response_1.data['next'], format='json')
+        self.assertListEqual(
+            [entry['slug'] for entry in response_2.data['results']],
+            [slugs['Online banking']],)
+        self.assertIsNone(response_2.data['next'])
+
+        # An explicit ordering takes precedence over ranking
+        response_3 = self.client.get(
+            '/api/entries/?search=bank&ordering=created_at', format='json')
+        self.assertListEqual(
+            [entry['slug'] for entry in response_3.data['results']],
+            [slugs['Bank account'], slugs['Online banking'], slugs['Bank of Mars']],)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_entries_list_cache(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        def titles():
+            response = self.client.get('/api/entries/?ordering=created_at', format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [entry['title'] for entry in response.data['results']]
+
+        def create(title):
+            response = self.client.post(reverse('entry-list'), data={
+                'title': title,
+                'value': 'value',
+                'password': test_user_1['password'],
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return response.data['slug']
+
+        slug = create('First Entry')
+        self.assertListEqual(titles(), ['First Entry'])
+        with patch('entries.api.ListCreateAPIView.list') as list_entries:
+            self.assertListEqual(titles(), ['First Entry'])
+            list_entries.assert_not_called()
+        self.assertDictEqual(
+            EntryListCache.stats(),
+            dict(hits=1, misses=1, coalesced=0, hit_rate=0.5),)
+
+        # Every write invalidates the user's cached pages
+        create('Second Entry')
+        self.assertListEqual(titles(), ['First Entry', 'Second Entry'])
+
+        response_update = self.client.put(
+            reverse('entry-update', args=[slug]),
+            data={
+                'title': 'Updated Entry',
+                'value': 'value',
+                'password': test_user_1['password'],
+            },
+            format='json',)
+        self.assertEqual(response_update.status_code, status.HTTP_200_OK)
+        self.assertListEqual(titles(), ['Updated Entry', 'Second Entry'])
+
+        response_destroy = self.client.post(
+            reverse('entry-destroy', args=[slug]),
+            data=dict(password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_destroy.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertListEqual(titles(), ['Second Entry'])
+
+        response_import = self.client.post(
+            reverse('entries-import'),
+            data=dict(
+                entries=[dict(title='Imported Entry', value='value')],
+                password=test_user_1['password'],),
+            format='json',)
+        self.assertEqual(response_import.status_code, status.HTTP_201_CREATED)
+        self.assertListEqual(titles(), ['Second Entry', 'Imported Entry'])
+        self.assertEqual(EntryListCache.stats()['misses'], 5)
+
+        # Concurrent identical requests wait for the first one's result
+        request = Request(APIRequestFactory().get('/api/entries/?search=entry'))
+        request.user = self.user_1
+        key = EntryListCache._key(request, EntryListCache.get_version(self.user_1))
+        cache.add(f'{key}_lock', 1)
+        Timer(0.2, lambda: cache.set(key, dict(results=[]))).start()
+        compute = Mock()
+        self.assertDictEqual(
+            EntryListCache.get_or_set(request, compute), dict(results=[]))
+        compute.assert_not_called()
+        self.assertEqual(EntryListCache.stats()['coalesced'], 1)
+
+        # Only admins can read the cache metrics
+        response_stats = self.client.get(reverse('entries-cache-stats'))
+        self.assertEqual(response_stats.status_code, status.HTTP_403_FORBIDDEN)
+        create_superuser()
+        login = self.client.post(reverse('login'), data={
+            'email': test_superuser['email'],
+            'password': test_superuser['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        response_stats = self.client.get(reverse('entries-cache-stats'))
+        self.assertEqual(response_stats.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response_stats.data, EntryListCache.stats())
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_entries_list_not_modified(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        create_entries(self.user_1, test_user_1['password'])
+
+        response_1 = self.client.get(reverse('entry-list'), format='json')
+        self.assertEqual(response_1.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', response_1.headers['Cache-Control'])
+        etag = response_1.headers['ETag']
+
+        # Unchanged vault, answered before querying or serializing it
+        with patch('entries.api.EntryListCache.get_or_set') as get_or_set:
+            response_2 = self.client.get(
+                reverse('entry-list'), format='json', HTTP_IF_NONE_MATCH=etag)
+            get_or_set.assert_not_called()
+        self.assertEqual(response_2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response_2.headers['ETag'], etag)
+
+        # Every page and search has its own ETag
+        response_3 = self.client.get(
+            '/api/entries/?search=entry', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response_3.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response_3.headers['ETag'], etag)
+
+        # Changed vault
+        response_create = self.client.post(reverse('entry-list'), data={
+            'title': 'Third Entry',
+            'value': 'value_3',
+            'password': test_user_1['password'],
+        }, format='json')
+        self.assertEqual(response_create.status_code, status.HTTP_201_CREATED)
+        response_4 = self.client.get(
+            reverse('entry-list'), format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response_4.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response_4.data['results']), 3)
+        self.assertNotEqual(response_4.headers['ETag'], etag)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    @override_settings(ENTRY_SYNC=dict(
+        PAGE_SIZE=2, OVERLAP_SECONDS=0, TOMBSTONE_RETENTION_DAYS=30,))
+    def test_sync_entries(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        slugs = [
+            entry.slug for entry in create_entries(self.user_1, test_user_1['password'])
+        ]
+        create_entry(self.user_1, 'Third Entry')
+
+        def sync(cursor=None):
+            response = self.client.get(
+                reverse('entries-sync'),
+                data=dict(cursor=cursor) if cursor else {},)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response.data
+
+        # Full sync, in pages
+        sync_1 = sync()
+        self.assertEqual(len(sync_1['entries']), 2)
+        self.assertTrue(sync_1['has_more'])
+        sync_2 = sync(sync_1['cursor'])
+        self.assertEqual(len(sync_2['entries']), 1)
+        self.assertFalse(sync_2['has_more'])
+        self.assertCountEqual(
+            [entry['slug'] for entry in sync_1['entries'] + sync_2['entries']],
+            Entry.objects.values_list('slug', flat=True),)
+        self.assertListEqual(
+            list(sync_2['entries'][0].keys()),
+            ['slug', 'title', 'created_at', 'updated_at'],)
+
+        # Nothing changed
+        sync_3 = sync(sync_2['cursor'])
+        self.assertListEqual(sync_3['entries'], [])
+        self.assertListEqual(sync_3['deleted'], [])
+
+        # Only the changes since the cursor
+        response_update = self.client.put(
+            reverse('entry-update', args=[slugs[0]]),
+            data={
+                'title': 'Updated Entry',
+                'value': 'value',
+                'password': test_user_1['password'],
+            },
+            format='json',)
+        self.assertEqual(response_update.status_code, status.HTTP_200_OK)
+        response_destroy = self.client.post(
+            reverse('entry-destroy', args=[slugs[1]]),
+            data=dict(password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_destroy.status_code, status.HTTP_204_NO_CONTENT)
+        sync_4 = sync(sync_3['cursor'])
+        self.assertListEqual(
+            [(entry['slug'], entry['title']) for entry in sync_4['entries']],
+            [(slugs[0], 'Updated Entry')],)
+        self.assertListEqual(sync_4['deleted'], [slugs[1]])
+        sync_5 = sync(sync_4['cursor'])
+        self.assertListEqual(sync_5['entries'], [])
+        self.assertListEqual(sync_5['deleted'], [])
+
+        # Fail, invalid cursor
+        response_fail_1 = self.client.get(
+            reverse('entries-sync'), data=dict(cursor='bad'))
+        self.assertEqual(response_fail_1.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertListEqual(response_fail_1.data['cursor'], ['Invalid cursor.'])
+
+        # Fail, tombstones since the cursor may have been purged
+        position = (timezone.now() - timedelta(days=31), '')
+        response_fail_2 = self.client.get(
+            reverse('entries-sync'),
+            data=dict(cursor=encode_sync_cursor(position, position)),)
+        self.assertEqual(response_fail_2.status_code, status.HTTP_410_GONE)
+        self.assertEqual(
+            response_fail_2.data['detail'],
+            'Sync cursor expired. Please sync again from the start.',)
+
+        EntryTombstone.objects.create(user=self.user_1, slug='expired123')
+        EntryTombstone.objects.filter(slug='expired123').update(
+            created_at=timezone.now() - timedelta(days=31))
+        call_command('purge_entry_tombstones', stdout=StringIO())
+        self.assertListEqual(
+            list(EntryTombstone.objects.values_list('slug', flat=True)),
+            [slugs[1]],)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
     def test_retrieve_entry(self):
         login = self.client.post(reverse('login'), data={
             'email': test_user_1['email'],
@@ -231,8 +602,184 @@ class EntryTest(APITestCase):
         self.assertEqual(response_update.data['title'], 'NewEntry@1.0.1')
         self.assertEqual(response_update.data['value'], 'value_1.0.1')
         self.assertNotIn('password', response_update.data)
+
+        # The secret is overwritten in place
+        self.assertEqual(EntrySecret.objects.count(), 1)
+        self.assertEqual(decrypt_value(
+            EntrySecret.objects.get(entry__slug=slug).value,
+            get_data_key(self.user_1, test_user_1['password']),
+        ), 'value_1.0.1')
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_rename_entry(self):
+        entries = create_entries(self.user_1, test_user_1['password'])
+        slug = entries[0].slug
+        ciphertext = bytes(EntrySecret.objects.get(entry__slug=slug).value)
+
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        # A title alone needs neither the password nor any encryption
+        with patch(
+            'users.models.CustomUser.check_password',
+        ) as mock_check_password, patch(
+            'entries.vaults.encrypt_value',
+        ) as mock_encrypt_value:
+            response_rename = self.client.patch(
+                reverse('entry-update', args=[slug]),
+                data={ 'title': 'Renamed' },
+                format='json',)
+            self.assertEqual(mock_check_password.call_count, 0)
+            self.assertEqual(mock_encrypt_value.call_count, 0)
+        self.assertEqual(response_rename.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_rename.data['slug'], slug)
+        self.assertEqual(response_rename.data['title'], 'Renamed')
+        self.assertNotIn('value', response_rename.data)
+        self.assertEqual(Entry.objects.get(slug=slug).title, 'Renamed')
+        self.assertEqual(
+            bytes(EntrySecret.objects.get(entry__slug=slug).value), ciphertext)
+
+        # A given password is still checked
+        response_wrong_password = self.client.patch(
+            reverse('entry-update', args=[slug]),
+            data={ 'title': 'Renamed again', 'password': 'wrong' },
+            format='json',)
+        self.assertEqual(
+            response_wrong_password.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response_wrong_password.data['password'], ['Invalid password.'])
+
+        # Fail, a value needs the password
+        response_value = self.client.patch(
+            reverse('entry-update', args=[slug]),
+            data={ 'value': 'new value' },
+            format='json',)
+        self.assertEqual(response_value.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response_value.data['password'], ['This field is required.'])
+
+        # Fail, a full update needs both
+        response_put = self.client.put(
+            reverse('entry-update', args=[slug]),
+            data={ 'title': 'Renamed again' },
+            format='json',)
+        self.assertEqual(response_put.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            set(response_put.data.keys()), { 'value', 'password' })
+
+        response_update = self.client.patch(
+            reverse('entry-update', args=[slug]),
+            data={ 'value': 'new value', 'password': test_user_1['password'] },
+            format='json',)
+        self.assertEqual(response_update.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_update.data['title'], 'Renamed')
+        self.assertEqual(response_update.data['value'], 'new value')
         self.assertEqual(StatusLog.objects.using('logger').count(), 0)
     
+    def test_idempotency_keys(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        data = {
+            'title': 'NewEntry@1.0.0',
+            'value': 'value_1.0.0',
+            'password': test_user_1['password'],
+        }
+
+        # A retried request is answered without being run again
+        with patch(
+            'entries.vaults.encrypt_value', wraps=encrypt_value,
+        ) as mock_encrypt_value:
+            response_create = self.client.post(
+                reverse('entry-list'), data=data, format='json',
+                HTTP_IDEMPOTENCY_KEY='create-1',)
+            response_retry = self.client.post(
+                reverse('entry-list'), data=data, format='json',
+                HTTP_IDEMPOTENCY_KEY='create-1',)
+            self.assertEqual(mock_encrypt_value.call_count, 1)
+        self.assertEqual(response_create.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response_create)
+        self.assertEqual(response_retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response_retry['Idempotent-Replayed'], 'true')
+        self.assertDictEqual(response_retry.data, response_create.data)
+        self.assertEqual(Entry.objects.count(), 1)
+        slug = response_create.data['slug']
+
+        # Fail, the key was used for a different request
+        response_reused = self.client.post(
+            reverse('entry-list'), data=dict(data, title='Other'), format='json',
+            HTTP_IDEMPOTENCY_KEY='create-1',)
+        self.assertEqual(
+            response_reused.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # Fail, invalid key
+        response_invalid = self.client.post(
+            reverse('entry-list'), data=data, format='json',
+            HTTP_IDEMPOTENCY_KEY='k' * 256,)
+        self.assertEqual(response_invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Entry.objects.count(), 1)
+
+        # Stored responses are encrypted, since they can hold values
+        update = dict(data, value='value_1.0.1')
+        response_update = self.client.put(
+            reverse('entry-update', args=[slug]), data=update, format='json',
+            HTTP_IDEMPOTENCY_KEY='update-1',)
+        self.assertEqual(response_update.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_update.data['value'], 'value_1.0.1')
+        keys = cache.keys('idempotency_*')
+        self.assertEqual(len(keys), 2)
+        for key in keys:
+            self.assertNotIn(b'value_1.0', cache.get(key))
+
+        # Concurrent duplicates wait for the first request's response
+        for key in keys:
+            payload = cache.get(key)
+            cache.delete(key)
+            cache.add(f'{key}_lock', 1)
+            Timer(0.2, lambda key=key, payload=payload: (
+                cache.set(key, payload), cache.delete(f'{key}_lock'),
+            )).start()
+        with patch('entries.vaults.encrypt_value') as mock_encrypt_value:
+            response_retry = self.client.put(
+                reverse('entry-update', args=[slug]), data=update,
+                format='json', HTTP_IDEMPOTENCY_KEY='update-1',)
+            mock_encrypt_value.assert_not_called()
+        self.assertEqual(response_retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(response_retry.data['value'], 'value_1.0.1')
+
+        # Fail, the first request is still running
+        cache.add('idempotency_lock_test_lock', 1)
+        with override_settings(IDEMPOTENCY_KEYS=dict(
+            settings.IDEMPOTENCY_KEYS, WAIT_TIMEOUT=0.1,
+        )), patch(
+            'utils.idempotency.IdempotencyCache._key',
+            return_value='idempotency_lock_test',
+        ):
+            response_in_use = self.client.post(
+                reverse('entry-destroy', args=[slug]),
+                data=dict(password=test_user_1['password']), format='json',
+                HTTP_IDEMPOTENCY_KEY='destroy-1',)
+        self.assertEqual(response_in_use.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Entry.objects.count(), 1)
+
+        # A retried deletion is answered as if it succeeded again
+        for _ in range(2):
+            response_destroy = self.client.post(
+                reverse('entry-destroy', args=[slug]),
+                data=dict(password=test_user_1['password']), format='json',
+                HTTP_IDEMPOTENCY_KEY='destroy-1',)
+            self.assertEqual(
+                response_destroy.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Entry.objects.count(), 0)
+        self.assertEqual(EntryTombstone.objects.count(), 1)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
     def test_successful_destroy_entry(self):
         login = self.client.post(reverse('login'), data={
             'email': test_user_1['email'],
@@ -264,4 +811,863 @@ class EntryTest(APITestCase):
             format='json',)
         self.assertEqual(response_retrieve.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Entry.objects.using('default').count(), 0)
-        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
\ No newline at end of file
+        self.assertEqual(EntrySecret.objects.using('default').count(), 0)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_list_entries_skips_secrets(self):
+        create_entries(self.user_1, test_user_1['password'])
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        for params in ({}, { 'search': 'TestEntry' }):
+            with CaptureQueriesContext(connection) as queries:
+                response_list = self.client.get(reverse('entry-list'), params)
+            self.assertEqual(response_list.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response_list.data['results']), 2)
+            for query in queries:
+                self.assertNotIn('entries_entrysecret', query['sql'])
+
+        # Decrypting paths fetch the secret along with the entry
+        slug = response_list.data['results'][0]['slug']
+        with CaptureQueriesContext(connection) as queries:
+            response_retrieve = self.client.post(
+                reverse('entry-retrieve', args=[slug]),
+                data=dict(password=test_user_1['password']),
+                format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([
+            query for query in queries \
+            if 'entries_entrysecret' in query['sql']
+        ]), 1)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_entry_slug_collision(self):
+        entry = create_entry(self.user_1, 'First Entry')
+        self.assertIsInstance(entry.pk, int)
+
+        # A colliding slug is regenerated instead of failing the insert
+        collision = Entry(user=self.user_1, title='Second Entry', slug=entry.slug)
+        collision.save()
+        self.assertNotEqual(collision.slug, entry.slug)
+        self.assertEqual(Entry.objects.filter(user=self.user_1).count(), 2)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_legacy_entries_migrated_to_vault_key(self):
+        legacy_1 = create_entry(
+            self.user_1, test_entry_1['title'],
+            CryptocodeCipher().encrypt_binary(
+                test_entry_1['value'], test_user_1['password'],),)
+        legacy_2 = create_entry(
+            self.user_1, test_entry_2['title'],
+            CryptocodeCipher().encrypt_binary(
+                test_entry_2['value'], test_user_1['password'],),)
+        self.assertEqual(self.user_1.vault_key, '')
+        self.assertTrue(is_legacy_ciphertext(legacy_1.secret.value))
+        self.assertTrue(is_legacy_ciphertext(legacy_2.secret.value))
+
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        response_retrieve = self.client.post(
+            reverse('entry-retrieve', args=[legacy_1.slug]),
+            data=dict(password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retrieve.data['value'], test_entry_1['value'])
+
+        # All of the user's entries are upgraded on first use of the password
+        self.user_1.refresh_from_db()
+        self.assertNotEqual(self.user_1.vault_key, '')
+        for secret in EntrySecret.objects.filter(entry__user=self.user_1):
+            self.assertTrue(bytes(secret.value).startswith(DATA_KEY_PREFIX))
+
+        response_retrieve = self.client.post(
+            reverse('entry-retrieve', args=[legacy_2.slug]),
+            data=dict(password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retrieve.data['value'], test_entry_2['value'])
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    @override_settings(DATA_KEY_CACHE=dict(ENABLED=True, MAX_ENTRIES=1, TTL=300))
+    def test_data_key_cache(self):
+        redis = get_redis_connection('default')
+        entries = create_entries(self.user_1, test_user_1['password'])
+
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        with patch(
+            'entries.key_cache.get_data_key', wraps=get_data_key,
+        ) as mock_get_data_key:
+            for entry, test_entry in zip(entries, [test_entry_2, test_entry_1]):
+                response_retrieve = self.client.post(
+                    reverse('entry-retrieve', args=[entry.slug]),
+                    data=dict(password=test_user_1['password']),
+                    format='json',)
+                self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+                self.assertEqual(response_retrieve.data['value'], test_entry['value'])
+
+            response_create = self.client.post(
+                reverse('entry-list'),
+                data={
+                    'title': 'NewEntry@1.0.0',
+                    'value': 'value_1.0.0',
+                    'password': test_user_1['password'],
+                },
+                format='json',)
+            self.assertEqual(response_create.status_code, status.HTTP_201_CREATED)
+
+            # Only the first request in the session unwraps the data key
+            self.assertEqual(mock_get_data_key.call_count, 1)
+
+        # Cached keys are encrypted under the client's token
+        self.assertEqual(redis.zcard(DataKeyCache.index_key), 1)
+        key = redis.zrange(DataKeyCache.index_key, 0, -1)[0]
+        self.assertNotIn(get_data_key(
+            self.user_1, test_user_1['password'],), redis.get(key))
+
+        # A second session evicts the first one when the cache is full
+        login_2 = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login_2.data['token']}")
+        response_retrieve = self.client.post(
+            reverse('entry-retrieve', args=[entries[0].slug]),
+            data=dict(password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(redis.zcard(DataKeyCache.index_key), 1)
+        self.assertIsNone(redis.get(key))
+
+        # Logging out evicts the session's key
+        response_logout = self.client.post(reverse('logout'))
+        self.assertEqual(response_logout.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(redis.zcard(DataKeyCache.index_key), 0)
+        self.assertListEqual(redis.keys('data_key_*'), [])
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_resume_interrupted_reencryption(self):
+        password = test_user_1['password']
+        for i in range(5):
+            create_entry(
+                self.user_1, f'Legacy {i}',
+                CryptocodeCipher().encrypt_binary(
+                    f'legacy_value_{i}', password,),)
+
+        calls = []
+        def reencrypt_then_crash(value, *args):
+            if len(calls) == 2:
+                raise RuntimeError('Interrupted')
+            calls.append(value)
+            return reencrypt_legacy_value(value, *args)
+
+        with patch('entries.reencryption.REENCRYPTION_CHUNK_SIZE', 2), patch(
+            'entries.crypto.reencrypt_legacy_value', reencrypt_then_crash,
+        ):
+            with self.assertRaises(RuntimeError):
+                get_data_key(self.user_1, password)
+
+        # The first chunk and the wrapped data key were committed
+        self.user_1.refresh_from_db()
+        self.assertNotEqual(self.user_1.vault_key, '')
+        job = ReencryptionJob.objects.get(user=self.user_1)
+        self.assertEqual(job.total, 5)
+        self.assertEqual(job.completed, 2)
+        self.assertEqual(len([
+            secret for secret in EntrySecret.objects.filter(
+                entry__user=self.user_1) \
+            if not is_legacy_ciphertext(secret.value)
+        ]), 2)
+
+        # The next use of the password resumes the job
+        with patch('entries.reencryption.REENCRYPTION_POOL_THRESHOLD', 2):
+            data_key = get_data_key(self.user_1, password)
+        self.assertFalse(ReencryptionJob.objects.filter(user=self.user_1).exists())
+        for i, secret in enumerate(EntrySecret.objects.filter(
+            entry__user=self.user_1).order_by('entry__title'),
+        ):
+            self.assertTrue(bytes(secret.value).startswith(DATA_KEY_PREFIX))
+            self.assertEqual(
+                decrypt_value(secret.value, data_key), f'legacy_value_{i}',)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    @patch('entries.reencryption.REENCRYPTION_CHUNK_SIZE', 2)
+    @patch('entries.crypto.REENCRYPTION_REQUEST_BUDGET', 0)
+    def test_reencryption_spread_over_requests(self):
+        password = test_user_1['password']
+        new_password = 'n3wPa$$w0rd!'
+        legacy = [
+            create_entry(
+                self.user_1, f'Legacy {i}',
+                CryptocodeCipher().encrypt_binary(
+                    f'legacy_value_{i}', password,),) \
+            for i in range(7)
+        ]
+        is_converted = lambda entry: not is_legacy_ciphertext(
+            EntrySecret.objects.get(pk=entry.pk).value)
+
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': password,
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        # Each request converts one chunk, and reads values not converted yet
+        response_retrieve = self.client.post(
+            reverse('entry-retrieve', args=[legacy[-1].slug]),
+            data=dict(password=password),
+            format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retrieve.data['value'], 'legacy_value_6')
+        self.assertEqual(len([
+            entry for entry in legacy if is_converted(entry)
+        ]), 2)
+        self.assertEqual(ReencryptionJob.objects.get(user=self.user_1).completed, 2)
+
+        # A password change converts the rest with the old password first
+        response_patch = self.client.patch(
+            f'/api/users/{self.user_1.user_slug}/',
+            data={
+                'current_password': password,
+                'password': new_password,
+                'password_2': new_password,
+            },
+            format='json',)
+        self.assertEqual(response_patch.status_code, status.HTTP_200_OK)
+        self.assertFalse(ReencryptionJob.objects.filter(user=self.user_1).exists())
+        response_retrieve = self.client.post(
+            reverse('entry-retrieve', args=[legacy[-1].slug]),
+            data=dict(password=new_password),
+            format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retrieve.data['value'], 'legacy_value_6')
+
+        self.user_1.refresh_from_db()
+        data_key = get_data_key(self.user_1, new_password)
+        for i, entry in enumerate(legacy):
+            self.assertTrue(is_converted(entry))
+            self.assertEqual(decrypt_value(
+                EntrySecret.objects.get(pk=entry.pk).value, data_key,
+            ), f'legacy_value_{i}')
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_reencryption_skips_undecryptable_entries(self):
+        password = test_user_1['password']
+        legacy = [
+            create_entry(
+                self.user_1, f'Legacy {i}',
+                CryptocodeCipher().encrypt_binary(
+                    f'legacy_value_{i}', password,),) \
+            for i in range(3)
+        ]
+        # Left under an older password by an interrupted password change
+        stale = create_entry(
+            self.user_1, 'Stale',
+            CryptocodeCipher().encrypt_binary('stale_value', 'oldPa$$w0rd'),)
+
+        data_key = get_data_key(self.user_1, password)
+        for i, entry in enumerate(legacy):
+            entry.secret.refresh_from_db()
+            self.assertEqual(
+                decrypt_value(entry.secret.value, data_key),
+                f'legacy_value_{i}',)
+        job = ReencryptionJob.objects.get(user=self.user_1)
+        self.assertEqual(job.completed, 3)
+        self.assertListEqual(job.failed_entries, [stale.pk])
+        log = StatusLog.objects.using('logger').latest('created_at')
+        self.assertIn('Unable to re-encrypt legacy entries.', log.msg)
+        self.assertEqual(log.user, self.user_1.user_slug)
+        self.assertDictEqual(log.metadata, dict(failed_entries=[stale.slug]))
+
+        # The rest of the vault stays usable, and failures are reported once
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': password,
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        response_retrieve = self.client.post(
+            reverse('entry-retrieve', args=[legacy[0].slug]),
+            data=dict(password=password),
+            format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retrieve.data['value'], 'legacy_value_0')
+        response_create = self.client.post(
+            reverse('entry-list'),
+            data={
+                'title': 'NewEntry@1.0.0',
+                'value': 'value_1.0.0',
+                'password': password,
+            },
+            format='json',)
+        self.assertEqual(response_create.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 1)
+
+        # The job ends once the failed entry is gone
+        stale.delete()
+        get_data_key(self.user_1, password)
+        self.assertFalse(ReencryptionJob.objects.filter(user=self.user_1).exists())
+        self.assertEqual(StatusLog.objects.using('logger').count(), 1)
+
+    def test_retrieve_entries(self):
+        entries = create_entries(self.user_1, test_user_1['password'])
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        slugs = [entry.slug for entry in entries]
+
+        # Fail, invalid password
+        response_fail_1 = self.client.post(
+            reverse('entries-retrieve'),
+            data=dict(slugs=slugs, password='badPa$$w0rd'),
+            format='json',)
+        self.assertEqual(response_fail_1.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertListEqual(response_fail_1.data['password'], ['Invalid password.'])
+
+        # Fail, no slugs
+        response_fail_2 = self.client.post(
+            reverse('entries-retrieve'),
+            data=dict(slugs=[], password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_fail_2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('slugs', response_fail_2.data)
+
+        # Success, unknown slugs are ignored
+        with patch(
+            'entries.key_cache.get_data_key', wraps=get_data_key,
+        ) as mock_get_data_key:
+            response_retrieve = self.client.post(
+                reverse('entries-retrieve'),
+                data=dict(
+                    slugs=slugs + ['slugwrong1'],
+                    password=test_user_1['password'],),
+                format='json',)
+            self.assertEqual(mock_get_data_key.call_count, 1)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response_retrieve.data), 2)
+        self.assertEqual(response_retrieve.data[0]['slug'], entries[0].slug)
+        self.assertEqual(response_retrieve.data[0]['title'], test_entry_2['title'])
+        self.assertEqual(response_retrieve.data[0]['value'], test_entry_2['value'])
+        self.assertEqual(response_retrieve.data[1]['slug'], entries[1].slug)
+        self.assertEqual(response_retrieve.data[1]['title'], test_entry_1['title'])
+        self.assertEqual(response_retrieve.data[1]['value'], test_entry_1['value'])
+        self.assertNotIn('password', response_retrieve.data[0])
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_import_entries(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        # Fail, invalid password
+        response_fail = self.client.post(
+            reverse('entries-import'),
+            data=dict(entries=[test_entry_1], password='badPa$$w0rd'),
+            format='json',)
+        self.assertEqual(response_fail.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertListEqual(response_fail.data['password'], ['Invalid password.'])
+        self.assertEqual(Entry.objects.count(), 0)
+
+        # JSON, with one invalid row
+        response_json = self.client.post(
+            reverse('entries-import'),
+            data=dict(
+                entries=[test_entry_1, { 'title': 'No value' }, test_entry_2],
+                password=test_user_1['password'],),
+            format='json',)
+        self.assertEqual(response_json.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response_json.data['created'], 2)
+        self.assertEqual(len(response_json.data['errors']), 1)
+        self.assertEqual(response_json.data['errors'][0]['row'], 2)
+        self.assertListEqual(
+            response_json.data['errors'][0]['errors']['value'],
+            ['This field is required.'],)
+
+        # CSV file using another password manager's column names
+        csv_file = SimpleUploadedFile(
+            'export.csv',
+            b'name,url,username,password\n'
+            b'Imported 1,https://a.com,jane,imported_value_1\n'
+            b'Imported 2,https://b.com,jane,imported_value_2\n',
+            content_type='text/csv',)
+        response_csv = self.client.post(
+            reverse('entries-import'),
+            data=dict(file=csv_file, password=test_user_1['password']),
+            format='multipart',)
+        self.assertEqual(response_csv.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response_csv.data['created'], 2)
+        self.assertListEqual(response_csv.data['errors'], [])
+
+        # Fail, invalid files
+        for name, content in (
+            ('export.json', b'{"entries": '),
+            ('export.json', b'"entries"'),
+            ('export.json', b'{"entries": {"title": "value"}}'),
+            ('export.csv', b'\xff\xfe\x00'),
+        ):
+            response_invalid = self.client.post(
+                reverse('entries-import'),
+                data=dict(
+                    file=SimpleUploadedFile(name, content),
+                    password=test_user_1['password'],),
+                format='multipart',)
+            self.assertEqual(
+                response_invalid.status_code, status.HTTP_400_BAD_REQUEST,)
+            self.assertListEqual(
+                response_invalid.data['file'], ['Invalid import file.'],)
+
+        response_list = self.client.get(reverse('entry-list'), format='json')
+        self.assertEqual(len(response_list.data['results']), 4)
+        slugs = [entry['slug'] for entry in response_list.data['results']]
+        self.assertEqual(len(set(slugs)), 4)
+
+        response_retrieve = self.client.post(
+            reverse('entries-retrieve'),
+            data=dict(slugs=slugs, password=test_user_1['password']),
+            format='json',)
+        self.assertCountEqual(
+            [(entry['title'], entry['value']) for entry in response_retrieve.data],
+            [
+                (test_entry_1['title'], test_entry_1['value']),
+                (test_entry_2['title'], test_entry_2['value']),
+                ('Imported 1', 'imported_value_1'),
+                ('Imported 2', 'imported_value_2'),
+            ],)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+        # Fail, unexpected error, without logging the entries
+        with patch(
+            'entries.api.import_entries', side_effect=RuntimeError('import'),
+        ):
+            response_error = self.client.post(
+                reverse('entries-import'),
+                data=dict(
+                    entries=[test_entry_1], password=test_user_1['password'],),
+                format='json',)
+        self.assertEqual(response_error.status_code, status.HTTP_400_BAD_REQUEST)
+        log = StatusLog.objects.using('logger').latest('created_at')
+        self.assertIn('Error importing entries.', log.msg)
+        self.assertDictEqual(log.metadata['request_data'], {})
+        self.assertNotIn(test_entry_1['value'], json.dumps(log.metadata))
+        self.assertEqual(StatusLog.objects.using('logger').count(), 1)
+
+        # Each batch is committed on its own, and kept if a later one fails
+        self.assertEqual(len(self.client.get(
+            reverse('entry-list'), format='json').data['results']), 4)
+        with patch('entries.imports.IMPORT_BATCH_SIZE', 1), patch(
+            'entries.imports.lock_vault',
+            side_effect=[None, RuntimeError('batch')],
+        ) as mock_lock_vault:
+            response_partial = self.client.post(
+                reverse('entries-import'),
+                data=dict(
+                    entries=[test_entry_1, test_entry_2],
+                    password=test_user_1['password'],),
+                format='json',)
+        self.assertEqual(mock_lock_vault.call_count, 2)
+        self.assertEqual(response_partial.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Entry.objects.count(), 5)
+        self.assertEqual(len(self.client.get(
+            reverse('entry-list'), format='json').data['results']), 5)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 2)
+
+    def test_export_entries(self):
+        entries = create_entries(self.user_1, test_user_1['password'])
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        expected = [
+            dict(
+                title=entry.title,
+                value=test_entry['value'],
+                slug=entry.slug,
+                created_at=entry.created_at.isoformat(),)
+            for entry, test_entry in zip(entries, [test_entry_2, test_entry_1])
+        ]
+
+        # Fail, invalid password
+        response_fail = self.client.post(
+            reverse('entries-export'),
+            data=dict(password='badPa$$w0rd'),
+            format='json',)
+        self.assertEqual(response_fail.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertListEqual(response_fail.data['password'], ['Invalid password.'])
+
+        # NDJSON
+        response_ndjson = self.client.post(
+            reverse('entries-export'),
+            data=dict(password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_ndjson.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_ndjson['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            response_ndjson['Content-Disposition'],
+            'attachment; filename="simplepasswords-export.ndjson"',)
+        content = b''.join(response_ndjson.streaming_content).decode()
+        self.assertListEqual(
+            [json.loads(line) for line in content.splitlines()], expected,)
+
+        # CSV
+        response_csv = self.client.post(
+            reverse('entries-export'),
+            data=dict(format='csv', password=test_user_1['password']),
+            format='json',)
+        self.assertEqual(response_csv.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_csv['Content-Type'], 'text/csv')
+        content = b''.join(response_csv.streaming_content).decode()
+        self.assertListEqual(
+            list(csv.DictReader(StringIO(content))), expected,)
+
+        # Encrypted under an export passphrase
+        response_encrypted = self.client.post(
+            reverse('entries-export'),
+            data=dict(
+                passphrase='export passphrase',
+                password=test_user_1['password'],),
+            format='json',)
+        self.assertEqual(response_encrypted.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response_encrypted['Content-Type'], 'application/octet-stream',)
+        lines = b''.join(
+            response_encrypted.streaming_content).decode().splitlines()
+        self.assertNotIn(test_entry_1['value'], ''.join(lines))
+        content = ''.join(decrypt_export(lines, 'export passphrase'))
+        self.assertListEqual(
+            [json.loads(line) for line in content.splitlines()], expected,)
+
+        # Truncated exports fail to decrypt
+        with self.assertRaises(Exception):
+            ''.join(decrypt_export(lines[:-1], 'export passphrase'))
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_vault_key_cipher_upgrade(self):
+        password = test_user_1['password']
+        data_key = generate_data_key()
+        self.user_1.vault_key = CryptocodeCipher().encrypt(
+            b64encode(data_key).decode(), password,)
+        self.user_1.save()
+        entry = create_entry(
+            self.user_1, test_entry_1['title'],
+            encrypt_value(test_entry_1['value'], data_key),)
+
+        # Unversioned cryptocode vault keys are upgraded when read
+        self.assertEqual(get_data_key(self.user_1, password), data_key)
+        self.user_1.refresh_from_db()
+        self.assertTrue(self.user_1.vault_key.startswith('scrypt$n=16384,r=8,p=1$'))
+        vault_key = self.user_1.vault_key
+        self.assertEqual(get_data_key(self.user_1, password), data_key)
+        self.assertEqual(self.user_1.vault_key, vault_key)
+
+        # Changing the configured cipher or its parameters upgrades vault keys
+        with override_settings(DATA_KEY_WRAPPING=dict(
+            CIPHER='argon2id',
+            ARGON2ID=dict(time_cost=1, memory_cost=8192, parallelism=1),
+            SCRYPT=dict(n=2 ** 14, r=8, p=1),
+        )):
+            self.assertEqual(get_data_key(self.user_1, password), data_key)
+            self.user_1.refresh_from_db()
+            self.assertTrue(self.user_1.vault_key.startswith(
+                'argon2id$time_cost=1,memory_cost=8192,parallelism=1$'))
+
+            login = self.client.post(reverse('login'), data={
+                'email': test_user_1['email'],
+                'password': password,
+            })
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+            response_retrieve = self.client.post(
+                reverse('entry-retrieve', args=[entry.slug]),
+                data=dict(password=password),
+                format='json',)
+            self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+            self.assertEqual(response_retrieve.data['value'], test_entry_1['value'])
+
+        with self.assertRaises(CipherError):
+            get_cipher('unknown$ciphertext')
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+    def test_binary_ciphertexts(self):
+        password = test_user_1['password']
+        data_key = generate_data_key()
+        value = 'v' * 100
+
+        # One version byte, the nonce and the tag on top of the plaintext
+        ciphertext = encrypt_value(value, data_key)
+        self.assertEqual(len(ciphertext), 1 + 12 + len(value) + 16)
+        self.assertTrue(ciphertext.startswith(DATA_KEY_PREFIX))
+        self.assertEqual(decrypt_value(ciphertext, data_key), value)
+
+        legacy = CryptocodeCipher().encrypt(value, password)
+        packed = CryptocodeCipher().pack(legacy)
+        self.assertEqual(len(packed), 1 + 16 * 3 + len(value))
+        self.assertEqual(CryptocodeCipher().unpack(packed), legacy)
+        self.assertTrue(is_legacy_ciphertext(packed))
+        self.assertEqual(
+            decrypt_value(
+                reencrypt_legacy_value(packed, password, data_key), data_key,),
+            value,)
+
+        # Rows written before binary storage are converted by the migration
+        migration = import_module('entries.migrations.0009_entrysecret_convert_value')
+        for text in (legacy, DataKeyCipher().version + '$' + b64encode(
+            ciphertext[1:]).decode(),
+        ):
+            self.assertEqual(migration.to_text(migration.to_binary(text)), text)
+        self.assertEqual(migration.to_binary(legacy), packed)
+
+        with self.assertRaises(CipherError):
+            decrypt_value(b'\xff' + ciphertext[1:], data_key)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+
+    def test_client_vault(self):
+        entries = create_entries(self.user_1, test_user_1['password'])
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        self.assertEqual(login.data['user']['vault_mode'], 'server')
+
+        # The client reads its entries and encrypts them itself
+        response_retrieve = self.client.post(reverse('entries-retrieve'), data={
+            'slugs': [entry.slug for entry in entries],
+            'password': test_user_1['password'],
+        }, format='json',)
+        plaintexts = {
+            entry['slug']: entry['value'] for entry in response_retrieve.data
+        }
+        ciphertexts = {
+            slug: b64encode(f'client:{value}'.encode('utf-8')).decode('ascii') \
+            for slug, value in plaintexts.items()
+        }
+
+        # Fail, invalid ciphertext
+        response_invalid = self.client.post(reverse('vault-mode'), data={
+            'mode': 'client',
+            'entries': dict(ciphertexts, **{ entries[0].slug: 'not base64!' }),
+            'password': test_user_1['password'],
+        }, format='json',)
+        self.assertEqual(response_invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Fail, an entry is missing
+        response_changed = self.client.post(reverse('vault-mode'), data={
+            'mode': 'client',
+            'entries': { entries[0].slug: ciphertexts[entries[0].slug] },
+            'password': test_user_1['password'],
+        }, format='json',)
+        self.assertEqual(response_changed.status_code, status.HTTP_409_CONFLICT)
+        self.user_1.refresh_from_db()
+        self.assertEqual(self.user_1.vault_mode, 'server')
+
+        response_switch = self.client.post(reverse('vault-mode'), data={
+            'mode': 'client',
+            'entries': ciphertexts,
+            'password': test_user_1['password'],
+        }, format='json',)
+        self.assertEqual(response_switch.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response_switch.data, dict(mode='client', updated=2))
+        self.user_1.refresh_from_db()
+        self.assertEqual(self.user_1.vault_mode, 'client')
+
+        # Values are stored and returned as they are, without the password or
+        # any cryptography
+        with patch(
+            'users.models.CustomUser.check_password',
+        ) as mock_check_password, patch(
+            'entries.vaults.encrypt_value',
+        ) as mock_encrypt_value, patch(
+            'entries.vaults.decrypt_value',
+        ) as mock_decrypt_value:
+            response_retrieve = self.client.post(
+                reverse('entry-retrieve', args=[entries[0].slug]),
+                format='json',)
+            self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                response_retrieve.data['value'], ciphertexts[entries[0].slug])
+
+            value = b64encode(b'new ciphertext').decode('ascii')
+            response_create = self.client.post(reverse('entry-list'), data={
+                'title': 'Client entry', 'value': value,
+            }, format='json',)
+            self.assertEqual(response_create.status_code, status.HTTP_201_CREATED)
+            slug = response_create.data['slug']
+            self.assertEqual(
+                bytes(EntrySecret.objects.get(entry__slug=slug).value),
+                b'\x02new ciphertext',)
+
+            response_update = self.client.patch(
+                reverse('entry-update', args=[slug]),
+                data={ 'value': ciphertexts[entries[0].slug] },
+                format='json',)
+            self.assertEqual(response_update.status_code, status.HTTP_200_OK)
+
+            response_retrieve = self.client.post(reverse('entries-retrieve'), data={
+                'slugs': [slug],
+            }, format='json',)
+            self.assertEqual(
+                response_retrieve.data[0]['value'], ciphertexts[entries[0].slug])
+
+            response_export = self.client.post(
+                reverse('entries-export'), format='json',)
+            self.assertEqual(response_export.status_code, status.HTTP_200_OK)
+            exported = [
+                json.loads(line) for line in b''.join(
+                    response_export.streaming_content).decode().splitlines()
+            ]
+            self.assertEqual(len(exported), 3)
+
+            response_import = self.client.post(reverse('entries-import'), data={
+                'entries': [
+                    { 'title': 'Imported', 'value': value },
+                    { 'title': 'Invalid', 'value': 'not base64!' },
+                ],
+            }, format='json',)
+            self.assertEqual(response_import.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response_import.data['created'], 1)
+            self.assertEqual(response_import.data['errors'][0]['row'], 2)
+
+            for mock in (
+                mock_check_password, mock_encrypt_value, mock_decrypt_value,
+            ):
+                mock.assert_not_called()
+
+        # Fail, not a client ciphertext
+        response_invalid = self.client.post(reverse('entry-list'), data={
+            'title': 'Client entry', 'value': 'plaintext',
+        }, format='json',)
+        self.assertEqual(response_invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Switching back, the client sends its decrypted values
+        plaintexts = {
+            slug: f'plain:{slug}' \
+            for slug in self.user_1.entries.values_list('slug', flat=True)
+        }
+        response_switch = self.client.post(reverse('vault-mode'), data={
+            'mode': 'server',
+            'entries': plaintexts,
+            'password': test_user_1['password'],
+        }, format='json',)
+        self.assertEqual(response_switch.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response_switch.data, dict(mode='server', updated=4))
+
+        # Fail, the password is required again, and its absence is logged
+        response_fail = self.client.post(
+            reverse('entry-retrieve', args=[slug]), format='json',)
+        self.assertEqual(response_fail.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response_retrieve = self.client.post(
+            reverse('entry-retrieve', args=[slug]),
+            data=dict(password=test_user_1['password']), format='json',)
+        self.assertEqual(response_retrieve.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_retrieve.data['value'], plaintexts[slug])
+
+        # Fail, already in this mode
+        response_fail = self.client.post(reverse('vault-mode'), data={
+            'mode': 'server',
+            'entries': plaintexts,
+            'password': test_user_1['password'],
+        }, format='json',)
+        self.assertEqual(response_fail.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 1)
+
+        # Fail, unexpected error, without logging the entries
+        ciphertexts = {
+            slug: b64encode(f'client:{value}'.encode('utf-8')).decode('ascii') \
+            for slug, value in plaintexts.items()
+        }
+        with patch(
+            'entries.api.switch_vault_mode', side_effect=RuntimeError('switch'),
+        ):
+            response_error = self.client.post(reverse('vault-mode'), data={
+                'mode': 'client',
+                'entries': ciphertexts,
+                'password': test_user_1['password'],
+            }, format='json',)
+        self.assertEqual(response_error.status_code, status.HTTP_400_BAD_REQUEST)
+        log = StatusLog.objects.using('logger').latest('created_at')
+        self.assertIn('Error switching vault mode.', log.msg)
+        self.assertDictEqual(log.metadata['request_data'], dict(mode='client'))
+        self.assertNotIn(ciphertexts[slug], json.dumps(log.metadata))
+        self.assertEqual(StatusLog.objects.using('logger').count(), 2)
+
+class EntryQueryPlanTest(APITransactionTestCase):
+    '''
+    Commits its seeded rows, which are truncated afterwards, so that neither
+    they nor their statistics leak into the plans of other tests.
+    '''
+    databases = '__all__'
+
+    def setUp(self):
+        self.user_1 = create_user()
+
+    def tearDown(self):
+        get_redis_connection('default').flushall()
+
+    def test_entries_query_plans(self):
+        users = [self.user_1] + [
+            create_user(dict(test_user_1, email=f'user{i}@email.com')) \
+            for i in range(3)
+        ]
+        Entry.objects.bulk_create([
+            Entry(user=user, title=f'Entry {i}', slug=f'{i:04d}{j:06d}') \
+            for i, user in enumerate(users) for j in range(2000)
+        ])
+        # Outside of a test transaction, so the visibility map is set too
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE entries_entry')
+
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+
+        with CaptureQueriesContext(connection) as queries:
+            response_1 = self.client.get(reverse('entry-list'), format='json')
+            response_2 = self.client.get(response_1.data['next'], format='json')
+            response_3 = self.client.get(
+                reverse('entry-list'), { 'ordering': 'created_at' },)
+            response_sync = self.client.get(reverse('entries-sync'))
+        for response in (response_1, response_2, response_3, response_sync):
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Each page is read in order from a covering index, never sorted and
+        # without visiting the table
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].startswith('SELECT') or (
+                    'FROM "entries_entry"' not in query['sql']
+                ):
+                    continue
+                cursor.execute('EXPLAIN ' + query['sql'])
+                plans[query['sql']] = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertEqual(len(plans), 4)
+        for sql, plan in plans.items():
+            self.assertNotIn('Sort', plan, sql)
+            self.assertNotIn('Seq Scan', plan, sql)
+            self.assertRegex(
+                plan,
+                r'Index Only Scan( Backward)? using '
+                r'entry_user_(created|updated)_cover_idx',
+                sql,)
+
+        # The search predicate is served by the trigram index
+        plan = Entry.objects.filter(title__icontains='bank').explain()
+        self.assertIn('entry_title_trgm_idx', plan)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
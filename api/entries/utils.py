@@ -3,7 +3,12 @@ from django.db.models.enums import TextChoices
 
 class EntryCommands(TextChoices):
     CREATE_ENTRY = 'create_entry'
+    EXPORT_ENTRIES = 'export_entries'
+    IMPORT_ENTRIES = 'import_entries'
     RETRIEVE_ENTRY = 'retrieve_entry'
+    RETRIEVE_ENTRIES = 'retrieve_entries'
+    SYNC_ENTRIES = 'sync_entries'
+    SWITCH_VAULT_MODE = 'switch_vault_mode'
     UPDATE_ENTRY =  'update_entry'
     DESTROY_ENTRY = 'destroy_entry'
     LIST_ENTRIES = 'list_entries'
@@ -0,0 +1,132 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from entries.crypto import (
+    decrypt_legacy_value, decrypt_value, encrypt_value, get_data_key,
+    is_legacy_ciphertext,)
+from entries.key_cache import get_request_data_key
+from entries.models import EntrySecret, ReencryptionJob
+from users.utils import VaultModes
+from utils.exceptions import VaultChanged
+
+
+# Values of client-side encrypted vaults are stored behind a binary version
+# of their own, so that they are never mistaken for server-side ciphertexts
+CLIENT_VALUE_PREFIX = bytes([2])
+
+SWITCH_BATCH_SIZE = 1000
+
+
+class ServerVault(object):
+    '''
+    A vault whose values are encrypted by the server under the user's data
+    key, so every read and write needs the password. Legacy values which are
+    not converted yet are decrypted with `legacy_password`, the current
+    password, since a password change converts them all first.
+    '''
+    mode = VaultModes.SERVER
+
+    def __init__(self, data_key, legacy_password=None):
+        self.data_key = data_key
+        self.legacy_password = legacy_password
+
+    def to_secret(self, value: str) -> bytes:
+        return encrypt_value(value, self.data_key)
+
+    def from_secret(self, secret: bytes) -> str:
+        if self.legacy_password is not None and is_legacy_ciphertext(secret):
+            return decrypt_legacy_value(secret, self.legacy_password)
+        return decrypt_value(secret, self.data_key)
+
+
+class ClientVault(object):
+    '''
+    A vault whose values are encrypted by its clients. Values are base64
+    ciphertexts which the server stores and returns as they are, without a
+    password or any cryptography.
+    '''
+    mode = VaultModes.CLIENT
+
+    @staticmethod
+    def is_valid(value: str) -> bool:
+        try:
+            return bool(b64decode(value, validate=True))
+        except (BinasciiError, ValueError):
+            return False
+
+    def to_secret(self, value: str) -> bytes:
+        if not self.is_valid(value):
+            raise ValueError('Invalid client ciphertext.')
+        return CLIENT_VALUE_PREFIX + b64decode(value)
+
+    def from_secret(self, secret: bytes) -> str:
+        return b64encode(bytes(secret)[1:]).decode('ascii')
+
+
+def has_client_vault(user) -> bool:
+    return user.vault_mode == VaultModes.CLIENT
+
+
+def get_request_vault(request, password=None):
+    '''
+    The requesting user's vault. Server-side vaults are unlocked with the
+    (already verified) password.
+    '''
+    if has_client_vault(request.user):
+        return ClientVault()
+    data_key = get_request_data_key(request, password)
+    return ServerVault(data_key, password)
+
+
+def lock_vault(user, vault):
+    '''
+    Lock the user's vault mode until the end of the transaction, so that it
+    cannot be switched while values sealed by `vault` are written. Raises
+    `VaultChanged` if it was switched since `vault` was opened.
+    '''
+    mode = get_user_model().objects.select_for_update(no_key=True).values_list(
+        'vault_mode', flat=True,).get(pk=user.pk)
+    if mode != vault.mode:
+        raise VaultChanged()
+
+
+def switch_vault_mode(user, mode, password, values):
+    '''
+    Switch the user's vault to `mode` and replace the value of every entry
+    from `values`, keyed by slug: client ciphertexts when switching to
+    client-side encryption, plaintexts when switching back.
+
+    Raises `VaultChanged` if entries were created or deleted since the client
+    read them. The wrapped data key is kept, so keys cached by other sessions
+    stay valid if the vault is switched back.
+    '''
+    if mode == VaultModes.CLIENT:
+        vault = ClientVault()
+    else:
+        vault = ServerVault(get_data_key(user, password))
+    secrets = {slug: vault.to_secret(value) for slug, value in values.items()}
+
+    with transaction.atomic():
+        locked_user = get_user_model().objects.select_for_update().get(
+            pk=user.pk)
+        entries = dict(user.entries.values_list('slug', 'id'))
+        if locked_user.vault_mode == mode or set(entries) != set(secrets):
+            raise VaultChanged()
+
+        EntrySecret.objects.bulk_update([
+            EntrySecret(entry_id=entries[slug], value=secret) \
+            for slug, secret in secrets.items()
+        ], ['value'], batch_size=SWITCH_BATCH_SIZE)
+        # Legacy values were replaced along with all the others
+        ReencryptionJob.objects.filter(user=user).delete()
+
+        user.vault_mode = mode
+        user.save(update_fields=['vault_mode', 'updated_at'])
+        # Every value changed, so every entry is synced again. Stamped last,
+        # right before the commit, however long the values took to replace
+        # (see `entries.sync`).
+        user.entries.update(updated_at=timezone.now())
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'django.contrib.postgres',
     'django_filters',
     'django_user_agents',
     'entries',
@@ -75,7 +76,7 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'authentication.hashers.CalibratedArgon2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
@@ -192,7 +193,6 @@ LOGGING = {
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
-USE_L10N = True
 USE_TZ = True
 
 REST_FRAMEWORK = {
@@ -217,6 +217,86 @@ REST_KNOX = {
   'USER_SERIALIZER': 'users.serializers.ReadOnlyUserSerializer',
 }
 
+# Each worker process runs at most CONCURRENCY password hashing and key
+# derivation jobs at once, of which logins and registrations may only take
+# half, and sheds the rest with 503 once a command's queue is full
+CRYPTO_ADMISSION_CONCURRENCY = config(
+  'CRYPTO_ADMISSION_CONCURRENCY', default=os.cpu_count() or 1, cast=int)
+CRYPTO_ADMISSION = {
+  'ENABLED': config('CRYPTO_ADMISSION_ENABLED', default=True, cast=bool),
+  'CONCURRENCY': CRYPTO_ADMISSION_CONCURRENCY,
+  'COMMAND_CONCURRENCY': {
+    'login': max(CRYPTO_ADMISSION_CONCURRENCY // 2, 1),
+  },
+  'QUEUE_DEPTH': config('CRYPTO_ADMISSION_QUEUE_DEPTH', default=16, cast=int),
+  'WAIT_TIMEOUT': config('CRYPTO_ADMISSION_WAIT_TIMEOUT', default=5, cast=float),
+  'RETRY_AFTER': config('CRYPTO_ADMISSION_RETRY_AFTER', default=5, cast=int),
+}
+
+# Runs password hashing and key derivation in a pool of MAX_WORKERS
+# processes. Opt-in: Argon2 and scrypt release the GIL, so request threads
+# already hash concurrently, and on the hosts measured with `benchmarks.asgi`
+# the round trip to the pool lowered login throughput by about 15%
+CRYPTO_EXECUTOR = {
+  'ENABLED': config('CRYPTO_EXECUTOR_ENABLED', default=False, cast=bool),
+  'MAX_WORKERS': config(
+    'CRYPTO_EXECUTOR_MAX_WORKERS', default=os.cpu_count() or 1, cast=int),
+}
+
+DATA_KEY_CACHE = {
+  'ENABLED': config('DATA_KEY_CACHE_ENABLED', default=False, cast=bool),
+  'MAX_ENTRIES': config('DATA_KEY_CACHE_MAX_ENTRIES', default=10000, cast=int),
+  'TTL': config('DATA_KEY_CACHE_TTL', default=300, cast=int),
+}
+
+REAUTH_GRANT = {
+  'ENABLED': config('REAUTH_GRANT_ENABLED', default=True, cast=bool),
+  'TTL': config('REAUTH_GRANT_TTL', default=300, cast=int),
+}
+
+ENTRIES_LIST_CACHE = {
+  'ENABLED': config('ENTRIES_LIST_CACHE_ENABLED', default=True, cast=bool),
+  'TTL': config('ENTRIES_LIST_CACHE_TTL', default=300, cast=int),
+  'LOCK_TIMEOUT': config('ENTRIES_LIST_CACHE_LOCK_TIMEOUT', default=5, cast=int),
+  'WAIT_TIMEOUT': config('ENTRIES_LIST_CACHE_WAIT_TIMEOUT', default=2, cast=float),
+  'POLL_INTERVAL': 0.05,
+}
+
+IDEMPOTENCY_KEYS = {
+  'TTL': config('IDEMPOTENCY_KEYS_TTL', default=86400, cast=int),
+  'LOCK_TIMEOUT': config('IDEMPOTENCY_KEYS_LOCK_TIMEOUT', default=30, cast=int),
+  'WAIT_TIMEOUT': config('IDEMPOTENCY_KEYS_WAIT_TIMEOUT', default=10, cast=float),
+  'POLL_INTERVAL': 0.05,
+}
+
+ENTRY_SYNC = {
+  'PAGE_SIZE': config('ENTRY_SYNC_PAGE_SIZE', default=500, cast=int),
+  'OVERLAP_SECONDS': config('ENTRY_SYNC_OVERLAP_SECONDS', default=5, cast=int),
+  'TOMBSTONE_RETENTION_DAYS': config(
+    'ENTRY_SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int),
+}
+
+# Costs of password hashes, see `python manage.py calibrate_argon2`
+ARGON2_PASSWORD_HASHER = {
+  'time_cost': config('ARGON2_PASSWORD_HASHER_TIME_COST', default=2, cast=int),
+  'memory_cost': config('ARGON2_PASSWORD_HASHER_MEMORY_COST', default=102400, cast=int),
+  'parallelism': config('ARGON2_PASSWORD_HASHER_PARALLELISM', default=8, cast=int),
+}
+
+DATA_KEY_WRAPPING = {
+  'CIPHER': config('DATA_KEY_WRAPPING_CIPHER', default='scrypt'),
+  'ARGON2ID': {
+    'time_cost': config('DATA_KEY_WRAPPING_ARGON2ID_TIME_COST', default=2, cast=int),
+    'memory_cost': config('DATA_KEY_WRAPPING_ARGON2ID_MEMORY_COST', default=19456, cast=int),
+    'parallelism': config('DATA_KEY_WRAPPING_ARGON2ID_PARALLELISM', default=1, cast=int),
+  },
+  'SCRYPT': {
+    'n': config('DATA_KEY_WRAPPING_SCRYPT_N', default=2 ** 14, cast=int),
+    'r': config('DATA_KEY_WRAPPING_SCRYPT_R', default=8, cast=int),
+    'p': config('DATA_KEY_WRAPPING_SCRYPT_P', default=1, cast=int),
+  },
+}
+
 TWILIO_ACCOUNT_SID = secrets.TWILIO_ACCOUNT_SID
 TWILIO_AUTH_TOKEN = secrets.TWILIO_AUTH_TOKEN
 TWILIO_PHONE_NUMBER = secrets.TWILIO_PHONE_NUMBER
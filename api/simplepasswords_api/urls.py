@@ -5,7 +5,7 @@ from entries import endpoints as entries
 from users import endpoints as users
 from custom_db_logger import endpoints as logs
 
-from utils.views import not_found
+from utils.views import CryptoAdmissionStatsAPI, not_found
 
 
 urlpatterns = [
@@ -13,6 +13,10 @@ urlpatterns = [
     re_path(r'^api/', include(entries)),
     re_path(r'^api/', include(users)),
     re_path(r'^api/', include(logs)),
+    re_path(
+        r'^api/crypto_admission_stats/$',
+        CryptoAdmissionStatsAPI.as_view(),
+        name='crypto-admission-stats',),
 ]
 
 handler404 = not_found
\ No newline at end of file
@@ -1,5 +1,6 @@
 import logging
 
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.exceptions import (
     PermissionDenied,
@@ -9,16 +10,26 @@ from rest_framework.generics import RetrieveUpdateDestroyAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from entries.list_cache import EntryListCache
+from entries.models import ReencryptionJob
 from users.serializers import UserSerializer, UserDeactivateSerializer
 from users.utils import UserCommands
 from utils import parse_request_metadata
-from utils.exceptions import RequestError
+from utils.conditional import conditional_etag, make_etag
+from utils.exceptions import RequestError, ServiceOverloaded
 from utils.throttling import throttle_command
+from utils.views import AsyncAPIViewMixin
 
 logger = logging.getLogger(__name__)
 
 
-class UserAPI(RetrieveUpdateDestroyAPIView):
+def user_etag(request, *args, **kwargs):
+    # Every change to a user is saved with a new `updated_at`
+    user = request.user
+    return make_etag(user.user_slug, user.updated_at.isoformat())
+
+
+class UserAPI(AsyncAPIViewMixin, RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
     lookup_field = 'user_slug'
@@ -29,7 +40,24 @@ class UserAPI(RetrieveUpdateDestroyAPIView):
             return self.request.user
         raise PermissionDenied('User denied access.')
 
-    def retrieve(self, request, *args, **kwargs):
+    # Reads only use the user loaded by authentication, so they are served
+    # on the event loop. Writes run in the request's thread.
+
+    async def get(self, request, *args, **kwargs):
+        return await self.retrieve(request, *args, **kwargs)
+
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(self.update)(request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await sync_to_async(self.partial_update)(
+            request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        return await sync_to_async(self.destroy)(request, *args, **kwargs)
+
+    @conditional_etag(user_etag)
+    async def retrieve(self, request, *args, **kwargs):
         instance = self.request.user
         serializer = self.get_serializer(instance)
         headers = {
@@ -60,6 +88,8 @@ class UserAPI(RetrieveUpdateDestroyAPIView):
                 'metadata': parse_request_metadata(request),
             })
             raise e
+        except ServiceOverloaded as e:
+            raise e
         except Exception as e:
             logger.exception('Error destroying user.', exc_info=e, extra={
                 'user': request.user.user_slug,
@@ -107,6 +137,8 @@ class UserAPI(RetrieveUpdateDestroyAPIView):
                 'metadata': parse_request_metadata(request),
             })
             raise e
+        except ServiceOverloaded as e:
+            raise e
         except Exception as e:
             logger.exception('Error updating user.', exc_info=e, extra={
                 'user': request.user.user_slug,
@@ -123,4 +155,8 @@ class UserAPI(RetrieveUpdateDestroyAPIView):
         instance.phone_verification_tokens.all().delete()
         instance.tfa_tokens.all().delete()
         instance.entries.all().delete()
+        instance.entry_tombstones.all().delete()
+        EntryListCache.invalidate(instance)
+        ReencryptionJob.objects.filter(user=instance).delete()
+        instance.vault_key = ''
         instance.save()
\ No newline at end of file
@@ -2,6 +2,8 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.hashers import make_password
 from django.utils.translation import gettext_lazy as _
 
+from utils.executor import crypto_executor
+
 
 class CustomUserManager(BaseUserManager):
     def get_by_natural_key(self, email):
@@ -14,7 +16,7 @@ class CustomUserManager(BaseUserManager):
             raise ValueError(_('You must use a valid email address!'))
         email = self.normalize_email(email)
         user = self.model(name=name, email=email, **kwargs)
-        user.password = make_password(password)
+        user.password = crypto_executor.run(make_password, password)
         user.save(using=self._db)
         return user
 
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='vault_key',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_vault_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='vault_mode',
+            field=models.CharField(choices=[('server', 'Server'), ('client', 'Client')], default='server', editable=False, max_length=10),
+        ),
+    ]
@@ -0,0 +1,256 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:05
+
+from django.db import migrations, transaction
+
+
+# First of two migrations which replace the users' slug primary key with a
+# bigint `id`, keeping the slug as a unique public identifier, as
+# `entries.0011_entry_id_expand` and `entries.0012_entry_id` did for entries.
+# This one only adds and backfills the new columns and builds their indexes
+# concurrently, so it can run while the previous release is serving.
+# `0005_customuser_id` then swaps the keys in one short transaction, and must
+# be deployed together with the code which uses them.
+#
+# Every table which references a user gets a `user_ref` column holding the
+# user's id, and a copy of each index over the slug column, built on
+# `user_ref` under a temporary name.
+
+BATCH_SIZE = 1000
+
+# Each table and column which references a user, with the indexes and
+# constraints over that column, as `(name, kind, columns, included columns)`
+USER_REFERENCES = [
+    ('entries_entry', 'user_id', [
+        (
+            'entry_user_created_cover_idx', 'INDEX',
+            ['user_id', 'created_at', 'slug'], ['id', 'title'],
+        ),
+        (
+            'entry_user_updated_cover_idx', 'INDEX',
+            ['user_id', 'updated_at', 'slug'], ['id', 'title', 'created_at'],
+        ),
+    ]),
+    ('entries_entrytombstone', 'user_id', [
+        (
+            'tombstone_user_created_idx', 'INDEX',
+            ['user_id', 'created_at', 'slug'], [],
+        ),
+    ]),
+    ('entries_reencryptionjob', 'user_id', [
+        ('entries_reencryptionjob_pkey', 'PRIMARY KEY', ['user_id'], []),
+    ]),
+    ('authentication_emailverificationtoken', 'user_id', [
+        (
+            'authentication_emailverificationtoken_user_id_50a58bb8', 'INDEX',
+            ['user_id'], [],
+        ),
+    ]),
+    ('authentication_phoneverificationtoken', 'user_id', [
+        (
+            'authentication_phoneverificationtoken_user_id_b3b09b42', 'INDEX',
+            ['user_id'], [],
+        ),
+    ]),
+    ('authentication_twofactorauthtoken', 'user_id', [
+        (
+            'authentication_twofactorauthtoken_user_id_dbcb5d3b', 'INDEX',
+            ['user_id'], [],
+        ),
+    ]),
+    ('knox_authtoken', 'user_id', [
+        ('knox_authtoken_user_id_e5a5d899', 'INDEX', ['user_id'], []),
+    ]),
+    ('django_admin_log', 'user_id', [
+        ('django_admin_log_user_id_c564eba6', 'INDEX', ['user_id'], []),
+    ]),
+    ('users_customuser_groups', 'customuser_id', [
+        (
+            'users_customuser_groups_customuser_id_958147bf', 'INDEX',
+            ['customuser_id'], [],
+        ),
+        (
+            'users_customuser_groups_customuser_id_group_id_76b619e3_uniq',
+            'UNIQUE', ['customuser_id', 'group_id'], [],
+        ),
+    ]),
+    ('users_customuser_user_permissions', 'customuser_id', [
+        (
+            'users_customuser_user_permissions_customuser_id_5771478b',
+            'INDEX', ['customuser_id'], [],
+        ),
+        (
+            'users_customuser_user_pe_customuser_id_permission_7a7debf6_uniq',
+            'UNIQUE', ['customuser_id', 'permission_id'], [],
+        ),
+    ]),
+]
+
+
+def temporary_index_name(table, i):
+    return f'{table}_user_ref_{i}'
+
+
+USER_EXPAND_SQL = [
+    (
+        'ALTER TABLE users_customuser ADD COLUMN id bigint',
+        'ALTER TABLE users_customuser DROP COLUMN IF EXISTS id',
+    ),
+    (
+        'CREATE SEQUENCE users_customuser_id_seq OWNED BY users_customuser.id',
+        migrations.RunSQL.noop,
+    ),
+    (
+        "ALTER TABLE users_customuser ALTER COLUMN id "
+        "SET DEFAULT nextval('users_customuser_id_seq')",
+        migrations.RunSQL.noop,
+    ),
+    # Validated once backfilled, so that `SET NOT NULL` does not have to
+    # scan the table while holding its lock
+    (
+        'ALTER TABLE users_customuser ADD CONSTRAINT customuser_id_not_null '
+        'CHECK (id IS NOT NULL) NOT VALID',
+        migrations.RunSQL.noop,
+    ),
+]
+
+# Rows written by the previous release only set the slug. Every user has an
+# id by the time the trigger is created.
+REFERENCE_EXPAND_SQL = [
+    (
+        '''
+        CREATE FUNCTION users_customuser_set_user_ref() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.user_ref IS NULL THEN
+                SELECT id INTO NEW.user_ref FROM users_customuser
+                WHERE user_slug = to_jsonb(NEW) ->> TG_ARGV[0];
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        'DROP FUNCTION IF EXISTS users_customuser_set_user_ref()',
+    ),
+]
+for table, column, indexes in USER_REFERENCES:
+    REFERENCE_EXPAND_SQL += [
+        (
+            f'ALTER TABLE {table} ADD COLUMN user_ref bigint',
+            f'ALTER TABLE {table} DROP COLUMN IF EXISTS user_ref',
+        ),
+        (
+            f'CREATE TRIGGER {table}_set_user_ref '
+            f'BEFORE INSERT OR UPDATE ON {table} FOR EACH ROW '
+            f"EXECUTE FUNCTION users_customuser_set_user_ref('{column}')",
+            f'DROP TRIGGER IF EXISTS {table}_set_user_ref ON {table}',
+        ),
+        (
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_user_ref_not_null '
+            'CHECK (user_ref IS NOT NULL) NOT VALID',
+            migrations.RunSQL.noop,
+        ),
+    ]
+
+INDEX_SQL = [
+    (
+        'ALTER TABLE users_customuser VALIDATE CONSTRAINT customuser_id_not_null',
+        migrations.RunSQL.noop,
+    ),
+    (
+        'CREATE UNIQUE INDEX CONCURRENTLY users_customuser_id_key '
+        'ON users_customuser (id)',
+        'DROP INDEX CONCURRENTLY IF EXISTS users_customuser_id_key',
+    ),
+    (
+        'CREATE UNIQUE INDEX CONCURRENTLY user_slug_unique '
+        'ON users_customuser (user_slug)',
+        'DROP INDEX CONCURRENTLY IF EXISTS user_slug_unique',
+    ),
+]
+for table, column, indexes in USER_REFERENCES:
+    INDEX_SQL.append((
+        f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_user_ref_not_null',
+        migrations.RunSQL.noop,
+    ))
+    for i, (name, kind, columns, include) in enumerate(indexes):
+        temporary_name = temporary_index_name(table, i)
+        columns = ', '.join(
+            'user_ref' if field == column else field for field in columns)
+        include = f" INCLUDE ({', '.join(include)})" if include else ''
+        unique = 'UNIQUE ' if kind != 'INDEX' else ''
+        INDEX_SQL.append((
+            f'CREATE {unique}INDEX CONCURRENTLY {temporary_name} '
+            f'ON {table} ({columns}){include}',
+            f'DROP INDEX CONCURRENTLY IF EXISTS {temporary_name}',
+        ))
+
+
+def backfill_users(apps, schema_editor):
+    '''
+    Number existing users, one committed batch at a time.
+    '''
+    connection = schema_editor.connection
+    while True:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute('''
+                    UPDATE users_customuser
+                    SET id = nextval('users_customuser_id_seq')
+                    WHERE user_slug IN (
+                        SELECT user_slug FROM users_customuser
+                        WHERE id IS NULL
+                        ORDER BY date_joined, user_slug LIMIT %s
+                    )
+                ''', [BATCH_SIZE])
+                if not cursor.rowcount:
+                    break
+
+
+def backfill_references(apps, schema_editor):
+    '''
+    Point the rows which reference users at the users' ids, one committed
+    batch at a time.
+    '''
+    connection = schema_editor.connection
+    for table, column, indexes in USER_REFERENCES:
+        while True:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(f'''
+                        UPDATE {table} AS reference SET user_ref = users.id
+                        FROM users_customuser AS users
+                        WHERE users.user_slug = reference.{column}
+                        AND reference.ctid = ANY(ARRAY(
+                            SELECT ctid FROM {table} WHERE user_ref IS NULL
+                            LIMIT %s
+                        ))
+                    ''', [BATCH_SIZE])
+                    if not cursor.rowcount:
+                        break
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('admin', '0003_logentry_add_action_flag_choices'),
+        ('authentication', '0003_remove_emailverificationtoken_salt_and_more'),
+        ('entries', '0014_reencryptionjob_failed_entries'),
+        ('knox', '0008_remove_authtoken_salt'),
+        ('users', '0003_customuser_vault_mode'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql, reverse_sql) \
+        for sql, reverse_sql in USER_EXPAND_SQL
+    ] + [
+        migrations.RunPython(
+            backfill_users, migrations.RunPython.noop, atomic=False),
+    ] + [
+        migrations.RunSQL(sql, reverse_sql) \
+        for sql, reverse_sql in REFERENCE_EXPAND_SQL
+    ] + [
+        migrations.RunPython(
+            backfill_references, migrations.RunPython.noop, atomic=False),
+    ] + [
+        migrations.RunSQL(sql, reverse_sql) for sql, reverse_sql in INDEX_SQL
+    ]
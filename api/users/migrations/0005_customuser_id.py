@@ -0,0 +1,190 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:05
+
+from importlib import import_module
+
+from django.db import migrations, models, transaction
+
+
+# Swaps the keys prepared by `0004_customuser_id_expand`. Every index and
+# check it relies on already exists, so the tables are only locked for as
+# long as the catalog changes take, without scanning or rewriting them.
+
+expand = import_module('users.migrations.0004_customuser_id_expand')
+USER_REFERENCES = expand.USER_REFERENCES
+temporary_index_name = expand.temporary_index_name
+
+TABLES = ', '.join(
+    ['users_customuser'] + [table for table, column, indexes in USER_REFERENCES])
+
+
+def foreign_key_name(table, column):
+    return f'{table}_{column}_fk'
+
+
+def switch_sql():
+    sql = [
+        f'LOCK TABLE {TABLES} IN SHARE ROW EXCLUSIVE MODE',
+        'ALTER TABLE users_customuser ALTER COLUMN id SET NOT NULL',
+        'ALTER TABLE users_customuser DROP CONSTRAINT customuser_id_not_null',
+    ]
+    for table, column, indexes in USER_REFERENCES:
+        sql += [
+            f'ALTER TABLE {table} ALTER COLUMN user_ref SET NOT NULL',
+            f'ALTER TABLE {table} DROP CONSTRAINT {table}_user_ref_not_null',
+            f'DROP TRIGGER {table}_set_user_ref ON {table}',
+            # Also drops the column's foreign key, and its indexes and
+            # constraints, which are replaced by the copies on `user_ref`
+            f'ALTER TABLE {table} DROP COLUMN {column}',
+        ]
+    sql += [
+        'DROP FUNCTION users_customuser_set_user_ref()',
+        'ALTER TABLE users_customuser DROP CONSTRAINT users_customuser_pkey',
+        '''
+        DO $$
+        DECLARE
+            index_name text;
+        BEGIN
+            FOR index_name IN
+                SELECT indexname FROM pg_indexes
+                WHERE tablename = 'users_customuser'
+                AND indexname LIKE 'users_customuser_user_slug%like'
+            LOOP
+                EXECUTE format('DROP INDEX %I', index_name);
+            END LOOP;
+        END
+        $$
+        ''',
+        'ALTER TABLE users_customuser ADD CONSTRAINT users_customuser_pkey '
+        'PRIMARY KEY USING INDEX users_customuser_id_key',
+        'ALTER TABLE users_customuser ADD CONSTRAINT user_slug_unique '
+        'UNIQUE USING INDEX user_slug_unique',
+    ]
+    for table, column, indexes in USER_REFERENCES:
+        sql.append(f'ALTER TABLE {table} RENAME COLUMN user_ref TO {column}')
+        for i, (name, kind, columns, include) in enumerate(indexes):
+            temporary_name = temporary_index_name(table, i)
+            if kind == 'INDEX':
+                sql.append(f'ALTER INDEX {temporary_name} RENAME TO {name}')
+            else:
+                sql.append(
+                    f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+                    f'{kind} USING INDEX {temporary_name}')
+        sql.append(
+            f'ALTER TABLE {table} '
+            f'ADD CONSTRAINT {foreign_key_name(table, column)} '
+            f'FOREIGN KEY ({column}) REFERENCES users_customuser (id) '
+            'DEFERRABLE INITIALLY DEFERRED NOT VALID')
+    # Hand the sequence over to an identity column, as Django creates them
+    sql += [
+        'ALTER TABLE users_customuser ALTER COLUMN id DROP DEFAULT',
+        'DROP SEQUENCE users_customuser_id_seq',
+        'ALTER TABLE users_customuser '
+        'ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY',
+        '''
+        SELECT setval(
+            pg_get_serial_sequence('users_customuser', 'id'),
+            COALESCE(MAX(id), 0) + 1, false)
+        FROM users_customuser
+        ''',
+    ]
+    return sql
+
+
+def reverse_switch_sql():
+    '''
+    Restores the slug primary key directly, without the intermediate
+    columns of `0004_customuser_id_expand`.
+    '''
+    sql = [f'LOCK TABLE {TABLES} IN ACCESS EXCLUSIVE MODE']
+    for table, column, indexes in USER_REFERENCES:
+        sql += [
+            f'ALTER TABLE {table} ADD COLUMN user_slug_ref varchar(50)',
+            f'''
+            UPDATE {table} AS reference SET user_slug_ref = users.user_slug
+            FROM users_customuser AS users WHERE users.id = reference.{column}
+            ''',
+            f'ALTER TABLE {table} DROP COLUMN {column}',
+            f'ALTER TABLE {table} RENAME COLUMN user_slug_ref TO {column}',
+            f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL',
+        ]
+    sql += [
+        'ALTER TABLE users_customuser DROP CONSTRAINT users_customuser_pkey',
+        'ALTER TABLE users_customuser DROP CONSTRAINT user_slug_unique',
+        'ALTER TABLE users_customuser ADD PRIMARY KEY (user_slug)',
+        'ALTER TABLE users_customuser DROP COLUMN id',
+        'CREATE INDEX users_customuser_user_slug_like '
+        'ON users_customuser (user_slug varchar_pattern_ops)',
+    ]
+    for table, column, indexes in USER_REFERENCES:
+        for name, kind, columns, include in indexes:
+            columns = ', '.join(columns)
+            include = f" INCLUDE ({', '.join(include)})" if include else ''
+            if kind == 'INDEX':
+                sql.append(
+                    f'CREATE INDEX {name} ON {table} ({columns}){include}')
+            else:
+                sql.append(
+                    f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+                    f'{kind} ({columns})')
+            if kind == 'INDEX' and columns == column:
+                sql.append(
+                    f'CREATE INDEX {name}_like '
+                    f'ON {table} ({column} varchar_pattern_ops)')
+        sql.append(
+            f'ALTER TABLE {table} '
+            f'ADD CONSTRAINT {foreign_key_name(table, column)} '
+            f'FOREIGN KEY ({column}) REFERENCES users_customuser (user_slug) '
+            'DEFERRABLE INITIALLY DEFERRED')
+    return sql
+
+
+def run_in_transaction(statements):
+    def run(apps, schema_editor):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for sql in statements():
+                schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0004_customuser_id_expand'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    run_in_transaction(switch_sql),
+                    run_in_transaction(reverse_switch_sql),
+                    atomic=False,),
+            ] + [
+                # Check existing rows without blocking writes, once the
+                # switch has committed
+                migrations.RunSQL(
+                    f'ALTER TABLE {table} VALIDATE CONSTRAINT '
+                    f'{foreign_key_name(table, column)}',
+                    migrations.RunSQL.noop,) \
+                for table, column, indexes in USER_REFERENCES
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='customuser',
+                    name='id',
+                    field=models.BigAutoField(auto_created=True, default=None, primary_key=True, serialize=False, verbose_name='ID'),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='customuser',
+                    name='user_slug',
+                    field=models.SlugField(db_index=False, editable=False, verbose_name='user slug'),
+                ),
+                migrations.AddConstraint(
+                    model_name='customuser',
+                    constraint=models.UniqueConstraint(fields=('user_slug',), name='user_slug_unique'),
+                ),
+            ],
+        ),
+    ]
@@ -1,17 +1,32 @@
 
+from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import AbstractUser
 from django.db import IntegrityError
 from django.db.models import (
-    BooleanField, CharField, EmailField, SlugField, UniqueConstraint, Q,)
+    BooleanField, CharField, EmailField, SlugField, TextField,
+    UniqueConstraint, Q,)
 from django.utils.translation import gettext_lazy as _
 
 from phonenumber_field.modelfields import PhoneNumberField
 
 from users.exceptions import DuplicateEmail, DuplicateSuperUser
 from users.managers import CustomUserManager
+from users.utils import VaultModes
+from utils.executor import crypto_executor
 from utils.models import CustomBaseMixin, generate_slug
 
 
+def verify_password(raw_password, encoded):
+    '''
+    Return whether `raw_password` matches the `encoded` hash, and whether
+    the hash should be upgraded.
+    '''
+    must_update = []
+    is_correct = check_password(
+        raw_password, encoded, setter=must_update.append,)
+    return is_correct, bool(must_update)
+
+
 class CustomUser(AbstractUser, CustomBaseMixin):
     email = EmailField(_('email address'), blank=False)
     name = CharField(_('name'), max_length=255, blank=False)
@@ -19,8 +34,11 @@ class CustomUser(AbstractUser, CustomBaseMixin):
     email_is_verified = BooleanField(default=False)
     phone_number_is_verified = BooleanField(default=False)
     tfa_is_enabled = BooleanField(default=False)
-    user_slug = SlugField(
-        _('user slug'), primary_key=True, unique=True, editable=False,)
+    user_slug = SlugField(_('user slug'), editable=False, db_index=False,)
+    vault_key = TextField(blank=True, default='', editable=False)
+    vault_mode = CharField(
+        max_length=10, choices=VaultModes.choices, default=VaultModes.SERVER,
+        editable=False,)
     username = None
     first_name = None
     last_name = None
@@ -30,11 +48,30 @@ class CustomUser(AbstractUser, CustomBaseMixin):
     USERNAME_FIELD = 'user_slug'
     REQUIRED_FIELDS = ['name']
 
+    slug_field = 'user_slug'
+    slug_constraint = 'user_slug_unique'
+
     def __str__(self):
         return f'user.{self.user_slug}:{self.email}'
 
+    # Hashing runs in the crypto executor, see `utils.executor`
+
+    def set_password(self, raw_password):
+        self.password = crypto_executor.run(make_password, raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        is_correct, must_update = crypto_executor.run(
+            verify_password, raw_password, self.password,)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return is_correct
+
     class Meta:
         constraints = [
+            UniqueConstraint(fields=['user_slug'], name='user_slug_unique'),
             # Multiple active accounts may not use the same email address
             UniqueConstraint(
                 fields=['email'],
@@ -74,6 +111,5 @@ class CustomUser(AbstractUser, CustomBaseMixin):
                 'duplicate key value violates unique '
                 'constraint "unique_active_superuser"'
             ) in e.args[0]:
-                print(e.args)
                 raise DuplicateSuperUser(self.user_slug, self.name, self.email)
             raise e
\ No newline at end of file
@@ -1,6 +1,5 @@
 import logging
 
-from cryptocode import decrypt, encrypt
 from django.contrib.auth import get_user_model, password_validation
 from django.db.models import F
 
@@ -11,8 +10,11 @@ from rest_framework.serializers import (
 from phonenumber_field.phonenumber import PhoneNumber
 from phonenumber_field.serializerfields import PhoneNumberField
 
+from authentication.reauth import ReauthGrant, check_request_password
+from entries.crypto import rewrap_data_key
 from users.exceptions import DuplicateEmail
 from users.utils import UserCommands
+from utils.admission import crypto_slot
 from utils import (
     email_regex, name_regex, parse_request_metadata,
     error_messages_email, error_messages_name,)
@@ -44,11 +46,11 @@ class ReadOnlyUserSerializer(ModelSerializer):
         fields = (
             'user_slug', 'name', 'email', 'email_is_verified',
             'phone_number_is_verified', 'truncated_phone_number',
-            'tfa_is_enabled',)
+            'tfa_is_enabled', 'vault_mode',)
         read_only_fields = (
             'user_slug', 'name', 'email', 'email_is_verified',
             'phone_number_is_verified', 'truncated_phone_number',
-            'tfa_is_enabled',)
+            'tfa_is_enabled', 'vault_mode',)
 
 
 class UserSerializer(ModelSerializer):
@@ -71,11 +73,11 @@ class UserSerializer(ModelSerializer):
         fields = (
             'user_slug', 'name', 'email', 'email_is_verified',
             'phone_number_is_verified', 'truncated_phone_number',
-            'phone_number', 'tfa_is_enabled', 'password', 'password_2',
-            'current_password',)
+            'phone_number', 'tfa_is_enabled', 'vault_mode', 'password',
+            'password_2', 'current_password',)
         read_only_fields = (
             'user_slug', 'email_is_verified', 'phone_number_is_verified',
-            'truncated_phone_number',)
+            'truncated_phone_number', 'vault_mode',)
     
     def validate_phone_number(self, phone_number):
         if not phone_number:
@@ -115,9 +117,8 @@ class UserSerializer(ModelSerializer):
 
     def validate_current_password(self, current_password):
         request = self.context['request']
-        user = request.user
 
-        if user.check_password(current_password):
+        if check_request_password(request, current_password):
             return current_password
         raise ValidationError('Invalid password.')
 
@@ -166,13 +167,11 @@ class UserSerializer(ModelSerializer):
                 })
                 raise e
 
-            user.set_password(password)
-
-            entries = user.entries.all()
-            for entry in entries:
-                entry.value = encrypt(
-                    decrypt(entry.value, current_password), password,)
-                entry.save()
+            with crypto_slot(request):
+                rewrap_data_key(user, current_password, password)
+                user.set_password(password)
+            # Grants of other sessions are void with the old password hash
+            ReauthGrant.revoke(request)
 
         elif password_2:
             e = ValidationError({
@@ -213,6 +212,8 @@ class UserDeactivateSerializer(Serializer):
     def validate_current_password(self, current_password):
         request = self.context['request']
         user = request.user
-        if user.check_password(current_password):
+        with crypto_slot(request):
+            is_valid = user.check_password(current_password)
+        if is_valid:
             return True
         raise ValidationError('Invalid password.')
\ No newline at end of file
@@ -1,6 +1,11 @@
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core import mail
+from django.test import override_settings
 from django_redis import get_redis_connection
 
 from rest_framework import status
@@ -9,7 +14,9 @@ from rest_framework.test import APITestCase
 
 from custom_db_logger.models import StatusLog
 from custom_db_logger.utils import LogLevels
+from users.models import verify_password
 from users.utils import UserCommands
+from utils.executor import crypto_executor
 from utils.testing import (
     test_user_1, test_user_2, test_entry_1, test_entry_2,
     create_user, create_entries, log_msg_regex,)
@@ -231,6 +238,7 @@ class UserAccountTest(APITestCase):
         })
         user_slug = login.data['user']['user_slug']
         self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        entry_values = [entry.secret.value for entry in self.entries.all()]
         url = f'/api/users/{user_slug}/'
         patch = self.client.patch(
             url,
@@ -257,7 +265,10 @@ class UserAccountTest(APITestCase):
         })
         self.assertEqual(login_2.status_code, status.HTTP_401_UNAUTHORIZED)
 
-        # Check entries are re-encrypted with new password
+        # Check entries are accessible with new password, without having
+        # been re-encrypted
+        self.assertListEqual(
+            [entry.secret.value for entry in self.entries.all()], entry_values,)
         self.client.credentials(HTTP_AUTHORIZATION=f"Token {login_1.data['token']}")
         retrieve_1 = self.client.post(
             reverse('entry-retrieve', args=[self.entries[0].slug]),
@@ -502,4 +513,82 @@ class UserAccountTest(APITestCase):
         self.assertEqual(get.data['truncated_phone_number'], '********6789')
         self.assertEqual(get.headers['Access-Control-Expose-Headers'], 'X-Client-Ip')
         self.assertEqual(get.headers['X-Client-Ip'], '127.0.0.1')
-        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
\ No newline at end of file
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_retrieve_user_not_modified(self):
+        login = self.client.post(reverse('login'), data={
+            'email': test_user_1['email'],
+            'password': test_user_1['password'],
+        })
+        user_slug = login.data['user']['user_slug']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {login.data['token']}")
+        url = f'/api/users/{user_slug}/'
+
+        get_1 = self.client.get(url)
+        self.assertEqual(get_1.status_code, status.HTTP_200_OK)
+        self.assertIn('private', get_1.headers['Cache-Control'])
+        self.assertIn('no-cache', get_1.headers['Cache-Control'])
+        etag = get_1.headers['ETag']
+
+        # Unchanged user, answered before serializing it
+        with patch('users.api.UserAPI.get_serializer') as get_serializer:
+            get_2 = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            get_serializer.assert_not_called()
+        self.assertEqual(get_2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(get_2.headers['ETag'], etag)
+        self.assertEqual(get_2.content, b'')
+
+        # Changed user
+        patch_1 = self.client.patch(
+            url,
+            data={ 'name': 'New Name', 'current_password': test_user_1['password'] },
+            format='json',)
+        self.assertEqual(patch_1.status_code, status.HTTP_200_OK)
+        get_3 = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(get_3.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_3.data['name'], 'New Name')
+        self.assertNotEqual(get_3.headers['ETag'], etag)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    def test_user_slug_collision(self):
+        self.assertIsInstance(self.user_1.pk, int)
+
+        # A colliding slug is regenerated instead of failing the insert
+        collision = get_user_model()(
+            email='collision@simplepasswords.app', name='Collision',
+            user_slug=self.user_1.user_slug,)
+        collision.save()
+        self.assertNotEqual(collision.user_slug, self.user_1.user_slug)
+        self.assertGreater(collision.pk, self.user_2.pk)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
+
+    @override_settings(
+        CRYPTO_EXECUTOR=dict(settings.CRYPTO_EXECUTOR, ENABLED=True))
+    def test_password_hashing_offloaded(self):
+        # Users hashed with an older hasher are upgraded on login
+        self.user_2.password = make_password(
+            test_user_2['password'], hasher='pbkdf2_sha256',)
+        self.user_2.save(update_fields=['password'])
+
+        with patch.object(
+            crypto_executor, 'run', wraps=crypto_executor.run,
+        ) as run:
+            login = self.client.post(reverse('login'), data={
+                'email': test_user_2['email'],
+                'password': test_user_2['password'],
+            })
+            self.assertEqual(login.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                [call.args[0] for call in run.call_args_list],
+                [verify_password, make_password],)
+        self.user_2.refresh_from_db()
+        self.assertTrue(self.user_2.password.startswith('argon2$'))
+        self.assertTrue(self.user_2.check_password(test_user_2['password']))
+        self.assertFalse(self.user_2.check_password('wr0ngPa$$w0rd'))
+
+        # A broken pool is replaced, and meanwhile jobs run in this process
+        pool = crypto_executor._get_pool()
+        with patch.object(pool, 'submit', side_effect=BrokenProcessPool):
+            self.assertTrue(self.user_2.check_password(test_user_2['password']))
+        self.assertIsNot(crypto_executor._get_pool(), pool)
+        self.assertEqual(StatusLog.objects.using('logger').count(), 0)
@@ -5,4 +5,11 @@ class UserCommands(TextChoices):
     DEACTIVATE = 'deactivate_account'
     UPDATE = 'update_user'
     UPGRADE = 'upgrade_account'
-    DOWNGRADE = 'downgrade_account'
\ No newline at end of file
+    DOWNGRADE = 'downgrade_account'
+
+
+class VaultModes(TextChoices):
+    # Entries are encrypted by the server under the user's data key
+    SERVER = 'server'
+    # Entries are encrypted by the user's clients, and opaque to the server
+    CLIENT = 'client'
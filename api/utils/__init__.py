@@ -18,6 +18,11 @@ COMMANDS = [
 
 COMMAND_VALUES = [value for value, label in COMMANDS]
 
+# Request fields never written to logs: passwords, and the plaintext entries
+# sent to the bulk entry endpoints
+EXCLUDED_REQUEST_FIELDS = [
+    'password', 'password_2', 'current_password', 'entries', 'file',]
+
 
 def is_jsonable(obj):
     try:
@@ -39,7 +44,7 @@ def parse_request_metadata(request, metadata={}):
         if hasattr(request, 'data') and isinstance(request.data, dict):
             metadata['request_data'] = {
                 key: value for key, value in request.data.items() \
-                if key not in ['password', 'password_2', 'current_password'] \
+                if key not in EXCLUDED_REQUEST_FIELDS \
                 and is_jsonable(value)
             }
         if hasattr(request, 'META') and isinstance(request.META, dict):
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Condition
+from time import monotonic
+
+from django.conf import settings
+
+from utils.exceptions import ServiceOverloaded
+
+
+class CryptoAdmission(object):
+    '''
+    Process-wide admission control for CPU-bound password hashing and key
+    derivation. At most `CONCURRENCY` jobs run at once, and each command
+    (the name of the requested URL) may use at most its share of them as set
+    in `COMMAND_CONCURRENCY`. Each command also has its own queue, bounded
+    by `QUEUE_DEPTH`, so a flood of one command is shed without delaying the
+    jobs of the others.
+
+    A job which cannot be queued, or which waits longer than `WAIT_TIMEOUT`,
+    fails fast with `ServiceOverloaded` instead of tying up its worker.
+    '''
+    metrics = ('admitted', 'rejected', 'running', 'waiting', 'wait_seconds')
+
+    def __init__(self):
+        self._condition = Condition()
+        self._running = 0
+        self._stats = defaultdict(
+            lambda: dict.fromkeys(CryptoAdmission.metrics, 0))
+
+    @staticmethod
+    def _settings():
+        return settings.CRYPTO_ADMISSION
+
+    def _limit(self, command):
+        return min(
+            self._settings()['COMMAND_CONCURRENCY'].get(
+                command, self._settings()['CONCURRENCY']),
+            self._settings()['CONCURRENCY'],)
+
+    def _reject(self, stats):
+        stats['rejected'] += 1
+        raise ServiceOverloaded(wait=self._settings()['RETRY_AFTER'])
+
+    @contextmanager
+    def slot(self, command):
+        '''
+        Run the body of the `with` block as one job of `command`.
+        '''
+        if not self._settings()['ENABLED']:
+            yield
+            return
+
+        with self._condition:
+            stats = self._stats[command]
+            limit = self._limit(command)
+            is_full = lambda: (
+                self._running >= self._settings()['CONCURRENCY'] or
+                stats['running'] >= limit)
+            if is_full() and (
+                stats['waiting'] >= self._settings()['QUEUE_DEPTH']
+            ):
+                self._reject(stats)
+
+            started = monotonic()
+            deadline = started + self._settings()['WAIT_TIMEOUT']
+            stats['waiting'] += 1
+            try:
+                while is_full():
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        self._reject(stats)
+                    self._condition.wait(remaining)
+            finally:
+                stats['waiting'] -= 1
+
+            self._running += 1
+            stats['running'] += 1
+            stats['admitted'] += 1
+            stats['wait_seconds'] += monotonic() - started
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                stats['running'] -= 1
+                self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                command: dict(stats) \
+                for command, stats in self._stats.items()
+            }
+
+
+admission = CryptoAdmission()
+
+
+def request_command(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    return getattr(resolver_match, 'url_name', None) or 'no_command'
+
+
+def crypto_slot(request):
+    '''
+    Admit a hashing or key derivation job for `request`, see
+    `CryptoAdmission`.
+    '''
+    return admission.slot(request_command(request))
@@ -0,0 +1,63 @@
+import asyncio
+
+from weakref import WeakKeyDictionary
+
+import redis.asyncio
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+
+
+# Connections of `redis.asyncio` belong to the event loop which opened them
+_clients = WeakKeyDictionary()
+
+
+def get_async_redis():
+    '''
+    A native async client of the default cache's Redis server, for the
+    running event loop, or None if the default cache is not Redis.
+    '''
+    if not isinstance(caches['default'], RedisCache):
+        return None
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        cache_settings = settings.CACHES['default']
+        location = cache_settings['LOCATION']
+        if not isinstance(location, str):
+            location = location[0]
+        client = redis.asyncio.Redis.from_url(
+            location,
+            password=cache_settings.get('OPTIONS', {}).get('PASSWORD'),)
+        _clients[loop] = client
+    return client
+
+
+# Values are read and written in django-redis' format, so that sync code can
+# share the same keys through `django.core.cache.cache`. Other backends fall
+# back to Django's async cache API, which runs the sync methods in a thread.
+
+async def aget(key, default=None):
+    cache = caches['default']
+    client = get_async_redis()
+    if client is None:
+        return await cache.aget(key, default)
+    value = await client.get(cache.client.make_key(key))
+    return default if value is None else cache.client.decode(value)
+
+
+async def aset(key, value, timeout=DEFAULT_TIMEOUT):
+    cache = caches['default']
+    client = get_async_redis()
+    if client is None:
+        return await cache.aset(key, value, timeout)
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = cache.default_timeout
+    if timeout is not None and timeout <= 0:
+        await client.delete(cache.client.make_key(key))
+        return
+    await client.set(
+        cache.client.make_key(key), cache.client.encode(value),
+        px=None if timeout is None else int(timeout * 1000),)
@@ -0,0 +1,54 @@
+import asyncio
+import hashlib
+
+from functools import partial, wraps
+
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, quote_etag,)
+from django.views.decorators.http import condition
+
+
+def make_etag(*parts):
+    '''
+    A strong ETag for a representation which is fully determined by `parts`.
+    '''
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def conditional_etag(etag_func):
+    '''
+    Decorate a view method so that a request whose `If-None-Match` matches
+    `etag_func(request, *args, **kwargs)` gets a 304 Not Modified before the
+    method runs. Responses are private and must always be revalidated, so
+    clients send their ETag back rather than reuse a copy unchecked.
+
+    Async methods are supported too. Their `etag_func` is called on the event
+    loop, so it must either be async or not do any I/O.
+    '''
+    def decorator(method):
+        if asyncio.iscoroutinefunction(method):
+            @wraps(method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                etag = etag_func(request, *args, **kwargs)
+                if asyncio.iscoroutine(etag):
+                    etag = await etag
+                etag = quote_etag(etag) if etag is not None else None
+
+                # As `condition` does for sync views
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = await method(self, request, *args, **kwargs)
+                if etag and request.method in ('GET', 'HEAD'):
+                    response.headers.setdefault('ETag', etag)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+            return async_wrapper
+
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            view = condition(etag_func=etag_func)(partial(method, self))
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -1,9 +1,43 @@
 from django.utils.translation import gettext_lazy as _
 
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, Throttled
 
 
 class RequestError(APIException):
     status_code = 400
     default_detail = _('Something went wrong. Please try again.')
-    default_code = 'request_error'
\ No newline at end of file
+    default_code = 'request_error'
+
+
+class SyncCursorExpired(APIException):
+    status_code = 410
+    default_detail = _('Sync cursor expired. Please sync again from the start.')
+    default_code = 'sync_cursor_expired'
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = 409
+    default_detail = _(
+        'A request with this idempotency key is still being processed.')
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = 422
+    default_detail = _(
+        'This idempotency key was already used for a different request.')
+    default_code = 'idempotency_key_reused'
+
+
+class VaultChanged(APIException):
+    status_code = 409
+    default_detail = _('Your vault changed. Please reload it and try again.')
+    default_code = 'vault_changed'
+
+
+class ServiceOverloaded(Throttled):
+    # A `Throttled`, so that views let it through and the response carries
+    # a `Retry-After` header
+    status_code = 503
+    default_detail = _('The service is busy. Please try again shortly.')
+    default_code = 'service_overloaded'
@@ -0,0 +1,114 @@
+import logging
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import Lock
+
+import django
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Set in the pool's processes, so that a job never submits another job
+_in_worker = False
+
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+    django.setup()
+
+
+class CryptoExecutor(object):
+    '''
+    A process pool for CPU-bound password hashing and key derivation, sized
+    by `MAX_WORKERS`. Under ASGI each request's sync code runs in a thread
+    of its own, and Argon2 and scrypt release the GIL, so the threads can
+    already hash concurrently. The pool instead bounds how many memory-hard
+    jobs run at once to `MAX_WORKERS`, however many requests are in flight,
+    and keeps their memory out of the server's process. Whether it pays for
+    the round trip to a worker depends on the host, see `benchmarks.asgi`.
+
+    Jobs are pickled, so they must be module level functions or methods of
+    picklable objects, and may not depend on settings which differ from the
+    worker's, such as those changed by `override_settings`.
+
+    The pool is started on first use. A broken pool, e.g. after a worker
+    ran out of memory, is replaced, and the job is run in the calling
+    process instead of failing the request.
+    '''
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pool = None
+
+    def _after_fork(self):
+        # A forked process does not inherit the pool's threads
+        self._lock = Lock()
+        self._pool = None
+
+    @staticmethod
+    def _settings():
+        return settings.CRYPTO_EXECUTOR
+
+    def _is_enabled(self):
+        return self._settings()['ENABLED'] and not _in_worker
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._settings()['MAX_WORKERS'],
+                    # Forking would copy the parent's threads and connections
+                    mp_context=get_context('spawn'),
+                    initializer=_init_worker,)
+            return self._pool
+
+    def _discard(self, pool, e):
+        logger.exception('Crypto executor broken', exc_info=e)
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, *args):
+        '''
+        Run `func(*args)` in the pool, and block until it returns.
+        '''
+        if not self._is_enabled():
+            return func(*args)
+        pool = self._get_pool()
+        try:
+            return pool.submit(func, *args).result()
+        except BrokenProcessPool as e:
+            self._discard(pool, e)
+            return func(*args)
+
+    def map(self, func, *iterables, chunksize=1):
+        '''
+        Like `run`, for `func` applied to the items of `iterables` in turn.
+        Returns a list of the results.
+        '''
+        jobs = list(zip(*iterables))
+        if not self._is_enabled():
+            return [func(*job) for job in jobs]
+        pool = self._get_pool()
+        try:
+            return list(pool.map(func, *zip(*jobs), chunksize=chunksize))
+        except BrokenProcessPool as e:
+            self._discard(pool, e)
+            return [func(*job) for job in jobs]
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+crypto_executor = CryptoExecutor()
+os.register_at_fork(after_in_child=crypto_executor._after_fork)
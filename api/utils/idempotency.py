@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+
+from functools import wraps
+from os import urandom
+from time import monotonic, sleep
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from utils.exceptions import IdempotencyKeyInUse, IdempotencyKeyReused
+from utils.tokens import request_token, token_secret
+
+
+logger = logging.getLogger(__name__)
+
+NONCE_LENGTH = 12
+MAX_KEY_LENGTH = 255
+
+class IdempotencyCache(object):
+    '''
+    Successful responses to requests sent with an `Idempotency-Key` header,
+    so that a retried request is answered with the original response instead
+    of being run again. Keys are scoped to the knox token of the session and
+    to the request's method and path.
+
+    Responses can hold decrypted values, so they are encrypted under a
+    secret derived from the raw token, which the server never stores.
+    '''
+    header = 'Idempotency-Key'
+
+    @staticmethod
+    def _settings():
+        return settings.IDEMPOTENCY_KEYS
+
+    @staticmethod
+    def _key(request, digest, idempotency_key):
+        scope = hashlib.sha256(repr((
+            request.method, request.path, idempotency_key,
+        )).encode('utf-8')).hexdigest()
+        return f'idempotency_{digest}_{scope}'
+
+    @staticmethod
+    def _cipher(token):
+        return AESGCM(token_secret(token, b'idempotency'))
+
+    @staticmethod
+    def _fingerprint(request):
+        # The password is left out, since a changed password does not change
+        # what the request does
+        data = {
+            field: value for field, value in request.data.items() \
+            if field != 'password'
+        }
+        return hashlib.sha256(json.dumps(
+            data, cls=JSONEncoder, sort_keys=True,).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _encrypt(token, stored):
+        nonce = urandom(NONCE_LENGTH)
+        return nonce + IdempotencyCache._cipher(token).encrypt(
+            nonce, json.dumps(stored, cls=JSONEncoder).encode('utf-8'), None)
+
+    @staticmethod
+    def _decrypt(token, payload):
+        nonce, ciphertext = payload[:NONCE_LENGTH], payload[NONCE_LENGTH:]
+        return json.loads(
+            IdempotencyCache._cipher(token).decrypt(nonce, ciphertext, None))
+
+    @staticmethod
+    def _acquire(key):
+        '''
+        Return the payload stored under `key`, or None once the lock to run
+        the request has been taken. Waits while another request holds it.
+        '''
+        lock_key = f'{key}_lock'
+        deadline = monotonic() + IdempotencyCache._settings()['WAIT_TIMEOUT']
+        while True:
+            payload = cache.get(key)
+            if payload is not None:
+                return payload
+            if cache.add(
+                lock_key, 1,
+                timeout=IdempotencyCache._settings()['LOCK_TIMEOUT'],
+            ):
+                return None
+            if monotonic() >= deadline:
+                raise IdempotencyKeyInUse()
+            sleep(IdempotencyCache._settings()['POLL_INTERVAL'])
+
+    @staticmethod
+    def _set(key, token, stored):
+        try:
+            cache.set(
+                key, IdempotencyCache._encrypt(token, stored),
+                timeout=IdempotencyCache._settings()['TTL'],)
+        except Exception as e:
+            logger.exception('Error setting idempotency cache', exc_info=e)
+
+    @staticmethod
+    def _release(key):
+        try:
+            cache.delete(f'{key}_lock')
+        except Exception as e:
+            logger.exception(
+                'Error releasing idempotency cache lock', exc_info=e)
+
+    @staticmethod
+    def replay(stored):
+        response = Response(stored['data'], status=stored['status'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    @staticmethod
+    def get_or_run(request, run):
+        '''
+        Return the stored response to the request's idempotency key, or
+        `run()` the request and store its response if it succeeded. Requests
+        without a key, or with a broken cache, are simply run.
+        '''
+        idempotency_key = request.headers.get(IdempotencyCache.header)
+        digest, token = request_token(request)
+        if idempotency_key is None or not digest:
+            return run()
+        if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+            raise ValidationError({
+                IdempotencyCache.header: ['Invalid idempotency key.'],
+            })
+
+        fingerprint = IdempotencyCache._fingerprint(request)
+        try:
+            key = IdempotencyCache._key(request, digest, idempotency_key)
+            payload = IdempotencyCache._acquire(key)
+            if payload is not None:
+                stored = IdempotencyCache._decrypt(token, payload)
+                if stored['fingerprint'] != fingerprint:
+                    raise IdempotencyKeyReused()
+                return IdempotencyCache.replay(stored)
+        except (IdempotencyKeyInUse, IdempotencyKeyReused) as e:
+            raise e
+        except Exception as e:
+            logger.exception('Error getting idempotency cache', exc_info=e)
+            return run()
+
+        try:
+            response = run()
+            if isinstance(response, Response) and response.status_code < 300:
+                IdempotencyCache._set(key, token, dict(
+                    fingerprint=fingerprint,
+                    status=response.status_code,
+                    data=response.data,))
+            return response
+        finally:
+            IdempotencyCache._release(key)
+
+
+def idempotent(method):
+    '''
+    Decorate a view method so that requests with an `Idempotency-Key`
+    header run at most once, see `IdempotencyCache`. Concurrent duplicates
+    wait for the first request to finish and get its response.
+    '''
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        return IdempotencyCache.get_or_run(
+            request, lambda: method(self, request, *args, **kwargs))
+    return wrapper
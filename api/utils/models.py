@@ -1,8 +1,7 @@
-from re import match
 from secrets import choice
 from string import ascii_letters, digits
 
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import Model, DateTimeField
 
 
@@ -15,18 +14,25 @@ class CustomBaseMixin(Model):
     created_at = DateTimeField(auto_now_add=True, editable=False)
     updated_at = DateTimeField(auto_now=True)
 
+    # Models identified by a generated slug name its field and the unique
+    # constraint over it, so that a colliding slug is regenerated on insert
+    slug_field = None
+    slug_constraint = None
+
     class Meta:
         abstract = True
 
     def save(self, *args, **kwargs):
+        if self.slug_field is None:
+            return super().save(*args, **kwargs)
         try:
-            super().save(*args, **kwargs)
+            with transaction.atomic():
+                super().save(*args, **kwargs)
         except IntegrityError as e:
-            if hasattr(e, 'args') and match((
-                r'duplicate key value violates '
-                r'unique constraint "[\w-]*_pkey"'
-            ), e.args[0]):
-                self._set_pk_val(generate_slug())
+            if self._state.adding and (
+                f'unique constraint "{self.slug_constraint}"' in str(e)
+            ):
+                setattr(self, self.slug_field, generate_slug())
                 self.save(*args, **kwargs)
             else:
                 raise e
@@ -1,13 +1,18 @@
 import re
 
-from cryptocode import encrypt
+import freezegun
+
 from django.contrib.auth import get_user_model
 from django.db import connections
 
-from entries.models import Entry
+from entries.crypto import encrypt_value, get_data_key
+from entries.models import Entry, EntrySecret
 from custom_db_logger.utils import LogLevels
 
 
+# The crypto executor's pool stalls if its threads see frozen time
+freezegun.configure(extend_ignore_list=['concurrent.futures'])
+
 test_user_1 = {
     'name': 'Jane Doe',
     'email': 'janedoe@email.com',
@@ -54,11 +59,21 @@ def create_user(data=test_user_1):
     return get_user_model().objects.create_user(**data)
 
 
+def create_entry(user, title, value=b''):
+    '''
+    Create an entry whose secret is `value`, which must already be encrypted.
+    '''
+    entry = Entry.objects.create(user=user, title=title)
+    EntrySecret.objects.create(entry=entry, value=value)
+    return entry
+
+
 def create_entries(user, password, entry_1=test_entry_1, entry_2=test_entry_2):
-    entry_1 = dict(entry_1, value=encrypt(entry_1['value'], password))
-    entry_2 = dict(entry_2, value=encrypt(entry_2['value'], password))
-    e1 = Entry.objects.create(user=user, **entry_1)
-    e2 = Entry.objects.create(user=user, **entry_2)
+    data_key = get_data_key(user, password)
+    e1 = create_entry(
+        user, entry_1['title'], encrypt_value(entry_1['value'], data_key),)
+    e2 = create_entry(
+        user, entry_2['title'], encrypt_value(entry_2['value'], data_key),)
     return Entry.objects.filter(slug__in=[e1.slug, e2.slug])
 
 
@@ -1,11 +1,13 @@
+import asyncio
 import logging
 
+from asgiref.sync import sync_to_async
 from datetime import datetime
 from django.core.exceptions import ImproperlyConfigured
 from rest_framework.settings import api_settings
 from rest_framework.throttling import SimpleRateThrottle
 
-from utils import COMMAND_VALUES, parse_request_metadata
+from utils import COMMAND_VALUES, async_cache, parse_request_metadata
 
 
 logger = logging.getLogger('throttling')
@@ -37,24 +39,12 @@ class CustomRateThrottle(SimpleRateThrottle):
         if isinstance(user, str):
             self.user = user
 
-    def allow_request(self):
-        '''
-        Implement the check to see if the request should be throttled.
-        On success calls `throttle_success`.
-        On failure calls `throttle_failure`.
-        '''
+    def start(self):
         self.num_requests, self.duration = self.parse_rate(self.rate)
         self.key = self.get_cache_key()
-        self.history = self.cache.get(self.key, [])
         self.now = datetime.now().timestamp()
 
-        # print('self.rate:', self.rate)
-        # print('self.num_requests:', self.num_requests)
-        # print('self.duration:', self.duration)
-        # print('self.key:', self.key)
-        # print('self.history:', self.history)
-        # print('self.now:', self.now)
-
+    def drop_expired(self):
         # Drop any requests from the history which have now passed the
         # throttle duration
         while (
@@ -63,31 +53,70 @@ class CustomRateThrottle(SimpleRateThrottle):
         ):
             self.history.pop()
 
+    def is_throttled(self):
+        return len(self.history) >= self.num_requests
+
+    def mark_logged(self):
+        '''
+        Returns True for the first throttled request, which should be logged.
+        '''
+        if self.history[0].get('was_logged'):
+            return False
+        self.history[0]['was_logged'] = True
+        return True
+
+    def log_throttled(self):
+        logger.error('Client was throttled.', extra={
+            'entry': self.entry,
+            'user': self.user,
+            'client_ip': self.client_ip,
+            'command': self.command,
+            'metadata': parse_request_metadata(self.context, {
+                'invalid_command': self.invalid_command,
+            }),
+        })
+
+    def allow_request(self):
+        '''
+        Implement the check to see if the request should be throttled.
+        On success calls `throttle_success`.
+        On failure calls `throttle_failure`.
+        '''
+        self.start()
+        self.history = self.cache.get(self.key, [])
+        self.drop_expired()
+
         # Log the first throttled request
-        if len(self.history) >= self.num_requests:
-            # print('THROTTLING!')
-            if not self.history[0].get('was_logged'):
-                logger.error('Client was throttled.', extra={
-                    'entry': self.entry,
-                    'user': self.user,
-                    'client_ip': self.client_ip,
-                    'command': self.command,
-                    'metadata': parse_request_metadata(self.context, {
-                        'invalid_command': self.invalid_command,
-                    }),
-                })
-                self.history[0]['was_logged'] = True
+        if self.is_throttled():
+            if self.mark_logged():
+                self.log_throttled()
                 self.cache.set(self.key, self.history)
-                # print('THROTTLE LOGGED')
             return self.throttle_failure()
         return self.throttle_success()
 
+    async def aallow_request(self):
+        '''
+        Like `allow_request`, with a native async Redis client.
+        '''
+        self.start()
+        self.history = await async_cache.aget(self.key, [])
+        self.drop_expired()
+
+        if self.is_throttled():
+            if self.mark_logged():
+                # Logging writes to the database
+                await sync_to_async(self.log_throttled)()
+                await async_cache.aset(self.key, self.history)
+            return self.throttle_failure()
+        self.history.insert(0, { 'timestamp': self.now })
+        await async_cache.aset(self.key, self.history)
+        return True
+
     def throttle_success(self):
         """
         Inserts the current request's timestamp along with the key
         into the cache.
         """
-        # print('NOT THROTTLED')
         self.history.insert(0, { 'timestamp': self.now })
         self.cache.set(self.key, self.history)
         return True
@@ -116,7 +145,7 @@ class CustomRateThrottle(SimpleRateThrottle):
         }
 
 
-def throttle_command(command, client_ip, context=None, **kwargs):
+def get_throttle_rates(command, kwargs):
     if command not in COMMAND_VALUES:
         kwargs['invalid_command'] = command
         command = 'invalid_command'
@@ -128,6 +157,11 @@ def throttle_command(command, client_ip, context=None, **kwargs):
             throttle_rates = THROTTLE_RATES['default']
         except KeyError:
             throttle_rates = ['60/m']
+    return command, throttle_rates
+
+
+def throttle_command(command, client_ip, context=None, **kwargs):
+    command, throttle_rates = get_throttle_rates(command, kwargs)
 
     throttled = False
     for rate in throttle_rates:
@@ -135,4 +169,20 @@ def throttle_command(command, client_ip, context=None, **kwargs):
             command, rate, client_ip, context, **kwargs,)
         if not throttle.allow_request():
             throttled = True
-    return throttled
\ No newline at end of file
+    return throttled
+
+
+async def athrottle_command(command, client_ip, context=None, **kwargs):
+    '''
+    Like `throttle_command` for async views. Each rate is kept under its own
+    key, so they are all checked concurrently.
+    '''
+    command, throttle_rates = get_throttle_rates(command, kwargs)
+
+    allowed = await asyncio.gather(*[
+        CustomRateThrottle(
+            command, rate, client_ip, context, **kwargs,
+        ).aallow_request() \
+        for rate in throttle_rates
+    ])
+    return not all(allowed)
@@ -0,0 +1,29 @@
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from knox.models import AuthToken
+
+
+def request_token(request):
+    '''
+    The digest and the raw value of the knox token which authenticated
+    `request`, or `(None, None)` if it was not authenticated by one.
+    '''
+    auth = getattr(request, 'auth', None)
+    if not isinstance(auth, AuthToken):
+        return None, None
+    auth_header = request.headers.get('Authorization', '')
+    try:
+        return auth.digest, auth_header.split()[1]
+    except IndexError:
+        return None, None
+
+
+def token_secret(token, info):
+    '''
+    A 32 byte secret derived from the raw knox `token`, which the server
+    never stores. `info` names what the secret is for, so that each use gets
+    an independent secret.
+    '''
+    return HKDF(
+        algorithm=SHA256(), length=32, salt=None, info=info,
+    ).derive(token.encode('utf-8'))
@@ -1,8 +1,83 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from rest_framework.decorators import api_view
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.status import HTTP_404_NOT_FOUND
+from rest_framework.views import APIView
+
+from utils.admission import admission
 
 
 @api_view(['GET', 'POST', 'PUT', 'PATCH', 'DELETE',])
 def not_found(request, exception=None):
-    return Response({ 'detail': 'Not found.' }, status=HTTP_404_NOT_FOUND)
\ No newline at end of file
+    return Response({ 'detail': 'Not found.' }, status=HTTP_404_NOT_FOUND)
+
+
+class CryptoAdmissionStatsAPI(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(admission.stats())
+
+
+class AsyncAPIViewMixin(object):
+    '''
+    Lets a DRF view define `async` handlers, which Django then runs on the
+    event loop under ASGI instead of in a thread. A view's handlers must be
+    either all sync or all async.
+
+    Authentication, permissions and content negotiation are still sync, and
+    run together in the request's thread before the handler is awaited.
+    '''
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.view_is_async:
+            return super().dispatch(request, *args, **kwargs)
+        return self.async_dispatch(request, *args, **kwargs)
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            # Such as `options`, which DRF always defines
+            if not asyncio.iscoroutinefunction(handler):
+                handler = sync_to_async(handler)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        '''
+        Like `get_object`, with the async ORM.
+        '''
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = { self.lookup_field: self.kwargs[lookup_url_kwarg] }
+        try:
+            obj = await queryset.aget(**filter_kwargs)
+        except (
+            queryset.model.DoesNotExist, TypeError, ValueError, ValidationError,
+        ):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
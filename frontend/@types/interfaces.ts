@@ -82,6 +82,8 @@ export interface IAccountState {
 
 export interface IDashboardState {
   entries: IListEntry[];
+  entriesPageCount: number;
+  hasMoreEntries: boolean;
   errorRetrieve?: Error;
   isRetrieving: boolean;
   isCreating: boolean;
@@ -21,6 +21,10 @@ class DashboardListEntries extends Component<Props> {
       leading: true,
       trailing: false,
     });
+    this.handleLoadMore = debounce(this.handleLoadMore.bind(this), 500, {
+      leading: true,
+      trailing: false,
+    });
   }
 
   handleClick(e: MouseEvent<HTMLButtonElement>) {
@@ -29,14 +33,25 @@ class DashboardListEntries extends Component<Props> {
     mutate('/entries/');
   }
 
+  handleLoadMore(e: MouseEvent<HTMLButtonElement>) {
+    e.preventDefault();
+    this.props.loadMoreEntries();
+  }
+
   render() {
-    const { entries, errorRetrieve, isRetrieving, searchBarOn } = this.props;
+    const {
+      entries,
+      errorRetrieve,
+      hasMoreEntries,
+      isRetrieving,
+      searchBarOn,
+    } = this.props;
     const hasEntries = !!entries?.length && Array.isArray(entries);
 
     return (
       <div className={`DashboardListEntries${!hasEntries ? ' is-empty' : ''}`}>
         <DashboardRetrieveEntries />
-        {isRetrieving && !searchBarOn ? (
+        {isRetrieving && !searchBarOn && !hasEntries ? (
           <LoadingView className='LoadingView--dashboard' />
         ) : (
           <>
@@ -52,6 +67,16 @@ class DashboardListEntries extends Component<Props> {
                 ))}
               </ul>
             )}
+            {!errorRetrieve && hasMoreEntries && (
+              <button
+                className='DashboardListEntries-more-button'
+                type='button'
+                disabled={isRetrieving}
+                onClick={this.handleLoadMore}
+              >
+                {isRetrieving ? 'Loading' : 'Load more'}
+              </button>
+            )}
             {!errorRetrieve && !hasEntries && <DashboardListEmpty />}
             {!!errorRetrieve && (
               <div className='DashboardListEntries-error'>
@@ -78,6 +103,7 @@ class DashboardListEntries extends Component<Props> {
 const mapStateToProps = (state: AppState) => ({
   entries: state.dashboard.entries,
   errorRetrieve: state.dashboard.errorRetrieve,
+  hasMoreEntries: state.dashboard.hasMoreEntries,
   isRetrieving: state.dashboard.isRetrieving,
   searchBarOn: state.dashboard.searchBarOn,
 });
@@ -86,6 +112,9 @@ const mapDispatchToProps = (dispatch: AppDispatch) => ({
   refreshEntries: () => {
     dispatch({ type: 'DASHBOARD_SET_ENTRIES', data: [] });
   },
+  loadMoreEntries: () => {
+    dispatch({ type: 'DASHBOARD_LOAD_MORE_ENTRIES' });
+  },
 });
 
 const connector = connect(mapStateToProps, mapDispatchToProps);
@@ -1,5 +1,5 @@
 import { useEffect } from 'react';
-import useSWR from 'swr';
+import useSWRInfinite from 'swr/infinite';
 
 import { useAppDispatch, useAppSelector, useDebounce } from '@/hooks';
 
@@ -7,33 +7,61 @@ import { checkListEntry, IListEntry } from '@/types';
 import { request } from '@/utils';
 
 
-const fetcher = (path: string, title: string) => {
+interface IEntriesPage {
+  entries: IListEntry[];
+  nextCursor: string | null;
+}
+
+const fetcher = async (
+  path: string,
+  title: string,
+  cursor: string,
+): Promise<IEntriesPage> => {
   const token = localStorage.getItem('simplepasswords_token');
+  const params = new URLSearchParams();
+  if (title) params.set('search', title);
+  if (cursor) params.set('cursor', cursor);
+
+  const res = await request
+    .get(`${path}?${params.toString()}`)
+    .set({ 'Authorization': `Token ${token}` });
 
-  return request
-    .get(`${path}${title ? '?search=' + encodeURIComponent(title) : ''}`)
-    .set({ 'Authorization': `Token ${token}` })
-    .then(res => {
-      const entries: IListEntry[] = [];
-      for (const entry of res.body) entries.push(checkListEntry(entry, res));
-      return entries;
-    });
+  return {
+    entries: res.body.results.map(
+      (entry: IListEntry) => checkListEntry(entry, res)),
+    nextCursor: res.body.next_cursor,
+  };
 }
 
 export default function DashboardRetrieveEntries() {
   const {
+    entriesPageCount,
     searchBarOn,
     searchTitle,
   } = useAppSelector((state) => state.dashboard);
   const dispatch = useAppDispatch();
 
   const debouncedSearchTitle = useDebounce(searchTitle, 250);
+  const title = searchBarOn ? debouncedSearchTitle : '';
 
+  // Each page follows the cursor of the one before it, and only the pages
+  // asked for are fetched
   const {
     data,
     error,
     isValidating,
-  } = useSWR(['/entries/', searchBarOn ? debouncedSearchTitle : ''], fetcher);
+    setSize,
+  } = useSWRInfinite(
+    (pageIndex: number, previousPage: IEntriesPage | null) => {
+      if (previousPage && !previousPage.nextCursor) return null;
+      return ['/entries/', title, previousPage?.nextCursor || ''];
+    },
+    fetcher,
+  );
+
+  useEffect(() => {
+    setSize(entriesPageCount);
+  }, [entriesPageCount, setSize]);
 
   useEffect(() => {
     if (isValidating) {
@@ -45,9 +73,13 @@ export default function DashboardRetrieveEntries() {
     if (error) {
       dispatch({ type: 'DASHBOARD_SET_ENTRIES', data: [], error });
     } else if (data) {
-      dispatch({ type: 'DASHBOARD_SET_ENTRIES', data });
+      dispatch({
+        type: 'DASHBOARD_SET_ENTRIES',
+        data: data.flatMap((page) => page.entries),
+        hasMore: !!data[data.length - 1]?.nextCursor,
+      });
     }
   }, [data, error, isValidating, dispatch]);
 
   return <></>;
-}
\ No newline at end of file
+}
@@ -3,6 +3,8 @@ import { IDashboardState } from '@/types';
 
 export const initialDashboardState: IDashboardState = {
   entries: [],
+  entriesPageCount: 1,
+  hasMoreEntries: false,
   errorRetrieve: undefined,
   isRetrieving: false,
   isCreating: false,
@@ -57,6 +59,7 @@ export const dashboardReducer = (
         menuOn: false,
         searchBarOn: false,
         searchTitle: '',
+        entriesPageCount: 1,
       };
 
     case 'DASHBOARD_FORM_CLOSE':
@@ -72,6 +75,7 @@ export const dashboardReducer = (
         menuOn: true,
         searchBarOn: false,
         searchTitle: '',
+        entriesPageCount: 1,
       };
 
     case 'DASHBOARD_MENU_CLOSE':
@@ -93,21 +97,30 @@ export const dashboardReducer = (
         ...state,
         searchBarOn: false,
         searchTitle: '',
+        entriesPageCount: 1,
       };
 
     case 'DASHBOARD_SEARCHBAR_INPUT':
       return {
         ...state,
         searchTitle: action.searchTitle,
+        entriesPageCount: 1,
       };
 
     case 'DASHBOARD_SET_ENTRIES':
       return {
         ...state,
         entries: action.data,
+        hasMoreEntries: !!action.hasMore,
         errorRetrieve: action.error,
       };
 
+    case 'DASHBOARD_LOAD_MORE_ENTRIES':
+      return {
+        ...state,
+        entriesPageCount: state.entriesPageCount + 1,
+      };
+
     case 'DASHBOARD_MODAL_SHOW':
       return { ...state, dashboardModal: { ...action.dashboardModal } };
 